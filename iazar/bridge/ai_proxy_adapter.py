@@ -1,16 +1,21 @@
 # iazar/bridge/ai_proxy_adapter.py
 import socket
 import ssl
-import json
 import time
 import threading
 import logging
 import select
 import zmq
+from collections import deque
 
 from iazar.core.randomx_handler import RandomXHandler
 from iazar.core.hash_validator import HashValidator
+from iazar.core.share_verifier import get_share_verifier
 from iazar.utils.config_manager import get_ia_config
+from iazar.utils.proxy_logging import HotPathLog
+from iazar.utils.stratum_codec import StratumDecoder, encode
+from iazar.utils.submit_tracker import SubmitTracker
+from iazar.utils.target_utils import nonce_to_hex
 
 class AIProxyAdapter:
     def __init__(self, wallet_address, pool_host, pool_port, ai_server_url, password="x", tls=True):
@@ -21,10 +26,14 @@ class AIProxyAdapter:
         self.ai_server_url = ai_server_url
         self.tls = tls
         self.logger = logging.getLogger("IA-Zar-Proxy")
-        self.randomx = RandomXHandler()
-        self.hash_validator = HashValidator()
         self.config = get_ia_config()
+        # Trabajos, nonces y shares: muestreados y con límite de tasa según proxy.logging
+        self.hot = HotPathLog.from_config(self.logger, self.config.get("proxy", {}).get("logging"))
+        self.randomx = RandomXHandler()
         self.sock = None
+        self.decoder = StratumDecoder()
+        self.pending = deque()  # Mensajes de la pool ya decodificados
+        self.submits = SubmitTracker()  # Submits en vuelo, resueltos por id en fetch_job
         self.ctx = None
         self.session_id = None
         self.job = None
@@ -45,6 +54,9 @@ class AIProxyAdapter:
             self.sock = context.wrap_socket(raw_sock, server_hostname=self.pool_host)
         else:
             self.sock = raw_sock
+        self.decoder.reset()
+        self.pending.clear()
+        self.submits.fail_all()
         self.sock.settimeout(30)
         self.logger.info("Conexión establecida. Enviando subscribe...")
 
@@ -78,11 +90,15 @@ class AIProxyAdapter:
 
     def fetch_job(self):
         """
-        Espera y parsea un trabajo real mining.job de la pool.
+        Espera y parsea un trabajo real mining.job de la pool. Las respuestas a
+        submits que llegan mientras tanto resuelven su entrada en vuelo.
         """
         while True:
+            self.submits.expire()
             resp = self._recv_json()
-            if resp.get("method") == "mining.job":
+            if self.submits.resolve(resp) is not None:
+                continue
+            if resp.get("method") in ("job", "mining.job"):
                 params = resp["params"]
                 job = {
                     "job_id": params["job_id"],
@@ -92,8 +108,10 @@ class AIProxyAdapter:
                     "height": params.get("height"),
                     "algo": params.get("algo", "rx/0")
                 }
-                self.job = job
-                self.logger.info(f"Nuevo trabajo recibido: {job['job_id']}")
+                previous, self.job = self.job, job
+                if previous and previous["job_id"] != job["job_id"]:
+                    get_share_verifier().forget_job(previous["job_id"])  # Sus nonces ya no se envían
+                self.hot.info("job_detail", "Nuevo trabajo recibido: %s", job["job_id"])
                 return job
             # Opcional: manejo de 'mining.set_difficulty', 'mining.set_target', etc.
 
@@ -113,41 +131,52 @@ class AIProxyAdapter:
             self.logger.error(f"Error comunicando con IA: {ex}")
             raise
 
-    def submit_share(self, job_id, nonce, extra_data=None):
+    def submit_share(self, job_id, nonce, extra_data=None, result=None):
         """
-        Enviar resultado a la pool con el formato mining.submit.
+        Enviar resultado a la pool con el formato mining.submit, sin esperar la
+        respuesta (la resuelve fetch_job por id, en cualquier orden). `result`
+        es el hash hex ya verificado localmente.
+        Returns:
+            Future con el resultado {"id", "accepted", "result", "error", "rtt_ms", "info"}.
         """
+        req_id, future = self.submits.register(info={"job_id": job_id, "nonce": nonce},
+                                               callback=self._on_submit_result)
         submit_msg = {
-            "id": 3,
+            "id": req_id,
             "method": "mining.submit",
             "params": {
                 "id": self.session_id,
                 "job_id": job_id,
                 "nonce": nonce,
-                "result": "",  # Deja vacío, el pool calculará el resultado real.
+                "result": result or "",
                 "extra": extra_data or {}
             }
         }
-        self._send_json(submit_msg)
-        resp = self._recv_json()
-        if resp.get("result") == "OK":
-            self.logger.info(f"Share enviado y aceptado: nonce={nonce}")
+        try:
+            self._send_json(submit_msg)
+        except OSError:
+            self.submits.discard(req_id)
+            raise
+        return future
+
+    def _on_submit_result(self, verdict):
+        nonce = verdict["info"]["nonce"]
+        if verdict["accepted"]:
+            self.hot.info("share_result", "Share aceptado: nonce=%s (%.1f ms)", nonce, verdict["rtt_ms"])
         else:
-            self.logger.warning(f"Share no aceptado: respuesta pool={resp}")
+            self.hot.warning("share_rejected", "Share no aceptado: nonce=%s, error=%s", nonce, verdict["error"])
 
     def _send_json(self, data):
-        data_raw = (json.dumps(data) + "\n").encode()
-        self.sock.sendall(data_raw)
+        self.sock.sendall(encode(data))
 
     def _recv_json(self):
-        buff = b""
-        while b"\n" not in buff:
+        # Un recv puede traer varios mensajes o media línea: el decoder conserva el resto
+        while not self.pending:
             chunk = self.sock.recv(4096)
             if not chunk:
                 raise ConnectionError("Desconectado de pool.")
-            buff += chunk
-        raw_line, buff = buff.split(b"\n", 1)
-        return json.loads(raw_line.decode())
+            self.pending.extend(self.decoder.feed(chunk))
+        return self.pending.popleft()
 
     def mining_loop(self):
         self.logger.info("Iniciando bucle minería real IA ↔ Pool")
@@ -158,11 +187,20 @@ class AIProxyAdapter:
                     continue
                 # Solicita a la IA el mejor nonce para el blob recibido
                 nonce = self.request_nonce_from_ai(job)
-                if not self.hash_validator.is_valid(nonce):
-                    self.logger.error(f"Nonce inválido recibido de IA: {nonce}")
+                nonce_hex = nonce_to_hex(nonce) if isinstance(nonce, int) else nonce
+                # Solo se envía a la pool lo que cumple su target con el hash RandomX real
+                try:
+                    verdict = HashValidator.validate_submission_async(
+                        job["blob"], nonce_hex, None, job["target"], job["seed_hash"], job_id=job["job_id"]
+                    ).result()
+                except (TypeError, ValueError) as e:
+                    self.hot.warning("solution_dropped", "Nonce inválido recibido de IA: %s (%s)", nonce, e)
+                    continue
+                if not verdict["valid"]:
+                    self.hot.warning("solution_dropped", "Nonce de IA no cumple el target: %s", nonce_hex)
                     continue
-                self.logger.info(f"Nonce válido: {nonce}")
-                self.submit_share(job["job_id"], nonce)
+                self.hot.info("solution", "Nonce válido: %s", nonce_hex)
+                self.submit_share(job["job_id"], nonce_hex, result=verdict["hash"].hex())
             except Exception as ex:
                 self.logger.error(f"Error crítico en loop minería: {ex}")
                 time.sleep(2)
@@ -1,57 +1,108 @@
 import zmq
 import jsonschema
 import logging
+import queue
+import threading
+import numpy as np
 from iazar.bridge.predict_nonce_inference import PredictNonceInference
-from iazar.utils.randomx_wrapper import compute_randomx_hash, hash_meets_target
+from iazar.core.pool_job import PoolJob
+from iazar.core.randomx_farm import RandomXWorkerFarm
+from iazar.utils.config_manager import get_miner_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PredictNonceServer")
 
-context = zmq.Context()
-socket_in = context.socket(zmq.PULL)
-socket_in.connect("tcp://127.0.0.1:5555")  # Trabajos desde el proxy
 
-socket_out = context.socket(zmq.PUSH)
-socket_out.connect("tcp://127.0.0.1:5556")  # Soluciones hacia el proxy
+def receive_jobs(socket_in, farm, pending: queue.Queue):
+    """
+    Hilo receptor: decodifica cada trabajo del proxy y lo deja en `pending`.
+    Un trabajo nuevo cancela la búsqueda en curso de la granja (la del hilo
+    principal vuelve en el siguiente lote) para empezar la nueva cuanto antes.
+    """
+    while True:
+        try:
+            message = socket_in.recv_json()
+            job = PoolJob.from_params(message.get("data"))  # Decodificado una sola vez
+        except zmq.ContextTerminated:
+            return
+        except Exception as e:
+            logger.error(f"❌ Trabajo no válido recibido: {e}")
+            continue
+        if not job:
+            continue
+        farm.cancel()
+        pending.put(job)
+
+
+def latest_job(pending: queue.Queue):
+    """Espera un trabajo y descarta los ya superados por otro más nuevo."""
+    job = pending.get()
+    while True:
+        try:
+            job = pending.get_nowait()
+        except queue.Empty:
+            return job
+
+
+def main():
+    # El cuerpo vive en main(): los workers de la granja (spawn) reimportan este módulo
+    context = zmq.Context()
+    socket_in = context.socket(zmq.PULL)
+    socket_in.connect("tcp://127.0.0.1:5555")  # Trabajos desde el proxy
+
+    socket_out = context.socket(zmq.PUSH)
+    socket_out.connect("tcp://127.0.0.1:5556")  # Soluciones hacia el proxy
 
-predictor = PredictNonceInference()
-logger.info("📡 Servidor de predicción IA listo en 5555/5556")
+    predictor = PredictNonceInference()
+    # Granja de hashing: un proceso (y una VM RandomX) por hilo de minería configurado
+    farm = RandomXWorkerFarm(workers=get_miner_config().get("threads", 1)).start()
+    logger.info("📡 Servidor de predicción IA listo en 5555/5556")
+    # Los trabajos se reciben en otro hilo para poder cancelar la búsqueda en curso
+    pending = queue.Queue()
+    threading.Thread(target=receive_jobs, args=(socket_in, farm, pending),
+                     name="predict-jobs", daemon=True).start()
 
-while True:
     try:
-        message = socket_in.recv_json()
-        job = message.get("data")
-        if not job:
-            continue
-        blob = job.get("blob")
-        target = job.get("target")
-        seed_hash = job.get("seed_hash")
-        job_id = job.get("id")
-
-        logger.info(f"🚀 Nuevo trabajo recibido: {job_id} Altura: {job.get('height')}")
-
-        # Generar pool de nonces candidatos IA
-        candidatos = []
-        for i in range(10000):  # Puedes variar el número
-            nonce = i  # O usa la IA para sugerir nonces
-            score = predictor.predict_one(blob, nonce)
-            candidatos.append({"nonce": nonce, "score": score})
-        candidatos = sorted(candidatos, key=lambda x: x["score"], reverse=True)[:300]
-
-        # Buscar un nonce válido real (cumpla el target)
-        for cand in candidatos:
-            hash_hex = compute_randomx_hash(blob, cand["nonce"], seed_hash)
-            if hash_meets_target(hash_hex, target):
-                logger.info(f"🟢 ¡Share encontrado por IA! Nonce={cand['nonce']} Hash={hash_hex}")
-                socket_out.send_json({
-                    "type": "solution",
-                    "data": {
-                        "job_id": job_id,
-                        "nonce": cand["nonce"],
-                        "hash": hash_hex,
-                        "target": target
-                    }
-                })
-                break
-    except Exception as e:
-        logger.error(f"❌ Error IA: {e}")
+        while True:
+            try:
+                job = latest_job(pending)
+                blob = job.blob_hex
+
+                logger.info(f"🚀 Nuevo trabajo recibido: {job.job_id} Altura: {job.height}")
+                farm.prefetch_seed(job.next_seed_hash)  # Época siguiente en segundo plano
+
+                # Generar pool de nonces candidatos IA
+                candidatos = []
+                for i in range(10000):  # Puedes variar el número
+                    nonce = i  # O usa la IA para sugerir nonces
+                    score = predictor.predict_one(blob, nonce)
+                    candidatos.append({"nonce": nonce, "score": score})
+                candidatos = sorted(candidatos, key=lambda x: x["score"], reverse=True)[:300]
+                if not pending.empty():
+                    continue  # Llegó otro trabajo mientras se puntuaban candidatos
+
+                # Buscar un nonce válido real (cumpla el target) repartido entre los workers
+                nonces = np.fromiter((c["nonce"] for c in candidatos), dtype=np.uint32, count=len(candidatos))
+                found = farm.search(job.blob, job.seed_hash, job.threshold, nonces=nonces)
+                if found:
+                    hash_hex = found["hash"].hex()
+                    logger.info(f"🟢 ¡Share encontrado por IA! Nonce={found['nonce']} Hash={hash_hex}")
+                    socket_out.send_json({
+                        "type": "solution",
+                        "data": {
+                            "job_id": job.job_id,
+                            "nonce": found["nonce"],  # uint32, se formatea solo al enviar a la pool
+                            "hash": hash_hex,
+                            "target": job.target,
+                            "source": "predict_nonce_server"  # Origen para las métricas de stale del proxy
+                        }
+                    })
+                logger.info(f"⚙️ Granja RandomX: {farm.total_hashrate():.1f} H/s")
+            except Exception as e:
+                logger.error(f"❌ Error IA: {e}")
+    finally:
+        farm.stop()
+
+
+if __name__ == "__main__":
+    main()
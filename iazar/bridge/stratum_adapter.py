@@ -1,18 +1,36 @@
-import json
+import logging
 import threading
 import time
 import socket
 import ssl
 from iazar.core.hash_validator import HashValidator
 from iazar.core.block_builder import MoneroBlockBuilder
+from iazar.core.pool_job import PoolJob
+from iazar.core.share_index import ShareIndex
+from iazar.core.vardiff import SHARE_LOCAL, Vardiff
 from iazar.bridge.job_sync import JobDistributor
+from iazar.proxy.job_window import DEFAULT_WINDOW, JobWindow
+from iazar.utils.proxy_logging import HotPathLog
+from iazar.utils.stratum_codec import StratumDecoder, encode
+from iazar.utils.target_utils import nonce_from_hex, target_to_threshold, threshold_to_difficulty
+
+logger = logging.getLogger("StratumAdapter")
+_hot = HotPathLog(logger)  # Un evento por share/conexión: muestreado y con límite de tasa
 
 class StratumClientHandler(threading.Thread):
-    def __init__(self, conn, addr, job_distributor: JobDistributor):
+    def __init__(self, conn, addr, job_distributor: JobDistributor, share_index: ShareIndex = None,
+                 vardiff_config: dict = None, job_window: int = DEFAULT_WINDOW):
         super().__init__(daemon=True)
         self.conn = conn
         self.addr = addr
         self.job_distributor = job_distributor
+        # Últimos trabajos enviados a este minero: un share del anterior sigue siendo válido
+        self.jobs = JobWindow(job_window)
+        self.share_index = share_index if share_index is not None else ShareIndex(max_jobs=self.jobs.max_jobs)
+        vardiff_config = vardiff_config or {}
+        self.vardiff = Vardiff.from_config(vardiff_config) if vardiff_config.get("enabled", False) else None
+        self.current_job = None
+        self.local_shares = 0
         self.job_id = None
         self.extra_nonce = "00000000"
         self.subscription_id = "0000000000000000"
@@ -21,10 +39,9 @@ class StratumClientHandler(threading.Thread):
 
     def send_json(self, data):
         try:
-            message = json.dumps(data) + "\n"
-            self.conn.sendall(message.encode())
+            self.conn.sendall(encode(data))
         except Exception as e:
-            print(f"[ERROR] Error enviando JSON a {self.addr}: {e}")
+            _hot.warning("miner_connection", "Error enviando JSON a %s: %s", self.addr, e)
             self.running = False
 
     def handle_subscribe(self, req_id):
@@ -41,18 +58,70 @@ class StratumClientHandler(threading.Thread):
 
     def handle_submit(self, req_id, params):
         job_id, nonce, result_hash = params[1:4]
-        print(f"[INFO] Share recibido: nonce={nonce}, hash={result_hash}")
-        if HashValidator().is_valid(result_hash):
-            print(f"[OK] Share válido de {self.addr}")
-            self.send_json({"id": req_id, "result": True, "error": None})
-        else:
-            print(f"[WARN] Share inválido de {self.addr}")
+        _hot.debug("miner_data", "Share recibido: nonce=%s, hash=%s", nonce, result_hash)
+        try:
+            nonce_value = nonce_from_hex(nonce)
+        except (TypeError, ValueError):
+            self.send_json({"id": req_id, "result": False, "error": "Invalid nonce"})
+            return
+        # Primero el trabajo: un share stale o desconocido no ocupa sitio en el índice de duplicados
+        job = self.jobs.check(job_id, "miner")
+        if job is None:
+            self.send_json({"id": req_id, "result": False, "error": "Block expired"})
+            return
+        if not job.seed_hash:
+            self.send_json({"id": req_id, "result": False, "error": "Unknown job"})
+            return
+        if not self.share_index.check_and_add(job_id, nonce_value):
+            _hot.warning("share_rejected", "Share duplicado de %s: job=%s, nonce=%s", self.addr, job_id, nonce)
+            self.send_json({"id": req_id, "result": False, "error": "Duplicate share"})
+            return
+        # El hash se recalcula con RandomX: el que declara el minero solo se compara
+        pool_threshold = job.threshold
+        threshold = pool_threshold if self.vardiff is None else max(self.vardiff.threshold, pool_threshold)
+        try:
+            verdict = HashValidator.validate_submission_async(
+                job.blob, nonce, result_hash, threshold, job.seed_hash, job_id=job_id
+            ).result()
+        except (TypeError, ValueError) as e:
+            _hot.warning("share_rejected", "Share no verificable de %s: %s", self.addr, e)
             self.send_json({"id": req_id, "result": False, "error": "Invalid share"})
+            return
+        if not verdict["hash_matches"]:
+            _hot.warning("share_rejected", "Share inválido de %s", self.addr)
+            self.send_json({"id": req_id, "result": False, "error": "Invalid share"})
+            return
+        if not verdict["meets_target"]:
+            self.send_json({"id": req_id, "result": False, "error": "Low difficulty share"})
+            return
+        if self.vardiff is not None:
+            # Cumple el target del minero pero no el de la pool: solo se contabiliza
+            self.vardiff.record_share()  # Solo con el hash ya verificado
+            share_class = self.vardiff.classify(verdict["hash"], pool_threshold)
+            if self.vardiff.retarget() is not None and self.current_job:
+                self.send_job(self.current_job)
+            if share_class == SHARE_LOCAL:
+                self.local_shares += 1
+                self.send_json({"id": req_id, "result": True, "error": None})
+                return
+        _hot.info("share_result", "Share válido de %s", self.addr)
+        self.send_json({"id": req_id, "result": True, "error": None})
 
     def send_job(self, job):
         self.job_id = job.get("job_id", "1")
+        self.current_job = job
+        try:
+            pool_job = PoolJob.from_params({**job, "job_id": self.job_id})
+        except ValueError as e:
+            _hot.warning("job_detail", "Trabajo mal formado para %s: %s", self.addr, e)
+            pool_job = None
+        if pool_job is not None:
+            self.jobs.add(pool_job)
         blob = job.get("blob")
         target = job.get("target")
+        if blob and target and self.vardiff is not None:
+            pool_difficulty = threshold_to_difficulty(target_to_threshold(target))
+            target = self.vardiff.target_for(pool_difficulty)[0]
         if blob and target:
             notify = {
                 "id": None,
@@ -67,19 +136,14 @@ class StratumClientHandler(threading.Thread):
             self.send_json(notify)
 
     def run(self):
-        buffer = ""
+        decoder = StratumDecoder()
         self.job_distributor.subscribe(self)
         while self.running:
             try:
                 data = self.conn.recv(4096)
                 if not data:
                     break
-                buffer += data.decode()
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
-                    if not line.strip():
-                        continue
-                    message = json.loads(line)
+                for message in decoder.feed(data):
                     method = message.get("method")
                     req_id = message.get("id")
                     params = message.get("params", [])
@@ -91,19 +155,24 @@ class StratumClientHandler(threading.Thread):
                     elif method == "mining.submit":
                         self.handle_submit(req_id, params)
             except Exception as e:
-                print(f"[ERROR] Conexión cerrada con {self.addr}: {e}")
+                _hot.warning("miner_connection", "Conexión cerrada con %s: %s", self.addr, e)
                 break
         self.conn.close()
         self.job_distributor.unsubscribe(self)
 
 class StratumServer:
-    def __init__(self, host, port, job_distributor: JobDistributor, use_tls=False, certfile=None, keyfile=None):
+    def __init__(self, host, port, job_distributor: JobDistributor, use_tls=False, certfile=None, keyfile=None,
+                 vardiff_config: dict = None, logging_config: dict = None, job_window: int = DEFAULT_WINDOW):
         self.host = host
         self.port = port
         self.use_tls = use_tls
         self.certfile = certfile
         self.keyfile = keyfile
         self.job_distributor = job_distributor
+        self.job_window = job_window
+        self.share_index = ShareIndex(max_jobs=job_window)  # Compartido por todas las conexiones
+        self.vardiff_config = vardiff_config
+        _hot.apply_config(logging_config)  # Políticas de proxy.logging (ia_config)
         self.running = True
 
     def start(self):
@@ -111,7 +180,7 @@ class StratumServer:
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.bind((self.host, self.port))
         sock.listen(5)
-        print(f"[INFO] Stratum {'TLS' if self.use_tls else 'plain'} en {self.host}:{self.port}")
+        logger.info("Stratum %s en %s:%s", "TLS" if self.use_tls else "plain", self.host, self.port)
 
         if self.use_tls:
             context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
@@ -121,8 +190,9 @@ class StratumServer:
             conn, addr = sock.accept()
             if self.use_tls:
                 conn = context.wrap_socket(conn, server_side=True)
-            print(f"[INFO] Cliente conectado desde {addr}")
-            handler = StratumClientHandler(conn, addr, self.job_distributor)
+            _hot.info("miner_connection", "Cliente conectado desde %s", addr)
+            handler = StratumClientHandler(conn, addr, self.job_distributor, self.share_index, self.vardiff_config,
+                                           self.job_window)
             handler.start()
 
     def stop(self):
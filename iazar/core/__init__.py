@@ -2,10 +2,16 @@ from .randomx_handler import RandomXHandler
 from .block_builder import MoneroBlockBuilder
 from .hash_validator import HashValidator
 from .difficulty_manager import DifficultyManager
+from .randomx_farm import RandomXWorkerFarm
+from .pool_job import PoolJob
+from .share_verifier import ShareVerifier
 
 __all__ = [
     'RandomXHandler',
     'MoneroBlockBuilder',
     'HashValidator',
-    'DifficultyManager'
-]
\ No newline at end of file
+    'DifficultyManager',
+    'RandomXWorkerFarm',
+    'PoolJob',
+    'ShareVerifier'
+]
\ No newline at end of file
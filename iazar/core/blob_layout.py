@@ -0,0 +1,115 @@
+"""
+blob_layout.py - Parser de la cabecera de un blob Monero (hashing blob o plantilla).
+La cabecera es major_version, minor_version y timestamp como varints, seguidos
+de prev_id (32 bytes) y del nonce (4 bytes), así que el offset del nonce
+depende de la longitud de esos varints (39 solo en el caso típico). El blob
+se decodifica una vez por trabajo y el resultado (BlobLayout) se reutiliza
+en hashing, validación y reparto de nonces.
+"""
+
+from functools import lru_cache
+
+PREV_ID_SIZE = 32
+NONCE_SIZE = 4
+MERKLE_ROOT_SIZE = 32
+
+
+def read_varint(data: bytes, offset: int = 0) -> tuple:
+    """
+    Decodifica un varint Monero (LEB128 sin signo).
+    Returns:
+        tuple: (valor, offset siguiente al varint)
+    Raises:
+        ValueError: si el blob se acaba en mitad del varint.
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Blob truncado dentro de un varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint demasiado largo")
+
+
+def encode_varint(value: int) -> bytes:
+    """Codifica un entero sin signo como varint Monero."""
+    if value < 0:
+        raise ValueError("Varint negativo")
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+class BlobLayout:
+    """Campos de cabecera y offsets de un blob; inmutable y compartido entre hilos."""
+
+    __slots__ = (
+        "major_version", "minor_version", "timestamp", "prev_id",
+        "nonce_offset", "merkle_root_offset", "tx_count", "size", "reserved_offset",
+    )
+
+    def __init__(self, major_version, minor_version, timestamp, prev_id, nonce_offset,
+                 merkle_root_offset, tx_count, size, reserved_offset=None):
+        self.major_version = major_version
+        self.minor_version = minor_version
+        self.timestamp = timestamp
+        self.prev_id = prev_id
+        self.nonce_offset = nonce_offset
+        self.merkle_root_offset = merkle_root_offset
+        self.tx_count = tx_count
+        self.size = size
+        self.reserved_offset = reserved_offset
+
+    @property
+    def nonce_slice(self) -> slice:
+        return slice(self.nonce_offset, self.nonce_offset + NONCE_SIZE)
+
+    def __repr__(self):
+        return (f"BlobLayout(v{self.major_version}.{self.minor_version}, ts={self.timestamp}, "
+                f"nonce_offset={self.nonce_offset}, size={self.size})")
+
+
+@lru_cache(maxsize=64)
+def _parse(blob: bytes, reserved_offset) -> BlobLayout:
+    major, offset = read_varint(blob, 0)
+    minor, offset = read_varint(blob, offset)
+    timestamp, offset = read_varint(blob, offset)
+    prev_id = blob[offset:offset + PREV_ID_SIZE]
+    nonce_offset = offset + PREV_ID_SIZE
+    merkle_root_offset = nonce_offset + NONCE_SIZE
+    if len(blob) < merkle_root_offset:
+        raise ValueError(f"Blob de {len(blob)} bytes demasiado corto para la cabecera")
+    tx_count = None
+    if len(blob) > merkle_root_offset + MERKLE_ROOT_SIZE:
+        # Hashing blob: tras la raíz de Merkle va el número de transacciones
+        tx_count, _ = read_varint(blob, merkle_root_offset + MERKLE_ROOT_SIZE)
+    if reserved_offset is not None and not merkle_root_offset <= reserved_offset < len(blob):
+        raise ValueError(f"reserved_offset {reserved_offset} fuera del blob")
+    return BlobLayout(major, minor, timestamp, prev_id, nonce_offset, merkle_root_offset,
+                      tx_count, len(blob), reserved_offset)
+
+
+def parse_blob_layout(blob, reserved_offset: int = None) -> BlobLayout:
+    """
+    Decodifica la cabecera del blob (bytes o hex). Cacheado por blob: llamar
+    en cada nonce del mismo trabajo no vuelve a decodificar los varints.
+    Raises:
+        ValueError: blob truncado o mal formado.
+    """
+    if isinstance(blob, str):
+        blob = bytes.fromhex(blob)
+    elif not isinstance(blob, bytes):
+        blob = bytes(blob)
+    return _parse(blob, reserved_offset)
@@ -9,7 +9,9 @@ IMPORTANTE:
 
 import binascii
 import struct
-from iazar.utils.randomx_wrapper import compute_randomx_hash
+import threading
+from iazar.core.blob_layout import encode_varint, parse_blob_layout
+from iazar.utils.randomx_wrapper import get_engine
 
 def build_block_header_blob(header_fields: dict, nonce: int) -> bytes:
     """
@@ -29,11 +31,11 @@ def build_block_header_blob(header_fields: dict, nonce: int) -> bytes:
     timestamp = header_fields['timestamp']
     prev_id = binascii.unhexlify(header_fields['prev_id'])
     nonce_bytes = struct.pack("<I", nonce)  # Nonce: 4 bytes little-endian
-    # Empaquetar cabecera Monero (básica, puedes ampliar según protocolo/pool)
+    # Cabecera Monero: versiones y timestamp son varints (el offset del nonce varía)
     blob = (
-        struct.pack("<B", major) +
-        struct.pack("<B", minor) +
-        struct.pack("<I", timestamp) +
+        encode_varint(major) +
+        encode_varint(minor) +
+        encode_varint(timestamp) +
         prev_id +
         nonce_bytes
     )
@@ -42,5 +44,87 @@ def build_block_header_blob(header_fields: dict, nonce: int) -> bytes:
 def compute_block_hash(block_blob: bytes, seed_hash: bytes) -> bytes:
     """
     Calcula el hash del bloque usando RandomX real y semilla.
+    Usa el motor compartido (cache por seed y VMs reutilizables).
     """
-    return compute_randomx_hash(block_blob, seed_hash=seed_hash)
+    return get_engine().hash(block_blob, seed_hash)
+
+
+def split_blob(blob: bytes, slot: int, bits: int = 8, nonce_offset: int = None) -> bytes:
+    """
+    Reparto del espacio de nonces estilo NiceHash: fija los `bits` superiores
+    del nonce de 32 bits al slot del minero (el resto a cero). El minero solo
+    varía los bits inferiores, así que cada slot cubre un tramo disjunto.
+    Sin nonce_offset se toma del layout de la cabecera del blob.
+    """
+    if nonce_offset is None:
+        nonce_offset = parse_blob_layout(blob).nonce_offset
+    blob = bytearray(blob)
+    struct.pack_into("<I", blob, nonce_offset, slot << (32 - bits))
+    return bytes(blob)
+
+
+class NonceSlotAllocator:
+    """
+    Asigna a cada minero un slot de los 2**bits posibles (256 con bits=8) sobre
+    un mismo trabajo de la pool; los slots liberados se reutilizan primero.
+    """
+
+    def __init__(self, bits: int = 8):
+        if not 1 <= bits <= 16:
+            raise ValueError("bits debe estar entre 1 y 16")
+        self.bits = bits
+        self.shift = 32 - bits
+        self._free = list(range((1 << bits) - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, proxy_config: dict):
+        """
+        Reparto según proxy.nonce_split_bits; 0 (por defecto) es sin reparto. Sin
+        bits fijados, proxy.max_miners elige los justos para ese número de mineros.
+        Returns:
+            NonceSlotAllocator, o None sin reparto.
+        """
+        bits = int(proxy_config.get("nonce_split_bits", 0))
+        max_miners = int(proxy_config.get("max_miners", 0))
+        if not bits and max_miners > 1:
+            bits = (max_miners - 1).bit_length()
+        return cls(bits) if bits else None
+
+    @property
+    def capacity(self) -> int:
+        return 1 << self.bits
+
+    def allocate(self):
+        """Slot libre, o None si están todos ocupados."""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, slot: int):
+        with self._lock:
+            if slot is not None and slot not in self._free:
+                self._free.append(slot)
+
+    def in_use(self) -> int:
+        with self._lock:
+            return self.capacity - len(self._free)
+
+    def nonce_range(self, slot: int) -> tuple:
+        """(primer nonce, último nonce) del tramo del slot."""
+        start = slot << self.shift
+        return start, start + (1 << self.shift) - 1
+
+    def owns(self, slot: int, nonce: int) -> bool:
+        """True si el nonce cae en el tramo asignado al slot."""
+        return (nonce >> self.shift) == slot
+
+    def split_blob(self, blob: bytes, slot: int, nonce_offset: int = None) -> bytes:
+        return split_blob(blob, slot, self.bits, nonce_offset)
+
+
+class MoneroBlockBuilder:
+    """Fachada orientada a objetos sobre las funciones de construcción de blobs."""
+    build_block_header_blob = staticmethod(build_block_header_blob)
+    compute_block_hash = staticmethod(compute_block_hash)
+    split_blob = staticmethod(split_blob)
+    parse_blob_layout = staticmethod(parse_blob_layout)
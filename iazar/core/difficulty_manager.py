@@ -3,6 +3,10 @@ difficulty_manager.py - Gestión de dificultad de bloque Monero para IA-Zartrux.
 Sin dependencias externas ni lógica dummy.
 """
 
+from functools import lru_cache
+
+from iazar.utils.target_utils import difficulty_to_threshold, target_to_threshold, threshold_to_compact
+
 class DifficultyManager:
     @staticmethod
     def target_from_difficulty(difficulty: int) -> int:
@@ -18,3 +22,18 @@ class DifficultyManager:
         Calcula la dificultad a partir del target.
         """
         return (1 << 256) // target
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def compact_target(difficulty: int) -> str:
+        """
+        Target compacto de 32 bits (8 hex) para anunciar a un minero.
+        Cacheado: con vardiff cuantizado se calcula una vez por nivel.
+        """
+        return threshold_to_compact(difficulty_to_threshold(difficulty))
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def compact_threshold(target: str) -> int:
+        """Umbral de 64 bits que corresponde a un target compacto (el que ve el minero)."""
+        return target_to_threshold(target)
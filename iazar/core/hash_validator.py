@@ -1,5 +1,6 @@
 import binascii
-from iazar.utils.randomx_wrapper import compute_randomx_hash
+from iazar.core.share_verifier import get_share_verifier
+from iazar.utils.target_utils import nonce_from_hex
 
 class HashValidator:
     @staticmethod
@@ -26,29 +27,41 @@ class HashValidator:
         return 0 <= nonce <= 0xFFFFFFFF
 
     @staticmethod
-    def validate_submission(blob_hex: str, nonce_hex: str, expected_hash_hex: str, target: int) -> bool:
+    def validate_submission(blob_hex: str, nonce_hex: str, expected_hash_hex: str, target,
+                            seed_hash_hex: str = None) -> bool:
         """
         Valida un resultado de minería recibido desde mining.submit:
-        - Inserta el nonce en el blob
-        - Calcula el hash con RandomX
+        - Inserta el nonce (hex little-endian, como lo envía el minero) en el blob
+        - Calcula el hash con RandomX (sin seed_hash_hex, con la época activa del motor)
         - Compara con el hash enviado
-        - Verifica si cumple el target
+        - Verifica si cumple el target (hex de la pool o umbral de 64 bits)
+        La verificación pasa por el servicio por lotes compartido; este método
+        espera el veredicto. Para no bloquear usar validate_submission_async.
         """
         try:
-            blob_bytes = bytearray(bytes.fromhex(blob_hex))
-            nonce = int(nonce_hex, 16)
-
-            # Insertar nonce little-endian en offset 39 (posición estándar Monero)
-            blob_bytes[39:43] = nonce.to_bytes(4, 'little')
-
-            # Calcular el hash usando RandomX
-            computed_hash = compute_randomx_hash(bytes(blob_bytes))
-            computed_hash_hex = computed_hash.hex()
-
-            return (
-                computed_hash_hex.lower() == expected_hash_hex.lower()
-                and HashValidator.meets_target(computed_hash, target)
-            )
+            return HashValidator.validate_submission_async(
+                blob_hex, nonce_hex, expected_hash_hex, target, seed_hash_hex
+            ).result()["valid"]
         except Exception as e:
             print(f"[ERROR] Error al validar submission: {e}")
             return False
+
+    @staticmethod
+    def validate_submission_async(blob_hex: str, nonce_hex: str, expected_hash_hex: str, target,
+                                  seed_hash_hex: str = None, job_id=None, callback=None):
+        """
+        Encola la validación en el ShareVerifier compartido. Sin seed_hash_hex
+        se usa la seed de la época activa del motor.
+        Returns:
+            Future: veredicto dict ("valid", "meets_target", "hash_matches", "hash", ...).
+        Raises:
+            ValueError: sin seed_hash_hex y sin época activa en el motor.
+        """
+        verifier = get_share_verifier()
+        seed = seed_hash_hex or verifier.engine.current_seed
+        if not seed:
+            raise ValueError("validate_submission sin seed_hash y sin época RandomX activa")
+        return verifier.submit(
+            blob_hex, seed, nonce_from_hex(nonce_hex), target,
+            expected_hash=expected_hash_hex, job_id=job_id, callback=callback,
+        )
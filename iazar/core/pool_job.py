@@ -0,0 +1,109 @@
+"""
+pool_job.py - Trabajo de pool decodificado una sola vez al llegar.
+El blob y las seeds se guardan como bytes y el target compacto se expande a
+umbral de 64 bits, de modo que hashing, validación y envío de shares no
+vuelven a convertir hex en cada salto. El layout de cabecera (offset del
+nonce) se decodifica la primera vez que se pide y se reutiliza.
+"""
+
+from iazar.core.blob_layout import parse_blob_layout
+from iazar.utils.target_utils import target_to_threshold, threshold_to_difficulty
+
+
+class PoolJob:
+    __slots__ = (
+        "job_id", "blob", "seed_hash", "next_seed_hash", "target", "threshold",
+        "height", "difficulty", "algo", "_blob_hex", "_layout",
+    )
+
+    def __init__(self, job_id, blob: bytes, seed_hash: bytes, target: str, height=None,
+                 next_seed_hash: bytes = None, algo: str = "rx/0", difficulty: float = None):
+        self.job_id = job_id
+        self.blob = blob
+        self.seed_hash = seed_hash
+        self.next_seed_hash = next_seed_hash
+        self.target = target
+        self.threshold = target_to_threshold(target)
+        self.height = height
+        self.algo = algo
+        self.difficulty = float(difficulty) if difficulty else float(threshold_to_difficulty(self.threshold))
+        self._blob_hex = None
+        self._layout = None
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Decodifica los params de un job/mining.notify (lista o dict) de la pool.
+        Returns:
+            PoolJob | None: None si el formato no es reconocido o faltan campos.
+        """
+        if isinstance(params, list):
+            fields = {
+                "job_id": params[0] if len(params) > 0 else None,
+                "blob": params[1] if len(params) > 1 else None,
+                "seed_hash": params[2] if len(params) > 2 else None,
+                "target": params[3] if len(params) > 3 else None,
+                "height": params[4] if len(params) > 4 else None,
+                "difficulty": params[5] if len(params) > 5 else None,
+            }
+        elif isinstance(params, dict):
+            fields = {
+                "job_id": params.get("job_id", params.get("id")),
+                "blob": params.get("blob"),
+                "seed_hash": params.get("seed_hash"),
+                "target": params.get("target"),
+                "height": params.get("height"),
+                "difficulty": params.get("difficulty"),
+                "next_seed_hash": params.get("next_seed_hash"),
+                "algo": params.get("algo", "rx/0"),
+            }
+        else:
+            return None
+        if not fields["blob"] or not fields["target"]:
+            return None
+        next_seed = fields.pop("next_seed_hash", None)
+        job = cls(
+            fields["job_id"],
+            bytes.fromhex(fields["blob"]),
+            bytes.fromhex(fields["seed_hash"]) if fields["seed_hash"] else b"",
+            fields["target"],
+            height=fields["height"],
+            next_seed_hash=bytes.fromhex(next_seed) if next_seed else None,
+            algo=fields.get("algo", "rx/0"),
+            difficulty=fields["difficulty"],
+        )
+        job._blob_hex = fields["blob"]
+        return job
+
+    @property
+    def blob_hex(self) -> str:
+        if self._blob_hex is None:
+            self._blob_hex = self.blob.hex()
+        return self._blob_hex
+
+    @property
+    def layout(self):
+        """BlobLayout del blob (versiones, timestamp, prev_id, offset del nonce)."""
+        if self._layout is None:
+            self._layout = parse_blob_layout(self.blob)
+        return self._layout
+
+    @property
+    def nonce_offset(self) -> int:
+        return self.layout.nonce_offset
+
+    def to_dict(self) -> dict:
+        """Representación JSON (hex) para enviar el trabajo por ZMQ o a los mineros."""
+        return {
+            "id": self.job_id,
+            "blob": self.blob_hex,
+            "seed_hash": self.seed_hash.hex(),
+            "next_seed_hash": self.next_seed_hash.hex() if self.next_seed_hash else None,
+            "target": self.target,
+            "height": self.height,
+            "difficulty": self.difficulty,
+            "algo": self.algo,
+        }
+
+    def __repr__(self):
+        return f"PoolJob(id={self.job_id}, height={self.height}, difficulty={self.difficulty:.0f})"
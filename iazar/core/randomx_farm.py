@@ -0,0 +1,315 @@
+"""
+randomx_farm.py - Granja de procesos de hashing RandomX para IA-Zartrux.
+Cada worker es un proceso con su propio motor RandomX (cache + VM) y recibe
+por pipe tramos de nonces (rangos o lotes de candidatos). Los workers dejan
+de hashear en cuanto uno encuentra un hash que cumple el target o llega un
+trabajo más nuevo. Expone contadores de H/s por worker.
+Memoria: cada worker tiene su propio motor, así que el modo rápido cuesta un
+dataset (~2.3 GB) por worker y época retenida. Las opciones del motor se
+calculan una vez en el padre y el modo rápido solo se mantiene si el
+presupuesto de memoria alcanza para todos; si no, los workers van en modo ligero.
+Un worker que muere se relanza y su tramo del trabajo en curso se reenvía una vez.
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from iazar.utils.randomx_wrapper import (
+    FAST_MODE_MEMORY,
+    FAST_MODE_RAM_MARGIN,
+    available_memory_bytes,
+    load_engine_options,
+)
+from iazar.utils.target_utils import target_to_threshold
+
+logger = logging.getLogger("RandomXFarm")
+
+DEFAULT_BATCH_SIZE = 64
+POLL_INTERVAL = 0.05
+
+
+def _worker_main(worker_id, conn, generation, found, hashes, busy, batch_size, engine_options):
+    """
+    Bucle de un worker. Mensajes del padre:
+        ("job", gen, blob, seed, threshold, spec) con spec = ("range", inicio, cantidad)
+                                                   o ("nonces", bytes uint32)
+        ("prefetch", seed)
+        None -> salir
+    Respuestas: ("found", gen, worker_id, nonce, hash_bytes) y ("done", gen, worker_id, hashed)
+    """
+    from iazar.utils.randomx_wrapper import NonceBlob, RandomXEngine
+    from iazar.utils.target_utils import hashes_meet_threshold
+
+    engine = RandomXEngine(**engine_options)
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if msg is None:
+            break
+        if msg[0] == "prefetch":
+            engine.prefetch_seed(msg[1])
+            continue
+
+        _, gen, blob, seed, threshold, spec = msg
+        # Buffers por trabajo y worker: el bucle de nonces no reserva memoria
+        nonce_blob = NonceBlob(blob)
+        out_buf = np.empty((batch_size, 32), dtype=np.uint8)
+        hashed = 0
+        for chunk in _iter_chunks(spec, batch_size):
+            if generation.value != gen or found.value == gen:
+                break
+            start = time.perf_counter()
+            out = engine.hash_nonces(nonce_blob, chunk, seed, out=out_buf[:len(chunk)])
+            busy[worker_id] += time.perf_counter() - start
+            hashes[worker_id] += len(chunk)
+            hashed += len(chunk)
+            hits = np.flatnonzero(hashes_meet_threshold(out, threshold))
+            if len(hits):
+                first = hits[0]
+                with found.get_lock():
+                    found.value = gen
+                conn.send(("found", gen, worker_id, int(chunk[first]), out[first].tobytes()))
+                break
+        conn.send(("done", gen, worker_id, hashed))
+
+
+def _iter_chunks(spec, batch_size):
+    kind = spec[0]
+    if kind == "range":
+        _, first, count = spec
+        end = first + count
+        for start in range(first, end, batch_size):
+            yield np.arange(start, min(start + batch_size, end), dtype=np.uint64).astype(np.uint32)
+    else:
+        nonces = np.frombuffer(spec[1], dtype=np.uint32)
+        for start in range(0, len(nonces), batch_size):
+            yield nonces[start:start + batch_size]
+
+
+class RandomXWorkerFarm:
+    """
+    N procesos de hashing RandomX, cada uno con su VM.
+    Uso:
+        farm = RandomXWorkerFarm(workers=4)
+        farm.start()
+        result = farm.search(blob, seed, target, nonces=candidatos)
+        farm.hashrates()
+        farm.stop()
+    memory_budget: bytes disponibles para los datasets de todos los workers
+    (por defecto, la RAM libre al arrancar). engine_options: opciones de
+    RandomXEngine (por defecto, las de ia_config.json).
+    """
+
+    def __init__(self, workers: int = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 memory_budget: int = None, engine_options: dict = None):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.batch_size = max(1, int(batch_size))
+        self.engine_options = self._plan_engine_options(
+            load_engine_options() if engine_options is None else engine_options, memory_budget
+        )
+        self._ctx = mp.get_context("spawn")
+        self._generation = self._ctx.Value("Q", 0)
+        self._found = self._ctx.Value("Q", 0)
+        self._hashes = self._ctx.Array("Q", self.workers, lock=False)
+        self._busy = self._ctx.Array("d", self.workers, lock=False)
+        self._conns = []
+        self._procs = []
+        self._search_lock = threading.Lock()
+
+    def _plan_engine_options(self, options: dict, memory_budget: int = None) -> dict:
+        """
+        Opciones del motor de cada worker. El modo rápido se comprueba contra el
+        presupuesto para N workers x max_epochs datasets; si no cabe, modo ligero.
+        Los hilos de inicialización del dataset se reparten entre los workers.
+        """
+        options = dict(options)
+        if options.get("full_mem"):
+            needed = self.workers * int(options.get("max_epochs", 3)) * FAST_MODE_MEMORY + FAST_MODE_RAM_MARGIN
+            budget = available_memory_bytes() if memory_budget is None else memory_budget
+            if budget is None or budget < needed:
+                logger.warning(
+                    f"Modo rápido descartado en la granja: {self.workers} workers necesitan "
+                    f"{needed / 2**30:.1f} GB y el presupuesto es "
+                    f"{'desconocido' if budget is None else f'{budget / 2**30:.1f} GB'}; workers en modo ligero"
+                )
+                options["full_mem"] = False
+                options["snapshot_dir"] = None
+        options["init_threads"] = max(1, int(options.get("init_threads", 1)) // self.workers)
+        return options
+
+    def _spawn(self, worker_id: int):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, child_conn, self._generation, self._found,
+                  self._hashes, self._busy, self.batch_size, self.engine_options),
+            name=f"randomx-worker-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        return parent_conn, proc
+
+    def _respawn(self, worker_id: int):
+        """Sustituye un worker muerto por uno nuevo; devuelve su conexión."""
+        old = self._procs[worker_id]
+        old.join(timeout=1)
+        logger.error(f"Worker RandomX {worker_id} terminó inesperadamente (exitcode {old.exitcode}); relanzando")
+        try:
+            self._conns[worker_id].close()
+        except OSError:
+            pass
+        self._conns[worker_id], self._procs[worker_id] = self._spawn(worker_id)
+        return self._conns[worker_id]
+
+    def _ensure_alive(self):
+        for worker_id, proc in enumerate(self._procs):
+            if not proc.is_alive():
+                self._respawn(worker_id)
+
+    def start(self):
+        for worker_id in range(self.workers):
+            conn, proc = self._spawn(worker_id)
+            self._conns.append(conn)
+            self._procs.append(proc)
+        mode = "rápido (dataset)" if self.engine_options.get("full_mem") else "ligero (cache)"
+        logger.info(f"Granja RandomX iniciada con {self.workers} workers en modo {mode}")
+        return self
+
+    def stop(self):
+        self.cancel()
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._conns, self._procs = [], []
+
+    def cancel(self) -> int:
+        """Invalida el trabajo en curso: los workers lo abandonan en el siguiente lote."""
+        with self._generation.get_lock():
+            self._generation.value += 1
+            return self._generation.value
+
+    def prefetch_seed(self, seed):
+        """Pide a cada worker que precaliente la época RandomX de la seed."""
+        if not seed:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(("prefetch", seed))
+            except (BrokenPipeError, OSError):
+                pass  # Worker muerto: se relanza en la siguiente búsqueda
+
+    def search(self, blob, seed, target, nonces=None, start: int = 0, count: int = None,
+               timeout: float = None):
+        """
+        Reparte el trabajo entre los workers y espera el primer hash que cumpla el target.
+        Args:
+            blob, seed: bytes (o hex) del trabajo; se envían tal cual a los workers.
+            target: umbral de 64 bits (PoolJob.threshold) o target hex de la pool.
+            nonces: array de candidatos uint32 (se reparte en trozos contiguos), o None
+                para recorrer el rango [start, start + count).
+            timeout: segundos máximos de espera (None = hasta agotar el trabajo).
+        Returns:
+            dict | None: {"nonce" (uint32), "hash" (bytes), "worker"} o None si no hay solución, se
+            agotó el tiempo o llegó un trabajo más nuevo.
+        """
+        gen = self.cancel()  # Un trabajo nuevo deja obsoleto al anterior
+        with self._search_lock:
+            if gen != self._generation.value:
+                return None
+            specs = self._partition(nonces, start, count)
+            if not specs:
+                return None
+            self._ensure_alive()
+            job = (gen, blob, seed, target_to_threshold(target))
+            assigned = {}  # worker_id -> tramo pendiente
+            for worker_id, spec in enumerate(specs):
+                self._conns[worker_id].send(("job", *job, spec))
+                assigned[worker_id] = spec
+            return self._collect(job, assigned, timeout)
+
+    def _partition(self, nonces, start, count):
+        if nonces is not None:
+            nonces = np.ascontiguousarray(nonces, dtype=np.uint32)
+            if not len(nonces):
+                return []
+            parts = np.array_split(nonces, min(self.workers, len(nonces)))
+            return [("nonces", part.tobytes()) for part in parts]
+        count = (1 << 32) - start if count is None else count
+        if count <= 0:
+            return []
+        per_worker = max(1, -(-count // self.workers))
+        specs = []
+        for first in range(start, start + count, per_worker):
+            specs.append(("range", first, min(per_worker, start + count - first)))
+        return specs
+
+    def _collect(self, job, assigned, timeout):
+        """
+        Espera las respuestas de los workers con tramo asignado. Si un worker
+        muere, se relanza y su tramo se reenvía una vez; si vuelve a morir, el
+        tramo se da por perdido (con error en el log).
+        """
+        gen = job[0]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        result = None
+        retried = set()
+        while assigned:
+            if gen != self._generation.value:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                self.cancel()
+                break
+            conns = {self._conns[worker_id]: worker_id for worker_id in assigned}
+            for conn in wait(list(conns), timeout=POLL_INTERVAL):
+                worker_id = conns[conn]
+                try:
+                    msg = conn.recv()
+                except (EOFError, ConnectionResetError, OSError):
+                    spec = assigned.pop(worker_id)
+                    new_conn = self._respawn(worker_id)
+                    if worker_id in retried:
+                        logger.error(f"Tramo {spec[0]} del worker {worker_id} perdido: el worker murió dos veces")
+                        continue
+                    retried.add(worker_id)
+                    new_conn.send(("job", *job, spec))
+                    assigned[worker_id] = spec
+                    continue
+                if msg[1] != gen:
+                    continue  # Respuesta de un trabajo anterior
+                if msg[0] == "found" and result is None:
+                    result = {"nonce": msg[3], "hash": msg[4], "worker": msg[2]}
+                elif msg[0] == "done":
+                    assigned.pop(worker_id, None)
+        return result
+
+    def hashrates(self) -> list:
+        """H/s medidos por worker (hashes / tiempo ocupado hasheando)."""
+        rates = []
+        for worker_id in range(self.workers):
+            busy = self._busy[worker_id]
+            hashes = self._hashes[worker_id]
+            rates.append({
+                "worker": worker_id,
+                "hashes": hashes,
+                "busy_s": busy,
+                "hs": hashes / busy if busy > 0 else 0.0,
+            })
+        return rates
+
+    def total_hashrate(self) -> float:
+        return sum(rate["hs"] for rate in self.hashrates())
@@ -3,23 +3,37 @@ randomx_handler.py - Encapsula uso de RandomX para hashing en minería Monero/IA
 Depende del wrapper real, sin dummy ni simulaciones.
 """
 
-from iazar.utils.randomx_wrapper import compute_randomx_hash
+from iazar.utils.randomx_wrapper import get_engine, get_nonce_blob
 
 class RandomXHandler:
-    def __init__(self):
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
         self.current_seed = None
 
     def calculate_hash(self, blob: bytes, nonce: int, seed_hash: bytes) -> bytes:
         """
-        Calcula el hash RandomX usando el wrapper (hash de bloque real).
+        Calcula el hash RandomX usando el motor compartido (hash de bloque real).
         """
-        return compute_randomx_hash(blob, nonce, seed_hash)
+        return self.engine.hash_nonce(get_nonce_blob(blob), nonce, seed_hash)
 
     def reinitialize_for_new_block(self, new_seed: bytes):
         """
-        Reinicializa la caché para un nuevo bloque si es necesario (gestionado por wrapper).
+        Activa la seed del nuevo bloque en el motor; la cache solo se
+        reconstruye si la seed cambia (cada época de 2048 bloques).
         """
+        if new_seed == self.current_seed:
+            return
+        self.engine.set_seed(new_seed)
         self.current_seed = new_seed
 
+    def prefetch_seed(self, next_seed: bytes) -> bool:
+        """
+        Pide al motor que construya en segundo plano la época de next_seed
+        (next_seed_hash del trabajo o seed nueva recién anunciada por la pool).
+        """
+        if not next_seed or next_seed == self.current_seed:
+            return False
+        return self.engine.prefetch_seed(next_seed)
+
     def __del__(self):
-        pass  # Limpieza si hace falta, wrapper ya gestiona recursos.
+        pass  # El motor es compartido por el proceso; no se libera aquí.
@@ -0,0 +1,135 @@
+"""
+share_index.py - Índice de shares ya vistos por trabajo (detección de duplicados).
+Un reenvío del mismo (job_id, nonce) se rechaza antes de hashear o de
+reenviarlo a la pool. Cada trabajo tiene su conjunto de nonces uint32; a
+partir de `bloom_after` nonces se añade un filtro Bloom como prefiltro
+(un "no" del Bloom es definitivo y evita tocar el conjunto grande). Los
+conjuntos se descartan cuando el trabajo sale de la ventana activa.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Coste estimado por nonce en un set de Python (slot de la tabla + int pequeño)
+SET_ENTRY_BYTES = 64
+_MASK32 = 0xFFFFFFFF
+
+
+class _BloomFilter:
+    """Bloom de k sondas sobre un bytearray; hashing multiplicativo del nonce uint32."""
+
+    __slots__ = ("bits", "mask", "hashes")
+
+    def __init__(self, size_bits: int, hashes: int):
+        size_bits = 1 << max(3, (int(size_bits) - 1).bit_length())  # potencia de 2
+        self.bits = bytearray(size_bits >> 3)
+        self.mask = size_bits - 1
+        self.hashes = hashes
+
+    def _probes(self, nonce: int):
+        h1 = (nonce * 0x9E3779B1) & _MASK32
+        h2 = ((nonce * 0x85EBCA6B) & _MASK32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) & self.mask
+
+    def add(self, nonce: int):
+        bits = self.bits
+        for bit in self._probes(nonce):
+            bits[bit >> 3] |= 1 << (bit & 7)
+
+    def __contains__(self, nonce: int) -> bool:
+        bits = self.bits
+        return all(bits[bit >> 3] & (1 << (bit & 7)) for bit in self._probes(nonce))
+
+
+class _JobShares:
+    __slots__ = ("nonces", "bloom")
+
+    def __init__(self):
+        self.nonces = set()
+        self.bloom = None
+
+
+class ShareIndex:
+    """
+    Conjunto de nonces vistos por trabajo, acotado a los `max_jobs` trabajos
+    más recientes. memory_bytes() es O(1): se mantiene un contador al añadir
+    y descartar.
+    """
+
+    def __init__(self, max_jobs: int = 8, bloom_after: int = 4096,
+                 bloom_bits: int = 1 << 20, bloom_hashes: int = 3):
+        self.max_jobs = max(1, int(max_jobs))
+        self.bloom_after = int(bloom_after)
+        self.bloom_bits = int(bloom_bits)
+        self.bloom_hashes = max(1, int(bloom_hashes))
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory = 0
+        self.stats = {"accepted": 0, "duplicates": 0, "jobs_dropped": 0}
+
+    def check_and_add(self, job_id, nonce: int) -> bool:
+        """
+        Registra el share si es nuevo.
+        Returns:
+            bool: True si es la primera vez que se ve (job_id, nonce); False si es duplicado.
+        """
+        nonce &= _MASK32
+        with self._lock:
+            shares = self._jobs.get(job_id)
+            if shares is None:
+                shares = self._jobs[job_id] = _JobShares()
+                while len(self._jobs) > self.max_jobs:
+                    self._drop_locked(next(iter(self._jobs)))
+            bloom = shares.bloom
+            if (bloom is None or nonce in bloom) and nonce in shares.nonces:
+                self.stats["duplicates"] += 1
+                return False
+            shares.nonces.add(nonce)
+            self._memory += SET_ENTRY_BYTES
+            if bloom is not None:
+                bloom.add(nonce)
+            elif len(shares.nonces) >= self.bloom_after:
+                self._enable_bloom(shares)
+            self.stats["accepted"] += 1
+            return True
+
+    def is_duplicate(self, job_id, nonce: int) -> bool:
+        """Consulta sin registrar."""
+        with self._lock:
+            shares = self._jobs.get(job_id)
+            return shares is not None and (nonce & _MASK32) in shares.nonces
+
+    def drop_job(self, job_id):
+        """Descarta el conjunto de un trabajo que ha salido de la ventana activa."""
+        with self._lock:
+            self._drop_locked(job_id)
+
+    def retain_jobs(self, active_job_ids):
+        """Conserva solo los trabajos indicados (ventana activa) y descarta el resto."""
+        active = set(active_job_ids)
+        with self._lock:
+            for job_id in [j for j in self._jobs if j not in active]:
+                self._drop_locked(job_id)
+
+    def memory_bytes(self) -> int:
+        """Memoria estimada de todos los conjuntos y filtros Bloom (O(1))."""
+        return self._memory
+
+    def job_count(self) -> int:
+        return len(self._jobs)
+
+    def _enable_bloom(self, shares: _JobShares):
+        shares.bloom = _BloomFilter(self.bloom_bits, self.bloom_hashes)
+        for nonce in shares.nonces:
+            shares.bloom.add(nonce)
+        self._memory += len(shares.bloom.bits)
+
+    def _drop_locked(self, job_id):
+        shares = self._jobs.pop(job_id, None)
+        if shares is None:
+            return
+        self._memory -= len(shares.nonces) * SET_ENTRY_BYTES
+        if shares.bloom is not None:
+            self._memory -= len(shares.bloom.bits)
+        self.stats["jobs_dropped"] += 1
@@ -0,0 +1,199 @@
+"""
+share_verifier.py - Servicio de verificación de shares por lotes.
+Los hilos de conexión encolan shares y reciben un Future (o callback); unos
+pocos hilos verificadores agrupan lo encolado por (trabajo, blob, seed) y lo
+hashean con RandomXEngine.hash_nonces sobre el pool de VMs compartido. Los
+hashes calculados se guardan por trabajo y, dentro de él, por (blob, seed):
+con reparto de nonces cada minero recibe su propio blob del mismo job_id, así
+que el job_id solo agrupa para expirar (forget_job al salir de la ventana de
+trabajos) y un reenvío del mismo nonce sobre el mismo blob no vuelve a pasar
+por RandomX.
+"""
+
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from iazar.utils.randomx_wrapper import NonceBlob, as_bytes, get_engine
+from iazar.utils.target_utils import hash_meets_threshold, nonce_from_hex, target_to_threshold
+
+logger = logging.getLogger("ShareVerifier")
+
+_STOP = object()
+
+
+class _Share:
+    __slots__ = ("job_key", "blob", "seed", "nonce", "threshold", "expected_hash", "future")
+
+    def __init__(self, job_key, blob, seed, nonce, threshold, expected_hash, future):
+        self.job_key = job_key
+        self.blob = blob
+        self.seed = seed
+        self.nonce = nonce
+        self.threshold = threshold
+        self.expected_hash = expected_hash
+        self.future = future
+
+
+class ShareVerifier:
+    """
+    Verificación asíncrona de shares con agrupación por trabajo.
+    Cada resultado es un dict {"valid", "meets_target", "hash_matches", "hash", "nonce", "cached"}.
+    """
+
+    def __init__(self, engine=None, workers: int = 1, batch_size: int = 64, max_jobs: int = 16):
+        self.engine = engine or get_engine()
+        self.batch_size = max(1, int(batch_size))
+        self.max_jobs = max(1, int(max_jobs))
+        self._queue = queue.Queue()
+        self._verdicts = OrderedDict()  # job_key -> {(blob, seed): {nonce: hash}}, LRU por trabajo
+        self._cache_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"submitted": 0, "hashed": 0, "cached": 0, "batches": 0, "errors": 0}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"share-verifier-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, blob, seed, nonce, target, expected_hash=None, job_id=None, callback=None) -> Future:
+        """
+        Encola un share para verificar sin bloquear al llamante.
+        Args:
+            blob: blob del trabajo (bytes o hex).
+            seed: seed_hash (bytes o hex).
+            nonce: nonce int o hex little-endian de mining.submit.
+            target: target de la pool (hex) o umbral de 64 bits ya expandido.
+            expected_hash: hash declarado por el minero (bytes o hex), opcional.
+            job_id: trabajo al que pertenece el share, para forget_job() (por defecto blob+seed).
+            callback: función llamada con el Future ya resuelto.
+        Returns:
+            Future: se resuelve con el dict de veredicto.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        try:
+            blob = as_bytes(blob)
+            seed = as_bytes(seed)
+            nonce = nonce_from_hex(nonce) if isinstance(nonce, str) else int(nonce)
+            expected = as_bytes(expected_hash) if expected_hash else None
+            share = _Share(
+                job_id if job_id is not None else (blob, seed),
+                blob, seed, nonce, target_to_threshold(target), expected, future,
+            )
+        except (ValueError, TypeError) as e:
+            future.set_exception(e)
+            return future
+        with self._stats_lock:
+            self.stats["submitted"] += 1
+        self._queue.put(share)
+        return future
+
+    def verify(self, blob, seed, nonce, target, expected_hash=None, job_id=None, timeout=None) -> dict:
+        """Versión bloqueante de submit()."""
+        return self.submit(blob, seed, nonce, target, expected_hash, job_id).result(timeout)
+
+    def forget_job(self, job_id):
+        """Descarta los hashes de un trabajo que ya no está activo (todos sus blobs)."""
+        with self._cache_lock:
+            self._verdicts.pop(job_id, None)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            # Vaciar lo que ya esté en cola: una avalancha de shares forma un solo lote
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+            groups = {}
+            for share in batch:
+                groups.setdefault((share.job_key, share.blob, share.seed), []).append(share)
+            for shares in groups.values():
+                try:
+                    self._verify_group(shares)
+                except Exception as e:
+                    logger.error(f"Error verificando lote de {len(shares)} shares: {e}")
+                    with self._stats_lock:
+                        self.stats["errors"] += len(shares)
+                    for share in shares:
+                        if not share.future.done():
+                            share.future.set_exception(e)
+
+    def _verify_group(self, shares: list):
+        """Hashea en una sola pasada de la VM los nonces del grupo que no estén en caché."""
+        first = shares[0]
+        with self._cache_lock:
+            blobs = self._verdicts.get(first.job_key)
+            if blobs is None:
+                blobs = self._verdicts[first.job_key] = {}
+                while len(self._verdicts) > self.max_jobs:
+                    self._verdicts.popitem(last=False)
+            else:
+                self._verdicts.move_to_end(first.job_key)
+            known = blobs.setdefault((first.blob, first.seed), {})
+            fresh = {s.nonce for s in shares if s.nonce not in known}
+        missing = sorted(fresh)
+        if missing:
+            hashes = self.engine.hash_nonces(NonceBlob(first.blob), np.array(missing, dtype=np.uint32), first.seed)
+            with self._cache_lock:
+                for nonce, row in zip(missing, hashes):
+                    known[nonce] = row.tobytes()
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["hashed"] += len(missing)
+            self.stats["cached"] += sum(1 for s in shares if s.nonce not in fresh)
+        for share in shares:
+            hash_bytes = known[share.nonce]
+            meets = hash_meets_threshold(hash_bytes, share.threshold)
+            matches = share.expected_hash is None or share.expected_hash == hash_bytes
+            share.future.set_result({
+                "valid": meets and matches,
+                "meets_target": meets,
+                "hash_matches": matches,
+                "hash": hash_bytes,
+                "nonce": share.nonce,
+                "cached": share.nonce not in fresh,
+            })
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_share_verifier() -> ShareVerifier:
+    """Servicio de verificación compartido por el proceso (hilos según system.max_threads)."""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                try:
+                    from iazar.utils.config_manager import get_ia_config
+                    threads = int(get_ia_config().get("system", {}).get("max_threads", 1))
+                except Exception:
+                    threads = 1
+                _verifier = ShareVerifier(workers=max(1, threads))
+    return _verifier
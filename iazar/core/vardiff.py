@@ -0,0 +1,133 @@
+"""
+vardiff.py - Dificultad variable por conexión de minero.
+Cada conexión mide su ritmo de shares en una ventana deslizante y reajusta
+su dificultad hacia `target_spm` shares por minuto. Las dificultades se
+cuantizan a niveles (4 por potencia de 2) para que el target compacto de
+cada nivel se calcule una sola vez (DifficultyManager.compact_target).
+Solo cuentan para el ritmo los shares con hash verificado (record_share()
+tras la verificación local): el hash que declara el minero no basta.
+"""
+
+import math
+import time
+from collections import deque
+
+from iazar.core.difficulty_manager import DifficultyManager
+from iazar.utils.target_utils import hash_meets_threshold
+
+LEVELS_PER_OCTAVE = 4
+MAX_RETARGET_FACTOR = 4.0
+
+# Resultado de classify()
+SHARE_LOW = "low"      # No alcanza ni la dificultad del minero: se rechaza
+SHARE_LOCAL = "local"  # Cumple la del minero pero no la de la pool: se contabiliza localmente
+SHARE_POOL = "pool"    # Cumple la de la pool: se reenvía
+
+
+def quantize_difficulty(difficulty: float) -> int:
+    """Redondea la dificultad al nivel más cercano de la escala logarítmica."""
+    level = round(math.log2(max(1.0, float(difficulty))) * LEVELS_PER_OCTAVE)
+    return max(1, int(round(2 ** (level / LEVELS_PER_OCTAVE))))
+
+
+class Vardiff:
+    """
+    Estado vardiff de una conexión.
+    Args:
+        start_difficulty: dificultad inicial del minero.
+        target_spm: shares por minuto objetivo.
+        window: segundos de la ventana deslizante de shares.
+        retarget_interval: segundos mínimos entre reajustes.
+        variance: desviación relativa tolerada antes de reajustar.
+        min_difficulty / max_difficulty: límites (además, nunca por encima de la pool).
+    """
+
+    def __init__(self, start_difficulty: int = 10000, target_spm: float = 6.0, window: float = 300.0,
+                 retarget_interval: float = 30.0, variance: float = 0.3,
+                 min_difficulty: int = 1000, max_difficulty: int = 1 << 40):
+        self.target_spm = float(target_spm)
+        self.window = float(window)
+        self.retarget_interval = float(retarget_interval)
+        self.variance = float(variance)
+        self.min_difficulty = int(min_difficulty)
+        self.max_difficulty = int(max_difficulty)
+        self._shares = deque()
+        self._since = time.monotonic()
+        self._last_retarget = self._since
+        self.stats = {"local": 0, "pool": 0, "low": 0, "retargets": 0}
+        self._set(start_difficulty)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Vardiff":
+        """Crea el estado a partir de la sección proxy.vardiff de ia_config.json."""
+        return cls(**{k: v for k, v in config.items() if k != "enabled"})
+
+    def _set(self, difficulty):
+        difficulty = min(self.max_difficulty, max(self.min_difficulty, int(difficulty)))
+        self.difficulty = quantize_difficulty(difficulty)
+        self.target = DifficultyManager.compact_target(self.difficulty)
+        self.threshold = DifficultyManager.compact_threshold(self.target)
+
+    def target_for(self, pool_difficulty: float) -> tuple:
+        """
+        (target compacto, umbral) a anunciar al minero para un trabajo: el del
+        minero, salvo que la pool pida menos dificultad.
+        """
+        if pool_difficulty and pool_difficulty <= self.difficulty:
+            level = quantize_difficulty(pool_difficulty)
+            target = DifficultyManager.compact_target(level)
+            return target, DifficultyManager.compact_threshold(target)
+        return self.target, self.threshold
+
+    def classify(self, hash_bytes: bytes, pool_threshold: int) -> str:
+        """
+        Clasifica el hash de un share sin registrarlo para el ritmo de la
+        conexión (eso lo hace record_share() cuando el hash está verificado).
+        Returns:
+            str: SHARE_LOW, SHARE_LOCAL o SHARE_POOL.
+        """
+        if not hash_meets_threshold(hash_bytes, max(self.threshold, pool_threshold)):
+            self.stats[SHARE_LOW] += 1
+            return SHARE_LOW
+        verdict = SHARE_POOL if hash_meets_threshold(hash_bytes, pool_threshold) else SHARE_LOCAL
+        self.stats[verdict] += 1
+        return verdict
+
+    def record_share(self, now: float = None):
+        """Cuenta un share verificado (localmente o aceptado por la pool) en el ritmo de la conexión."""
+        self._shares.append(now if now is not None else time.monotonic())
+
+    def shares_per_minute(self, now: float = None) -> float:
+        now = now if now is not None else time.monotonic()
+        cutoff = now - self.window
+        while self._shares and self._shares[0] < cutoff:
+            self._shares.popleft()
+        elapsed = min(self.window, now - self._since)
+        return len(self._shares) * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    def retarget(self, now: float = None):
+        """
+        Reajusta la dificultad si ha pasado retarget_interval y el ritmo se
+        desvía más de `variance` del objetivo.
+        Returns:
+            int | None: nueva dificultad, o None si no cambia.
+        """
+        now = now if now is not None else time.monotonic()
+        if now - self._last_retarget < self.retarget_interval:
+            return None
+        self._last_retarget = now
+        spm = self.shares_per_minute(now)
+        if abs(spm - self.target_spm) <= self.target_spm * self.variance:
+            return None
+        # Sin shares en la ventana: bajar al máximo permitido por reajuste
+        factor = spm / self.target_spm if spm > 0 else 1.0 / MAX_RETARGET_FACTOR
+        factor = min(MAX_RETARGET_FACTOR, max(1.0 / MAX_RETARGET_FACTOR, factor))
+        previous = self.difficulty
+        self._set(self.difficulty * factor)
+        if self.difficulty == previous:
+            return None
+        # El ritmo medido pertenece a la dificultad anterior
+        self._shares.clear()
+        self._since = now
+        self.stats["retargets"] += 1
+        return self.difficulty
@@ -0,0 +1,428 @@
+"""
+ia_proxy_async.py - Proxy Stratum IA-Zar sobre asyncio.
+Mismo protocolo que ia_proxy_main.IAZarProxy (upstream subscribe+login,
+listeners plain/TLS para XMRig, soluciones de la IA por ZMQ PULL en 5556),
+pero con un único bucle de eventos: cada minero es una corrutina en lugar de
+un hilo, la conexión a la pool se lee por líneas sin recv bloqueante y el
+canal ZMQ se atiende con zmq.asyncio, sin sondeo con sleep. La lógica de
+shares (duplicados, vardiff, reparto de nonces) es la misma MinerSession.
+El handshake con la pool es el de upstream.py: la respuesta al login da el id
+de sesión (params.id de los submits) y el primer trabajo, y las reconexiones
+esperan con el mismo Backoff exponencial con jitter.
+
+Uso:
+    python -m iazar.proxy.ia_proxy_async <wallet_address> [pool_host] [pool_port]
+"""
+
+import asyncio
+import logging
+import os
+import ssl
+import sys
+
+import zmq
+import zmq.asyncio
+
+try:
+    import uvloop  # Opcional: bucle de eventos más rápido en Linux
+except ImportError:
+    uvloop = None
+
+from iazar.core.block_builder import NonceSlotAllocator
+from iazar.core.pool_job import PoolJob
+from iazar.core.randomx_handler import RandomXHandler
+from iazar.core.share_index import ShareIndex
+from iazar.core.share_verifier import get_share_verifier
+from iazar.proxy.job_broadcast import MAX_WRITE_BUFFER, JobBroadcaster, capped_stream_write
+from iazar.proxy.job_window import DEFAULT_WINDOW, JobWindow
+from iazar.proxy.miner_session import MinerSession, build_job_notify
+from iazar.proxy.upstream import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    LOGIN_TIMEOUT,
+    Backoff,
+    handshake_messages,
+    is_login_reply,
+    parse_login_reply,
+)
+from iazar.utils.config_manager import get_ia_config
+from iazar.utils.proxy_logging import HotPathLog, install_trace_signal, set_trace, setup_queue_logging
+from iazar.utils.stratum_codec import encode, loads
+from iazar.utils.submit_tracker import SubmitTracker
+from iazar.utils.target_utils import nonce_to_hex
+
+logger = logging.getLogger("IA-Zar-Proxy-Async")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SUBMIT_EXPIRY_INTERVAL = 1.0
+STATS_LOG_INTERVAL = 60.0
+LINE_LIMIT = 64 * 1024  # Longitud máxima de una línea JSON de Stratum
+
+
+class AsyncIAZarProxy:
+    def __init__(self, wallet, pool_host="127.0.0.1", pool_port=3333, pool_tls=True,
+                 listen_port=3333, listen_tls_port=3334):
+        self.wallet = wallet
+        self.pool_host = pool_host
+        self.pool_port = int(pool_port)
+        self.pool_tls = pool_tls
+        self.listen_port = listen_port
+        self.listen_tls_port = listen_tls_port
+
+        self.pool_reader = None
+        self.pool_writer = None
+        self.pool_session_id = None  # id de sesión del login: params.id de los submits
+        self.login_sent_at = None  # Pendiente de respuesta al login (None = sin login en curso)
+        self.last_job = None
+        self.last_job_notify = None
+        self.broadcaster = JobBroadcaster()
+        self.randomx = RandomXHandler()
+        self.verifier = get_share_verifier()  # Hash RandomX real de cada share de minero, por lotes
+        self.submits = SubmitTracker()  # Submits en vuelo, resueltos por id al llegar la respuesta
+
+        proxy_config = get_ia_config().get("proxy", {})
+        logging_config = proxy_config.get("logging", {})
+        self.hot = HotPathLog.from_config(logger, logging_config)
+        if logging_config.get("trace"):
+            set_trace(True)
+        self.vardiff_config = proxy_config.get("vardiff", {})
+        # Trabajos difundidos sin drain(): un minero que no lee y supera el buffer se desconecta
+        self.max_write_buffer = int(proxy_config.get("miner_write_buffer_kb", MAX_WRITE_BUFFER // 1024)) * 1024
+        upstream_config = proxy_config.get("upstream", {})
+        self.backoff = Backoff(float(upstream_config.get("backoff_base", BACKOFF_BASE)),
+                               float(upstream_config.get("backoff_max", BACKOFF_MAX)))
+        self.job_cache = JobWindow(proxy_config.get("job_window", DEFAULT_WINDOW))
+        self.share_index = ShareIndex(max_jobs=self.job_cache.max_jobs)  # Descartado con la ventana (retain_jobs)
+        # Reparto del nonce (opcional): una sola sesión de pool cubre hasta 2**bits mineros sin solaparse
+        self.nonce_slots = NonceSlotAllocator.from_config(proxy_config)
+        if self.nonce_slots is not None:
+            logger.info(f"🧩 Reparto de nonce: {self.nonce_slots.bits} bits, máximo {self.nonce_slots.capacity} "
+                        f"mineros a la vez; los siguientes se rechazan (proxy.nonce_split_bits / max_miners)")
+        else:
+            logger.info("🧩 Sin reparto de nonce: mineros sin límite, con el rango de nonce completo cada uno")
+
+        self.zmq_ctx = zmq.asyncio.Context()
+        self.proxy_sender = self.zmq_ctx.socket(zmq.PUSH)
+        self.proxy_sender.bind("tcp://127.0.0.1:5555")
+        self.proxy_receiver = self.zmq_ctx.socket(zmq.PULL)
+        self.proxy_receiver.bind("tcp://127.0.0.1:5556")
+        logger.info("🔌 Sockets ZMQ (asyncio) configurados")
+
+    # ----------- POOL UPSTREAM -----------
+    async def connect_to_pool(self):
+        ssl_ctx = None
+        if self.pool_tls:
+            ssl_ctx = ssl.create_default_context()
+            ssl_ctx.check_hostname = False
+            ssl_ctx.verify_mode = ssl.CERT_NONE
+        self.pool_reader, self.pool_writer = await asyncio.wait_for(
+            asyncio.open_connection(self.pool_host, self.pool_port, ssl=ssl_ctx, limit=LINE_LIMIT),
+            timeout=10,
+        )
+        logger.info(f"🔌 Conexión con pool establecida: {self.pool_host}:{self.pool_port} (TLS={self.pool_tls})")
+        self.login_sent_at = asyncio.get_running_loop().time()
+        for message in handshake_messages(self.wallet):
+            await self.send_pool(message)
+        logger.info("🔑 subscribe + login enviados a la pool")
+
+    async def send_pool(self, message: dict):
+        self.pool_writer.write(encode(message))
+        await self.pool_writer.drain()
+
+    async def pool_loop(self):
+        """
+        Lee la pool línea a línea; si se cae (o rechaza el login) reconecta tras
+        la espera del backoff, sin tocar a los mineros.
+        """
+        while True:
+            try:
+                if self.pool_writer is None:
+                    await self.connect_to_pool()
+                line = await self.pool_reader.readline()
+                if not line:
+                    raise ConnectionError("Pool cerró la conexión")
+                self.handle_pool_line(line)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.close_pool()
+                delay = self.backoff.next_delay()
+                logger.error(f"🔌 Error conexión pool: {e} (reintento en {delay:.1f}s)")
+                await asyncio.sleep(delay)
+
+    def close_pool(self):
+        if self.pool_writer is not None:
+            self.pool_writer.close()
+        self.pool_reader = self.pool_writer = None
+        self.pool_session_id = None
+        self.login_sent_at = None
+        self.submits.fail_all()
+
+    def handle_login_reply(self, message: dict):
+        """Sesión lista: id de sesión para los submits y, si viene, el primer trabajo. Login rechazado -> ConnectionError."""
+        self.pool_session_id, job_params = parse_login_reply(message, f"{self.pool_host}:{self.pool_port}")
+        self.login_sent_at = None
+        self.backoff.reset()
+        logger.info(f"🔑 Login aceptado por la pool (sesión {self.pool_session_id})")
+        if job_params:
+            job = self.parse_job_message(job_params)
+            if job:
+                self.set_job(job)
+
+    def handle_pool_line(self, line: bytes):
+        try:
+            message = loads(line)
+        except ValueError:
+            logger.warning("⚠️ Pool mensaje no JSON: %.200r", line)
+            return
+        self.hot.debug("pool_message", "🔷 Respuesta pool: %s", message)
+        if self.login_sent_at is not None and is_login_reply(message):
+            self.handle_login_reply(message)
+            return
+        verdict = self.submits.resolve(message)
+        if verdict is not None:
+            self.log_submit_result(verdict)
+            return
+        method = message.get("method")
+        if method in ("job", "mining.job", "mining.notify"):
+            job = self.parse_job_message(message.get("params", []))
+            if job:
+                self.set_job(job)
+        elif method in ("set_difficulty", "mining.set_difficulty"):
+            logger.info("📏 mining.set_difficulty recibido: %s", message.get("params"))
+        elif method == "mining.ping":
+            asyncio.ensure_future(self.send_pool({"id": message.get("id"), "method": "mining.pong", "params": []}))
+        elif message.get("error") is not None:
+            logger.warning("🔴 Error pool: %s", message["error"])
+        elif message.get("result") is not None and message.get("id") is not None:
+            logger.info("🟢 Respuesta pool (id=%s): %s", message["id"], message["result"])
+
+    def parse_job_message(self, params):
+        try:
+            job = PoolJob.from_params(params)
+        except Exception as e:
+            logger.error(f"❌ Error parseando trabajo: {e}")
+            return None
+        if job is None:
+            logger.error(f"❌ mining.notify inesperado: {type(params)}")
+            return None
+        for seed in (job.seed_hash, job.next_seed_hash):
+            if seed and self.randomx.prefetch_seed(seed):
+                logger.info(f"🧬 Precalentando época RandomX para seed {seed.hex()[:16]}...")
+        return job
+
+    def set_job(self, job):
+        evicted = self.job_cache.add(job)
+        if evicted:
+            self.share_index.retain_jobs(self.job_cache.job_ids())
+            for job_id in evicted:
+                self.verifier.forget_job(job_id)
+        self.last_job = job
+        self.last_job_notify = build_job_notify(job, job.target)
+        sent = self.broadcaster.publish(job)
+        logger.info("📥 Trabajo recibido de pool | Altura: %s Dif: %s | Difundido a %d mineros",
+                    job.height or "N/A", job.difficulty, sent)
+
+    async def submit_share(self, job_id, nonce_hex, result_hex):
+        if self.pool_writer is None or self.pool_session_id is None:
+            logger.warning(f"⚠️ Share descartado, pool desconectada o sin sesión de login: job={job_id}")
+            return
+        req_id, _ = self.submits.register(info={"job_id": job_id, "nonce": nonce_hex})
+        submit_msg = {
+            "id": req_id,
+            "method": "submit",
+            "params": {
+                "id": self.pool_session_id,
+                "job_id": job_id,
+                "nonce": nonce_hex,
+                "result": result_hex,
+                "algo": "rx/0"
+            }
+        }
+        try:
+            await self.send_pool(submit_msg)
+        except OSError as e:
+            self.submits.discard(req_id)
+            logger.error(f"❌ Share no enviado ({job_id}): {e}")
+            return
+        self.hot.info("share_sent", "🚀 Share enviado a pool (id=%s): %s", req_id, submit_msg["params"])
+
+    def log_submit_result(self, verdict):
+        info = verdict["info"]
+        if verdict["accepted"]:
+            self.hot.info("share_result", "🟢 Share aceptado (id=%s, job=%s) en %.1fms",
+                          verdict["id"], info["job_id"], verdict["rtt_ms"])
+        else:
+            self.hot.warning("share_rejected", "🔴 Share no aceptado (id=%s, job=%s): %s",
+                             verdict["id"], info["job_id"], verdict["error"])
+
+    async def housekeeping_loop(self):
+        """
+        Los submits sin respuesta tras el timeout se dan por fallidos, un login
+        sin respuesta corta la conexión (pool_loop reconecta con backoff) y
+        resumen periódico de logs suprimidos.
+        """
+        loop = asyncio.get_running_loop()
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(SUBMIT_EXPIRY_INTERVAL)
+            for verdict in self.submits.expire():
+                self.log_submit_result(verdict)
+            if self.login_sent_at is not None and loop.time() - self.login_sent_at > LOGIN_TIMEOUT:
+                logger.warning(f"⏱️ Login sin respuesta en {LOGIN_TIMEOUT:.0f}s, cerrando conexión con la pool")
+                self.login_sent_at = None
+                if self.pool_writer is not None:
+                    self.pool_writer.close()  # readline() devuelve EOF y pool_loop reconecta
+            elapsed += SUBMIT_EXPIRY_INTERVAL
+            if elapsed >= STATS_LOG_INTERVAL:
+                elapsed = 0.0
+                self.hot.log_suppressed()
+
+    # ----------- SOLUCIONES IA (ZMQ) -----------
+    async def solution_loop(self):
+        while True:
+            # Un mensaje mal formado de la IA se descarta: no debe tumbar el gather del proxy
+            try:
+                solution_msg = await self.proxy_receiver.recv_json()
+                if not isinstance(solution_msg, dict) or solution_msg.get("type") != "solution":
+                    continue
+                sol = solution_msg["data"]
+                self.hot.info("solution", "🧠 Solución IA recibida: %s", sol)
+                job_id, nonce = sol["job_id"], int(sol["nonce"])
+                if self.job_cache.check(job_id, sol.get("source", "ia")) is None:
+                    self.hot.warning("solution_dropped", "⌛ Solución IA stale descartada: job=%s ya no está activo", job_id)
+                    continue
+                if self.share_index.check_and_add(job_id, nonce):
+                    await self.submit_share(job_id, nonce_to_hex(nonce), sol["hash"])
+                else:
+                    self.hot.warning("solution_dropped", "♻️ Solución IA duplicada descartada: job=%s nonce=%s",
+                                     job_id, nonce)
+            except (KeyError, ValueError, TypeError) as e:
+                self.hot.warning("solution_dropped", "❌ Solución IA mal formada descartada: %r", e)
+
+    # ----------- MINEROS -----------
+    async def handle_miner(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        session = MinerSession(addr, self.vardiff_config, self.nonce_slots)
+        if self.nonce_slots is not None and session.slot is None:
+            logger.warning(f"🚫 [{addr}] Sin slots de nonce libres ({self.nonce_slots.capacity}), conexión rechazada")
+            writer.close()
+            return
+        self.hot.info("miner_connection", "🖥️ Nuevo minero desde %s", addr)
+        subscribed = False
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    message = loads(line)
+                except ValueError:
+                    self.hot.warning("miner_data", "⚠️ [%s] Mensaje no JSON: %.100r", addr, line)
+                    continue
+                if message.get("method") in ("submit", "mining.submit"):
+                    await self.handle_miner_submit(writer, session, message)
+                elif not subscribed:
+                    self.broadcaster.subscribe(session, capped_stream_write(writer, self.max_write_buffer))
+                    subscribed = True
+                else:
+                    frame = self.broadcaster.frame_for(session)
+                    if frame:
+                        writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            self.hot.warning("miner_connection", "❌ Minero %s desconectado: %s", addr, e)
+        finally:
+            self.broadcaster.unsubscribe(session)
+            self.job_cache.forget_source(session.source)
+            session.close()
+            writer.close()
+
+    async def handle_miner_submit(self, writer, session, message):
+        error, share = session.check_submit(message.get("params"), self.share_index, self.job_cache)
+        if not error:
+            # El hash se verifica en los hilos del ShareVerifier sin bloquear el bucle
+            job, nonce, nonce_hex, result = share
+            try:
+                verdict = await asyncio.wrap_future(session.verify_share(self.verifier, job, nonce, result))
+            except Exception as e:
+                logger.error(f"❌ [{session.addr}] Error verificando share: {e}")
+                verdict = None
+            error, forward = session.on_verified(verdict, job) if verdict else ("Invalid share", False)
+        if error:
+            self.hot.warning("share_rejected", "♻️ [%s] Share rechazado: %s", session.addr, error)
+            self.reply_miner(writer, message.get("id"), error=error)
+            return
+        if forward:
+            await self.submit_share(job.job_id, nonce_hex, verdict["hash"].hex())
+        self.reply_miner(writer, message.get("id"), result={"status": "OK"})
+        difficulty = session.retarget()
+        frame = self.broadcaster.frame_for(session) if difficulty is not None else None
+        if frame:
+            self.hot.info("vardiff", "🎚️ [%s] Vardiff: nueva dificultad %s", session.addr, difficulty)
+            writer.write(frame)
+
+    @staticmethod
+    def reply_miner(writer, req_id, result=None, error=None):
+        reply = {"id": req_id, "jsonrpc": "2.0", "result": result,
+                 "error": {"code": -1, "message": error} if error else None}
+        writer.write(encode(reply))
+
+    def tls_context(self):
+        crt_path = os.path.join(BASE_DIR, "certs", "iazar_proxy.crt")
+        key_path = os.path.join(BASE_DIR, "certs", "iazar_proxy.key")
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.load_cert_chain(certfile=crt_path, keyfile=key_path)
+        return context
+
+    async def start_listeners(self) -> list:
+        servers = [await asyncio.start_server(self.handle_miner, "0.0.0.0", self.listen_port,
+                                              limit=LINE_LIMIT, backlog=1024)]
+        logger.info(f"🖥️ Listener plain abierto en puerto {self.listen_port}")
+        try:
+            servers.append(await asyncio.start_server(self.handle_miner, "0.0.0.0", self.listen_tls_port,
+                                                      ssl=self.tls_context(), limit=LINE_LIMIT, backlog=1024))
+            logger.info(f"🖥️ Listener TLS abierto en puerto {self.listen_tls_port}")
+        except (OSError, ssl.SSLError) as e:
+            logger.error(f"❌ Listener TLS error: {e}")
+        return servers
+
+    async def run(self):
+        logger.info("🏁 Bucle principal proxy (asyncio) activo")
+        servers = await self.start_listeners()
+        try:
+            await asyncio.gather(self.pool_loop(), self.solution_loop(), self.housekeeping_loop())
+        finally:
+            for server in servers:
+                server.close()
+            self.close_pool()
+            self.zmq_ctx.destroy(linger=0)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Uso: python -m iazar.proxy.ia_proxy_async <wallet_address> [pool_host] [pool_port]")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    setup_queue_logging()
+    install_trace_signal()
+    proxy = AsyncIAZarProxy(
+        argv[0],
+        pool_host=argv[1] if len(argv) > 1 else "127.0.0.1",
+        pool_port=int(argv[2]) if len(argv) > 2 else 3333,
+    )
+    if uvloop is not None:
+        uvloop.install()
+    try:
+        asyncio.run(proxy.run())
+    except KeyboardInterrupt:
+        logger.info("Proxy detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@ import sys
 import os
 import ssl
 import zmq
-import json
 import time
 import socket
 import logging
@@ -24,6 +23,25 @@ for path in [SRC_DIR, IAZAR_DIR]:
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
 
+from iazar.core.block_builder import NonceSlotAllocator
+from iazar.core.pool_job import PoolJob
+from iazar.core.randomx_handler import RandomXHandler
+from iazar.core.share_index import ShareIndex
+from iazar.core.share_verifier import get_share_verifier
+from iazar.proxy.job_broadcast import MAX_WRITE_BUFFER, MINER_SOCKET_TIMEOUT, JobBroadcaster, MinerWriter
+from iazar.proxy.job_window import DEFAULT_WINDOW, JobWindow
+from iazar.proxy.miner_session import MinerSession, build_job_notify
+from iazar.proxy.upstream import PoolEndpoint, UpstreamManager
+from iazar.utils.config_manager import get_ia_config, get_miner_config
+from iazar.utils.latency import LatencyRecorder
+from iazar.utils.proxy_logging import HotPathLog, install_trace_signal, set_trace, setup_queue_logging
+from iazar.utils.stratum_codec import StratumDecoder, encode
+from iazar.utils.target_utils import nonce_to_hex
+
+POLL_TIMEOUT_MS = 1000  # Sin eventos, el bucle despierta solo para tareas periódicas
+MAINTAIN_INTERVAL = 0.25  # Reintentos y vigilancia de enlaces upstream
+STATS_LOG_INTERVAL = 60.0
+
 # ==== CLASE PRINCIPAL ====
 class IAZarProxy:
     def __init__(self, wallet, pool_host="127.0.0.1", pool_port=3333, pool_tls=True, listen_port=3333, listen_tls_port=3334):
@@ -34,10 +52,35 @@ class IAZarProxy:
         self.listen_port = listen_port
         self.listen_tls_port = listen_tls_port
 
-        self.conn = None
-        self.job_cache = {}
         self.last_job = None
         self.last_job_notify = None
+        self.randomx = RandomXHandler()  # Motor compartido: precalienta épocas de seed
+        self.broadcaster = JobBroadcaster()  # Trabajos nuevos a todos los mineros en cuanto llegan
+        self.solution_latency = LatencyRecorder()  # Solución IA recibida -> submit enviado a la pool
+        self.verifier = get_share_verifier()  # Hash RandomX real de cada share de minero, por lotes
+        proxy_config = get_ia_config().get("proxy", {})
+        # Eventos de alta frecuencia: muestreo, límite de tasa y formato perezoso
+        logging_config = proxy_config.get("logging", {})
+        self.hot = HotPathLog.from_config(logger, logging_config)
+        if logging_config.get("trace"):
+            set_trace(True)
+        # Pool principal + respaldos (ia_config proxy.upstream y backup_pool de miner_config), todas en caliente
+        self.upstream = UpstreamManager.from_config(
+            wallet, PoolEndpoint(pool_host, pool_port, pool_tls), proxy_config, self._miner_config())
+        self.vardiff_config = proxy_config.get("vardiff", {})
+        # Un solo hilo escribe a todos los mineros; el que no lee y supera el buffer se desconecta
+        self.miner_writer = MinerWriter(int(proxy_config.get("miner_write_buffer_kb", MAX_WRITE_BUFFER // 1024)) * 1024)
+        # Últimos K trabajos difundidos: los shares de trabajos expulsados se descartan como stale
+        self.job_cache = JobWindow(proxy_config.get("job_window", DEFAULT_WINDOW))
+        # (job_id, nonce) ya enviados: duplicados fuera antes de la pool, mientras el trabajo siga en la ventana
+        self.share_index = ShareIndex(max_jobs=self.job_cache.max_jobs)
+        # Reparto del nonce (opcional): una sola sesión de pool cubre hasta 2**bits mineros sin solaparse
+        self.nonce_slots = NonceSlotAllocator.from_config(proxy_config)
+        if self.nonce_slots is not None:
+            logger.info(f"🧩 Reparto de nonce: {self.nonce_slots.bits} bits, máximo {self.nonce_slots.capacity} "
+                        f"mineros a la vez; los siguientes se rechazan (proxy.nonce_split_bits / max_miners)")
+        else:
+            logger.info("🧩 Sin reparto de nonce: mineros sin límite, con el rango de nonce completo cada uno")
 
         # ZMQ para IA
         zmq_context = zmq.Context()
@@ -54,43 +97,22 @@ class IAZarProxy:
         self.start_miners_listener()
 
     # ----------- POOL UPSTREAM -----------
-    def connect_to_pool(self):
+    @staticmethod
+    def _miner_config():
         try:
-            raw_sock = socket.create_connection((self.pool_host, int(self.pool_port)), timeout=10)
-            if self.pool_tls:
-                context = ssl.create_default_context()
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-                self.conn = context.wrap_socket(raw_sock, server_hostname=self.pool_host)
-            else:
-                self.conn = raw_sock
-            logger.info(f"🔌 Conexión TCP TLS establecida: {self.pool_host}:{self.pool_port}")
-
-            # --- HANDSHAKE STRATUM MONERO ---
-            # 1. mining.subscribe
-            subscribe_msg = {
-                "id": 1,
-                "method": "mining.subscribe",
-                "params": ["IA-ZarProxy/6.22.2"]  # user agent típico de XMRig
-            }
-            self.conn.send((json.dumps(subscribe_msg) + "\n").encode())
-            logger.info("📡 mining.subscribe enviado a la pool")
-
-            # 2. login para pools Monero (HashVault, SupportXMR, etc)
-            login_msg = {
-                "id": 2,
-                "method": "login",
-                "params": {
-                    "login": self.wallet,
-                    "pass": "x",
-                    "agent": "IA-ZarProxy"
-                }
-            }
-            self.conn.send((json.dumps(login_msg) + "\n").encode())
-            logger.info("🔑 login enviado a la pool")
+            return get_miner_config()
         except Exception as e:
-            logger.error(f"❌ Error conectando a pool: {e}")
-            sys.exit(1)
+            logger.warning(f"⚠️ miner_config no disponible, sin pool de respaldo: {e}")
+            return {}
+
+    def connect_to_pool(self):
+        connected = self.upstream.connect_all()
+        pools = ", ".join(repr(link.endpoint) for link in self.upstream.links)
+        if connected:
+            logger.info(f"🔌 {connected}/{len(self.upstream.links)} pools conectadas ({pools}), activa: {self.upstream.active.endpoint}")
+        else:
+            # Sin salir: los enlaces se reintentan desde el bucle principal
+            logger.error(f"❌ Ninguna pool disponible ({pools}), reintentando...")
 
     # ----------- LISTENER PARA MINEROS (XMRig) -----------
     def start_miners_listener(self):
@@ -106,7 +128,7 @@ class IAZarProxy:
             logger.info(f"🖥️ Listener plain abierto en puerto {self.listen_port}")
             while True:
                 client_sock, addr = s.accept()
-                logger.info(f"🖥️ Nuevo minero (plain) desde {addr}")
+                self.hot.info("miner_connection", "🖥️ Nuevo minero (plain) desde %s", addr)
                 threading.Thread(target=self.handle_miner, args=(client_sock, addr), daemon=True).start()
         except Exception as e:
             logger.error(f"❌ Listener plain error: {e}")
@@ -128,151 +150,326 @@ class IAZarProxy:
                 raw_sock, addr = s.accept()
                 try:
                     client_sock = context.wrap_socket(raw_sock, server_side=True)
-                    logger.info(f"🖥️ Nuevo minero (TLS) desde {addr}")
+                    self.hot.info("miner_connection", "🖥️ Nuevo minero (TLS) desde %s", addr)
                     threading.Thread(target=self.handle_miner, args=(client_sock, addr), daemon=True).start()
                 except Exception as e:
-                    logger.warning(f"⚠️ Fallo handshake TLS con minero {addr}: {e}")
+                    self.hot.warning("miner_connection", "⚠️ Fallo handshake TLS con minero %s: %s", addr, e)
         except Exception as e:
             logger.error(f"❌ Listener TLS error: {e}")
 
     # ------------- GESTIÓN DE MINEROS -------------
     def handle_miner(self, sock, addr):
+        session = MinerSession(addr, self.vardiff_config, self.nonce_slots)
+        if self.nonce_slots is not None and session.slot is None:
+            logger.warning(f"🚫 [{addr}] Sin slots de nonce libres ({self.nonce_slots.capacity}), conexión rechazada")
+            sock.close()
+            return
+        decoder = StratumDecoder()
+        sock.settimeout(MINER_SOCKET_TIMEOUT)  # Descriptor no bloqueante para el MinerWriter compartido
+        writer = self.miner_writer.connection(sock)
+        subscribed = False
         try:
             while True:
-                data = sock.recv(4096)
+                try:
+                    data = sock.recv(4096)
+                except socket.timeout:
+                    continue  # Minero callado: el timeout solo existe por el escritor
                 if not data:
                     break
-                logger.info(f"⛏️ [{addr}] Recibido: {data[:100]}...")
-                if self.last_job_notify:
-                    sock.send(json.dumps(self.last_job_notify).encode())
+                self.hot.debug("miner_data", "⛏️ [%s] Recibido: %.100r...", addr, data)
+                for message in decoder.feed(data):
+                    if message.get("method") in ("submit", "mining.submit"):
+                        self.handle_miner_submit(writer, session, message)
+                    elif not subscribed:
+                        # Primer mensaje (login): desde aquí recibe cada trabajo nuevo al instante
+                        self.broadcaster.subscribe(session, writer.send)
+                        subscribed = True
+                    else:
+                        frame = self.broadcaster.frame_for(session)
+                        if frame:
+                            writer.send(frame)
         except Exception as e:
-            logger.warning(f"❌ Minero {addr} desconectado: {e}")
+            self.hot.warning("miner_connection", "❌ Minero %s desconectado: %s", addr, e)
         finally:
+            self.broadcaster.unsubscribe(session)
+            self.job_cache.forget_source(session.source)
+            session.close()
+            writer.close()
             sock.close()
 
+    def handle_miner_submit(self, writer, session, message):
+        """
+        Share de un minero: duplicados, nonces fuera de su tramo, stale y hash
+        declarado de baja dificultad se rechazan sin hashear; el resto se
+        verifica con RandomX (ShareVerifier) antes de reenviarlo a la pool. Con
+        vardiff, los que cumplen el target del minero pero no el de la pool
+        solo se contabilizan. La respuesta sale desde on_share_verified: el
+        hilo de la conexión no espera al veredicto y sigue leyendo.
+        """
+        req_id = message.get("id")
+        with session.lock:
+            error, share = session.check_submit(message.get("params"), self.share_index, self.job_cache)
+        if error:
+            self.hot.warning("share_rejected", "♻️ [%s] Share rechazado: %s", session.addr, error)
+            self.reply_miner(writer, req_id, error=error)
+            return
+        job, nonce, nonce_hex, result = share
+        session.verify_share(
+            self.verifier, job, nonce, result,
+            callback=lambda future: self.on_share_verified(writer, session, req_id, job, nonce_hex, future))
+
+    def on_share_verified(self, writer, session, req_id, job, nonce_hex, future):
+        """Veredicto del ShareVerifier (en su hilo): responde al minero y reenvía el share a la pool."""
+        try:
+            verdict = future.result()
+        except Exception as e:
+            logger.error(f"❌ [{session.addr}] Error verificando share: {e}")
+            verdict = None
+        with session.lock:
+            error, forward = session.on_verified(verdict, job) if verdict else ("Invalid share", False)
+        if error:
+            self.hot.warning("share_rejected", "♻️ [%s] Share rechazado: %s", session.addr, error)
+            self.reply_miner(writer, req_id, error=error)
+            return
+        if forward:
+            self.submit_share(job.job_id, nonce_hex, verdict["hash"].hex())
+        self.reply_miner(writer, req_id, result={"status": "OK"})
+        self.retarget_miner(writer, session)
+
+    def reply_miner(self, writer, req_id, result=None, error=None):
+        reply = {"id": req_id, "jsonrpc": "2.0", "result": result,
+                 "error": {"code": -1, "message": error} if error else None}
+        writer.send(encode(reply))
+
+    def retarget_miner(self, writer, session):
+        """Si vardiff reajusta la dificultad, reenvía el trabajo con el nuevo target del minero."""
+        with session.lock:
+            difficulty = session.retarget()
+        if difficulty is not None:
+            frame = self.broadcaster.frame_for(session)
+            if frame:
+                self.hot.info("vardiff", "🎚️ [%s] Vardiff: nueva dificultad %s", session.addr, difficulty)
+                writer.send(frame)
+
     # ------------- POOL (UPSTREAM) -------------
     def parse_job_message(self, params):
+        """Decodifica el trabajo una sola vez (blob/seed a bytes, target a umbral de 64 bits)."""
         try:
-            logger.info(f"🔎 mining.notify params: {params}")
-            if isinstance(params, list):
-                job = {
-                    "id": params[0] if len(params) > 0 else None,
-                    "blob": params[1] if len(params) > 1 else None,
-                    "seed_hash": params[2] if len(params) > 2 else None,
-                    "target": params[3] if len(params) > 3 else None,
-                    "height": params[4] if len(params) > 4 else None,
-                    "difficulty": float(params[5]) if len(params) > 5 and params[5] is not None else 0.0
-                }
-            elif isinstance(params, dict):
-                job = {
-                    "id": params.get("job_id"),
-                    "blob": params.get("blob"),
-                    "seed_hash": params.get("seed_hash"),
-                    "target": params.get("target"),
-                    "height": params.get("height"),
-                    "difficulty": float(params.get("difficulty", 0.0))
-                }
-            else:
-                logger.error(f"❌ mining.notify tipo inesperado: {type(params)}")
+            self.hot.debug("job_detail", "🔎 mining.notify params: %s", params)
+            job = PoolJob.from_params(params)
+            if job is None:
+                logger.error(f"❌ mining.notify inesperado: {type(params)}")
                 return None
-            logger.info(f"✅ Job parseado: {job}")
+            self.hot.debug("job_detail", "✅ Job parseado: %s", job)
+            self.prefetch_seeds(job)
             return job
         except Exception as e:
             logger.error(f"❌ Error parseando trabajo: {e}")
             logger.error(f"Params recibidos: {params}")
             return None
 
-    def handle_ping(self, message):
+    def prefetch_seeds(self, job):
+        """
+        Precalienta en segundo plano la época RandomX de una seed nueva o de la
+        next_seed_hash anunciada, para no pagar la inicialización en el hot path.
+        """
+        for seed in (job.seed_hash, job.next_seed_hash):
+            if seed and self.randomx.prefetch_seed(seed):
+                logger.info(f"🧬 Precalentando época RandomX para seed {seed.hex()[:16]}...")
+
+    def handle_ping(self, link, message):
         try:
             pong = {"id": message.get("id"), "method": "mining.pong", "params": []}
-            self.conn.send(json.dumps(pong).encode())
+            link.send(pong)
             logger.info("🏓 Pong enviado a pool")
         except Exception as e:
             logger.error(f"❌ Error manejando ping: {e}")
 
     # ---- RUN CON INTEGRACIÓN DE SHARES IA ----
     def run(self):
+        """
+        Bucle dirigido por eventos: un único zmq.Poller espera a la vez los
+        sockets de las pools y el PULL de soluciones IA, y atiende el que esté
+        listo en el momento (sin sleep ni sondeo).
+        """
         logger.info("🏁 Bucle principal proxy activo")
+        poller = zmq.Poller()
+        poller.register(self.proxy_receiver, zmq.POLLIN)
+        polled = {}  # enlace -> socket registrado en el poller
+        last_stats = last_maintain = time.monotonic()
         while True:
             try:
-                job = self.get_next_job()
-                if job:
-                    self.last_job = job
-                    self.last_job_notify = {
-                        "id": None,
-                        "method": "mining.notify",
-                        "params": [
-                            job['id'],
-                            job['blob'],
-                            job['seed_hash'],
-                            job['target'],
-                            True
-                        ]
-                    }
-                    logger.info(f"📥 Trabajo recibido de pool | Altura: {job.get('height', 'N/A')} Dif: {job.get('difficulty')}")
-
-                # <--- NUEVO: Recibe soluciones de la IA
-                try:
-                    solution_msg = self.proxy_receiver.recv_json(flags=zmq.NOBLOCK)
-                except zmq.Again:
-                    solution_msg = None
-                if solution_msg and solution_msg.get("type") == "solution":
-                    sol = solution_msg["data"]
-                    logger.info(f"🧠 Solución IA recibida: {sol}")
-                    # REENVÍO DEL SHARE a la POOL
-                    submit_msg = {
-                        "id": 3,
-                        "method": "submit",
-                        "params": {
-                            "id": self.last_job.get("id"),
-                            "job_id": sol["job_id"],
-                            "nonce": format(sol["nonce"], "08x"),
-                            "result": sol["hash"],
-                            "algo": "rx/0"
-                        }
-                    }
-                    self.conn.send((json.dumps(submit_msg) + "\n").encode())
-                    logger.info(f"🚀 Share enviado a pool: {submit_msg['params']}")
-
-                time.sleep(0.1)
+                self.sync_poller(poller, polled)
+                # Mensajes ya decodificados o bytes ya descifrados en el buffer TLS:
+                # el socket no aparecerá como legible, hay que procesarlos sin esperar
+                pending = [link for link in polled if link.has_pending()]
+                events = dict(poller.poll(0 if pending else POLL_TIMEOUT_MS))
+
+                if self.proxy_receiver in events:
+                    self.drain_solutions()
+                for link, sock in list(polled.items()):
+                    if link in pending or sock.fileno() in events:
+                        job = self.read_pool(link)
+                        if job:
+                            self.publish_job(job)
+
+                now = time.monotonic()
+                if now - last_maintain >= MAINTAIN_INTERVAL:
+                    last_maintain = now
+                    for job in self.upstream.maintain():
+                        self.publish_job(job)
+                if now - last_stats >= STATS_LOG_INTERVAL:
+                    last_stats = now
+                    self.log_stats()
             except Exception as e:
                 logger.error(f"⚠️ Error en bucle principal: {e}")
                 traceback.print_exc()
 
-    def get_next_job(self):
+    def sync_poller(self, poller, polled):
+        """Registra los sockets de pools recién conectadas y retira los de las caídas."""
+        for link, sock in list(polled.items()):
+            if link.sock is not sock:
+                poller.unregister(sock)
+                del polled[link]
+        for link in self.upstream.links_connected():
+            if link not in polled:
+                sock = link.sock
+                if sock is not None:
+                    poller.register(sock, zmq.POLLIN)
+                    polled[link] = sock
+
+    def read_pool(self, link):
+        """Lee de un enlace y procesa sus mensajes; devuelve el trabajo a difundir, o None."""
         try:
-            data = self.conn.recv(4096).decode()
-            if not data:
-                return None
-            for msg in data.strip().split('\n'):
-                if not msg:
-                    continue
+            link.read()
+        except (OSError, ssl.SSLError) as e:
+            return self.upstream.fail(link, e)
+        return self.process_pool_messages(link)
+
+    def log_stats(self):
+        stats = self.solution_latency.summary()
+        if stats["count"]:
+            logger.info(f"⏱️ Solución→submit: p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms "
+                        f"({stats['count']} soluciones)")
+        for link in self.upstream.links:
+            lag, rtt = link.notify_lag.summary(), link.submits.rtt.summary()
+            logger.info(f"📶 Pool {link.endpoint}{' [activa]' if link is self.upstream.active else ''}: "
+                        f"{'conectada' if link.connected else 'caída'}, notify +{lag['p50_ms']:.1f}ms (p50), "
+                        f"submit RTT p50={rtt['p50_ms']:.1f}ms p99={rtt['p99_ms']:.1f}ms, "
+                        f"{link.submits.in_flight()} en vuelo")
+        for source, rate in self.job_cache.stale_rates().items():
+            if rate["stale"]:
+                logger.info(f"⌛ Stale {source}: {rate['stale']}/{rate['shares']} ({rate['rate']:.1%})")
+        self.hot.log_suppressed()
+
+    def publish_job(self, job):
+        evicted = self.job_cache.add(job)
+        if evicted:
+            self.share_index.retain_jobs(self.job_cache.job_ids())
+            for job_id in evicted:
+                self.verifier.forget_job(job_id)
+            logger.info("🗑️ Trabajos expulsados de la ventana: %s", evicted)
+        self.last_job = job
+        self.last_job_notify = build_job_notify(job, job.target)
+        sent = self.broadcaster.publish(job)
+        logger.info("📥 Trabajo recibido de pool | Altura: %s Dif: %s | Difundido a %d mineros",
+                    job.height or "N/A", job.difficulty, sent)
+
+    def drain_solutions(self):
+        """Procesa todas las soluciones IA ya recibidas en el PULL."""
+        while True:
+            try:
+                solution_msg = self.proxy_receiver.recv_json(flags=zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            received_at = time.perf_counter()
+            if not solution_msg or solution_msg.get("type") != "solution":
+                continue
+            sol = solution_msg["data"]
+            self.hot.info("solution", "🧠 Solución IA recibida: %s", sol)
+            if self.job_cache.check(sol["job_id"], sol.get("source", "ia")) is None:
+                self.hot.warning("solution_dropped", "⌛ Solución IA stale descartada: job=%s ya no está activo", sol["job_id"])
+                continue
+            # REENVÍO DEL SHARE a la POOL (salvo duplicado ya enviado)
+            if self.share_index.check_and_add(sol["job_id"], int(sol["nonce"])):
+                self.submit_share(sol["job_id"], nonce_to_hex(sol["nonce"]), sol["hash"])
+                self.solution_latency.record(time.perf_counter() - received_at)
+            else:
+                self.hot.warning("solution_dropped", "♻️ Solución IA duplicada descartada: job=%s nonce=%s",
+                                 sol["job_id"], sol["nonce"])
+
+    def submit_share(self, job_id, nonce_hex, result_hex):
+        """
+        Envía el share sin esperar la respuesta: el id lo asigna el tracker del
+        enlace y la respuesta de la pool se resuelve en process_pool_messages,
+        en cualquier orden, mientras siguen llegando trabajos. params.id (id de
+        sesión del login) lo pone el manager; sin sesión el share no se envía.
+        """
+        submit_msg = {
+            "method": "submit",
+            "params": {
+                "job_id": job_id,
+                "nonce": nonce_hex,
+                "result": result_hex,
+                "algo": "rx/0"
+            }
+        }
+        try:
+            link, _ = self.upstream.submit(job_id, submit_msg, info={"job_id": job_id, "nonce": nonce_hex},
+                                           callback=self.on_submit_result)
+        except OSError as e:
+            # La caída del enlace la detecta y resuelve el bucle principal
+            logger.error(f"❌ Share no enviado ({job_id}): {e}")
+            return
+        self.hot.info("share_sent", "🚀 Share enviado a pool %s (id=%s): %s", link.endpoint, submit_msg["id"],
+                      submit_msg["params"])
+
+    def on_submit_result(self, verdict):
+        info = verdict["info"]
+        if verdict["accepted"]:
+            self.hot.info("share_result", "🟢 Share aceptado (id=%s, job=%s, nonce=%s) en %.1fms",
+                          verdict["id"], info["job_id"], info["nonce"], verdict["rtt_ms"])
+        else:
+            self.hot.warning("share_rejected", "🔴 Share no aceptado (id=%s, job=%s, nonce=%s): %s",
+                             verdict["id"], info["job_id"], info["nonce"], verdict["error"])
+
+    def process_pool_messages(self, link):
+        """
+        Procesa los mensajes ya decodificados de un enlace hasta el primer
+        trabajo a difundir; el resto queda en cola para la siguiente vuelta.
+        """
+        while link.messages:
+            message = link.messages.popleft()
+            self.hot.debug("pool_message", "🔷 Respuesta pool %s: %s", link.endpoint, message)  # Traza: todos los mensajes
+
+            if message.get("method") in ["set_difficulty", "mining.set_difficulty"]:
+                logger.info("📏 mining.set_difficulty recibido: %s", message.get("params"))
+            if message.get("method") == "mining.ping":
+                self.handle_ping(link, message)
+            job_params = None
+            if link.is_login_reply(message):
+                # La respuesta de login trae el id de sesión y normalmente el primer trabajo
                 try:
-                    logger.info(f"🔷 Respuesta pool: {msg}")  # <--- LOGUEA TODAS LAS RESPUESTAS CRUDAS DE LA POOL
-                    message = json.loads(msg)
-                except json.JSONDecodeError:
-                    logger.warning(f"⚠️ Pool mensaje no JSON: {msg}")
-                    continue
-
-                if message.get("method") in ["set_difficulty", "mining.set_difficulty"]:
-                    logger.info(f"📏 mining.set_difficulty recibido: {message.get('params')}")
-                if message.get("method") in ["job", "mining.job", "mining.notify"]:
-                    logger.info(f"🚀 Nuevo trabajo pool: {message.get('params')}")
-                    params = message.get("params", [])
-                    return self.parse_job_message(params)
-                if message.get("result") is not None and message.get("id") is not None:
-                    logger.info(f"🟢 Respuesta pool (id={message['id']}): {message['result']}")
-                if message.get("error") is not None:
-                    logger.warning(f"🔴 Error pool: {message['error']}")
-            return None
-        except socket.timeout:
-            logger.warning("⌛ Timeout pool, reconectando...")
-            self.connect_to_pool()
-            return None
-        except Exception as e:
-            logger.error(f"🔌 Error socket pool: {e}")
-            self.connect_to_pool()
-            return None
+                    job_params = link.on_login_reply(message)
+                except ConnectionError as e:
+                    return self.upstream.fail(link, e)
+                logger.info(f"🔑 Login aceptado por {link.endpoint} (sesión {link.session_id})")
+            if message.get("method") in ["job", "mining.job", "mining.notify"]:
+                self.hot.debug("job_detail", "🚀 Nuevo trabajo pool: %s", message.get("params"))
+                job_params = message.get("params", [])
+            if job_params:
+                job = self.parse_job_message(job_params)
+                if job:
+                    job = self.upstream.on_job(link, job)
+                    if job:
+                        return job
+            if link.submits.resolve(message) is not None:
+                continue  # Respuesta a un submit en vuelo: ya registrada por on_submit_result
+            if message.get("result") is not None and message.get("id") is not None:
+                logger.info("🟢 Respuesta pool (id=%s): %s", message["id"], message["result"])
+            if message.get("error") is not None:
+                logger.warning("🔴 Error pool: %s", message["error"])
+        return None
 
 # --- MAIN ---
 if __name__ == "__main__":
@@ -283,5 +480,7 @@ if __name__ == "__main__":
     pool_host = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1"
     pool_port = int(sys.argv[3]) if len(sys.argv) > 3 else 3333
 
+    setup_queue_logging()  # Los hilos de I/O solo encolan; consola/fichero se escriben en el hilo del listener
+    install_trace_signal()  # kill -USR1 <pid> conmuta la traza de depuración
     proxy = IAZarProxy(wallet, pool_host=pool_host, pool_port=pool_port, pool_tls=True, listen_port=3333, listen_tls_port=3334)
     proxy.run()
@@ -0,0 +1,313 @@
+# iazar/proxy/job_broadcast.py
+"""
+Difusión de trabajos a todos los mineros conectados en cuanto llegan de la pool.
+El mining.notify se serializa una sola vez por trabajo como plantilla de
+bytes; lo único que cambia entre mineros (los bits del slot de nonce dentro
+del blob y el target de vardiff) se empalma como bytes, sin volver a pasar
+por JSON. Se mide la latencia de entrega por minero (llegada del trabajo
+-> bytes entregados al escritor de la conexión).
+En el proxy por hilos un solo MinerWriter (selector) vacía las colas de
+envío de todas las conexiones; cada cola está acotada y un minero que no lee
+se desconecta en vez de acumular memoria.
+"""
+
+import logging
+import selectors
+import socket
+import ssl
+import threading
+import time
+
+from iazar.proxy.miner_session import build_job_notify
+from iazar.utils.stratum_codec import encode
+from iazar.utils.target_utils import nonce_to_hex
+
+logger = logging.getLogger("JobBroadcast")
+
+_BLOB_MARK = "\x00blob\x00"
+_TARGET_MARK = "\x00target\x00"
+LATENCY_EWMA = 0.2
+MAX_WRITE_BUFFER = 256 * 1024  # Bytes pendientes por minero antes de desconectarlo
+SEND_CHUNK = 4096  # Por escritura: cabe en un socket que el selector da por escribible
+MINER_SOCKET_TIMEOUT = 30.0  # Pone el descriptor en modo no bloqueante para el hilo escritor
+
+
+class JobTemplate:
+    """mining.notify de un trabajo serializado una vez, con huecos para blob y target."""
+
+    __slots__ = ("job", "received_at", "_head", "_middle", "_tail", "_blob_hex", "_nonce_hex_offset")
+
+    def __init__(self, job, received_at: float = None):
+        self.job = job
+        self.received_at = received_at if received_at is not None else time.monotonic()
+        raw = encode(build_job_notify(job, _TARGET_MARK, _BLOB_MARK))
+        blob_mark, target_mark = encode(_BLOB_MARK)[1:-2], encode(_TARGET_MARK)[1:-2]
+        head, rest = raw.split(blob_mark, 1)
+        middle, tail = rest.split(target_mark, 1)
+        self._head, self._middle, self._tail = head, middle, tail
+        self._blob_hex = job.blob_hex.encode()
+        self._nonce_hex_offset = job.nonce_offset * 2
+
+    def frame_for(self, session) -> bytes:
+        """Bytes del trabajo para un minero: slot de nonce y target propios empalmados."""
+        blob = self._blob_hex
+        if session.slot is not None:
+            prefix = nonce_to_hex(session.slot << session.nonce_slots.shift).encode()
+            start = self._nonce_hex_offset
+            blob = blob[:start] + prefix + blob[start + 8:]
+        return b"".join((self._head, blob, self._middle, session.target_for(self.job).encode(), self._tail))
+
+
+class _Subscriber:
+    __slots__ = ("session", "write", "jobs", "last_ms", "avg_ms", "max_ms")
+
+    def __init__(self, session, write):
+        self.session = session
+        self.write = write
+        self.jobs = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+
+class JobBroadcaster:
+    """
+    Registro de mineros suscritos. `write` es la función de envío de la
+    conexión (no debe bloquear: ConnectionWriter.send o capped_stream_write).
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.template = None
+
+    def subscribe(self, session, write):
+        """Suscribe la conexión y le envía el trabajo actual si ya hay uno."""
+        with self._lock:
+            self._subscribers[session.session_id] = _Subscriber(session, write)
+            template = self.template
+        if template is not None:
+            write(template.frame_for(session))
+
+    def unsubscribe(self, session):
+        with self._lock:
+            self._subscribers.pop(session.session_id, None)
+
+    def frame_for(self, session):
+        """Trabajo actual para un minero (p.ej. tras un reajuste de vardiff), o None."""
+        template = self.template
+        return template.frame_for(session) if template is not None else None
+
+    def publish(self, job, received_at: float = None) -> int:
+        """
+        Serializa el trabajo una vez y lo entrega a todos los suscritos.
+        Returns:
+            int: número de mineros a los que se envió.
+        """
+        template = JobTemplate(job, received_at)
+        with self._lock:
+            self.template = template
+            subscribers = list(self._subscribers.values())
+        for sub in subscribers:
+            try:
+                sub.write(template.frame_for(sub.session))
+            except Exception as e:
+                logger.warning(f"Envío de trabajo fallido a {sub.session.addr}: {e}")
+                continue
+            self._record(sub, template.received_at)
+        return len(subscribers)
+
+    @staticmethod
+    def _record(sub: _Subscriber, received_at: float):
+        latency_ms = (time.monotonic() - received_at) * 1e3
+        sub.jobs += 1
+        sub.last_ms = latency_ms
+        sub.avg_ms = latency_ms if sub.jobs == 1 else sub.avg_ms + LATENCY_EWMA * (latency_ms - sub.avg_ms)
+        sub.max_ms = max(sub.max_ms, latency_ms)
+
+    def latency_stats(self) -> dict:
+        """{session_id: {"addr", "jobs", "last_ms", "avg_ms", "max_ms"}} por minero."""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return {
+            sub.session.session_id: {
+                "addr": sub.session.addr,
+                "jobs": sub.jobs,
+                "last_ms": sub.last_ms,
+                "avg_ms": sub.avg_ms,
+                "max_ms": sub.max_ms,
+            }
+            for sub in subscribers
+        }
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+class MinerWriter:
+    """
+    Envío no bloqueante para los sockets del proxy por hilos: un único hilo
+    vacía, con un selector, los buffers de todas las conexiones (no un hilo por
+    minero). Cada conexión encola con ConnectionWriter.send() y el hilo escribe
+    cuando su socket admite datos, en trozos de SEND_CHUNK para no bloquearse
+    con un minero que no lee. Un minero cuyo buffer supera max_buffer se
+    desconecta.
+    Los sockets deben tener timeout (settimeout(MINER_SOCKET_TIMEOUT)): así el
+    descriptor es no bloqueante para el hilo escritor mientras el hilo lector
+    de la conexión sigue usando recv() normal.
+    """
+
+    def __init__(self, max_buffer: int = MAX_WRITE_BUFFER, name: str = "miner-writer"):
+        self.max_buffer = int(max_buffer)
+        self.overflows = 0
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._changed = []  # Conexiones con datos nuevos o cerradas, para el hilo escritor
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def connection(self, sock) -> "ConnectionWriter":
+        return ConnectionWriter(sock, self)
+
+    def notify(self, conn: "ConnectionWriter"):
+        with self._lock:
+            self._changed.append(conn)
+        try:
+            self._wakeup_send.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            pass  # El hilo ya tiene despertares pendientes
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.fileobj is self._wakeup_recv:
+                    self._drain_wakeup()
+                elif key.data.flush():
+                    self._unregister(key.data)
+            with self._lock:
+                changed, self._changed = self._changed, []
+            for conn in changed:
+                if conn.closed:
+                    self._unregister(conn)
+                else:
+                    self._register(conn)
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _register(self, conn: "ConnectionWriter"):
+        key = self._selector.get_map().get(conn.fd)
+        if key is not None:
+            if key.data is conn:
+                return
+            self._selector.unregister(conn.fd)  # Descriptor reutilizado: el de una conexión ya cerrada
+        self._selector.register(conn.fd, selectors.EVENT_WRITE, conn)
+
+    def _unregister(self, conn: "ConnectionWriter"):
+        key = self._selector.get_map().get(conn.fd)
+        if key is not None and key.data is conn:
+            self._selector.unregister(conn.fd)
+
+
+class ConnectionWriter:
+    """
+    Cola de envío de una conexión, vaciada por el MinerWriter compartido.
+    send() no bloquea: encola y avisa al hilo escritor (los mensajes que se
+    acumulan mientras tanto salen juntos en la siguiente escritura).
+    """
+
+    def __init__(self, sock, writer: MinerWriter):
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.closed = False
+        self.writes = 0
+        self.messages = 0
+        self._writer = writer
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def send(self, data: bytes):
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._buffer) + len(data) > self._writer.max_buffer:
+                overflow = len(self._buffer) + len(data)
+            else:
+                overflow = 0
+                wake = not self._buffer
+                self._buffer += data
+                self.messages += 1
+        if overflow:
+            self._writer.overflows += 1
+            logger.warning(f"🚫 Minero {self._peer()} no lee: {overflow} bytes pendientes "
+                           f"(máximo {self._writer.max_buffer}), desconectado")
+            self.abort()
+        elif wake:
+            self._writer.notify(self)
+
+    def flush(self) -> bool:
+        """Hilo escritor: envía lo que admita el socket. True si ya no queda nada (o se cerró)."""
+        with self._lock:
+            if self.closed:
+                return True
+            data = bytes(self._buffer[:SEND_CHUNK])
+        try:
+            sent = self.sock.send(data)
+        except (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return False
+        except OSError as e:
+            logger.warning(f"Escritura a minero {self._peer()} fallida: {e}")
+            self.abort()
+            return True
+        with self._lock:
+            if self.closed:
+                return True
+            del self._buffer[:sent]
+            self.writes += 1
+            return not self._buffer
+
+    def abort(self):
+        """Cierra la cola y corta el socket: el hilo lector de la conexión ve el cierre y limpia."""
+        self.close()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        """Lo pendiente se descarta (la conexión se está cerrando)."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._buffer.clear()
+        self._writer.notify(self)
+
+    def _peer(self):
+        try:
+            return self.sock.getpeername()
+        except OSError:
+            return "?"
+
+
+def capped_stream_write(writer, max_buffer: int = MAX_WRITE_BUFFER):
+    """
+    Función de envío para un asyncio.StreamWriter con el mismo límite que
+    ConnectionWriter: si el buffer del transporte supera max_buffer (el minero
+    no lee), se aborta la conexión en vez de seguir acumulando.
+    """
+    def write(data: bytes):
+        transport = writer.transport
+        if transport.get_write_buffer_size() + len(data) > max_buffer:
+            transport.abort()
+            raise ConnectionError(f"minero no lee: más de {max_buffer} bytes pendientes, desconectado")
+        writer.write(data)
+    return write
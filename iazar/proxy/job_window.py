@@ -0,0 +1,92 @@
+# iazar/proxy/job_window.py
+"""
+Ventana de trabajos activos del proxy: los últimos K trabajos difundidos, por
+job_id y en orden de llegada, ya decodificados (PoolJob: blob, target/umbral y
+seed en bytes). Un trabajo de una altura nueva expulsa los de alturas
+anteriores (sus shares ya no valen), y la ventana nunca pasa de K.
+Los shares (de mineros o de la IA) se comprueban contra la ventana antes de
+hashear o reenviar nada; los de trabajos expulsados o desconocidos son stale
+y se cuentan por origen.
+Sin I/O, compartida por el proxy por hilos y el de asyncio.
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_WINDOW = 8
+
+
+class JobWindow:
+    def __init__(self, max_jobs: int = DEFAULT_WINDOW):
+        self.max_jobs = max(1, int(max_jobs))
+        self._jobs = OrderedDict()  # job_id -> PoolJob, del más antiguo al más reciente
+        self._lock = threading.Lock()
+        self.height = None
+        self.stats = {"added": 0, "evicted": 0, "shares": 0, "stale": 0}
+        self._sources = {}  # origen -> [shares, stale]
+
+    def add(self, job) -> list:
+        """
+        Añade un trabajo recién difundido.
+        Returns:
+            list: job_ids expulsados (altura superada o ventana llena).
+        """
+        evicted = []
+        with self._lock:
+            if job.height is not None and (self.height is None or job.height > self.height):
+                if self.height is not None:
+                    # Bloque nuevo: los trabajos de alturas anteriores quedan obsoletos
+                    evicted = [job_id for job_id, old in self._jobs.items()
+                               if old.height is None or old.height < job.height]
+                    for job_id in evicted:
+                        del self._jobs[job_id]
+                self.height = job.height
+            self._jobs.pop(job.job_id, None)
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                evicted.append(self._jobs.popitem(last=False)[0])
+            self.stats["added"] += 1
+            self.stats["evicted"] += len(evicted)
+        return evicted
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def check(self, job_id, source: str):
+        """
+        Trabajo activo de un share, contabilizado por origen.
+        Returns:
+            PoolJob, o None si el trabajo ya no está en la ventana (share stale).
+        """
+        job = self._jobs.get(job_id)
+        with self._lock:
+            counters = self._sources.setdefault(source, [0, 0])
+            counters[0] += 1
+            self.stats["shares"] += 1
+            if job is None:
+                counters[1] += 1
+                self.stats["stale"] += 1
+        return job
+
+    def forget_source(self, source: str):
+        """Descarta los contadores de un origen que ya no existe (minero desconectado)."""
+        with self._lock:
+            self._sources.pop(source, None)
+
+    def stale_rates(self) -> dict:
+        """{origen: {"shares", "stale", "rate"}}."""
+        with self._lock:
+            return {
+                source: {"shares": shares, "stale": stale, "rate": stale / shares if shares else 0.0}
+                for source, (shares, stale) in self._sources.items()
+            }
+
+    def job_ids(self) -> list:
+        with self._lock:
+            return list(self._jobs)
+
+    def __contains__(self, job_id):
+        return job_id in self._jobs
+
+    def __len__(self):
+        return len(self._jobs)
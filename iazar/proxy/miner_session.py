@@ -0,0 +1,176 @@
+# iazar/proxy/miner_session.py
+"""
+Estado por conexión de minero en el proxy, independiente del transporte
+(no hace I/O: el proxy decide cómo enviar lo que devuelve).
+Un submit pasa primero por check_submit() (comprobaciones baratas, sin
+hashear) y después por verify_share() + on_verified(): el hash se recalcula
+en el ShareVerifier con el blob de este minero y solo un share verificado se
+reenvía a la pool o se contabiliza.
+"""
+
+import itertools
+import threading
+
+from iazar.core.vardiff import SHARE_LOCAL, SHARE_LOW, SHARE_POOL, Vardiff
+from iazar.utils.target_utils import hash_meets_threshold, nonce_from_hex
+
+_session_ids = itertools.count(1)
+
+
+def build_job_notify(job, target: str, blob_hex: str = None) -> dict:
+    """
+    mining.notify de un PoolJob con el target indicado (el de la pool o el del
+    minero) y, con reparto de nonces, el blob con los bits del slot ya fijados.
+    """
+    return {
+        "id": None,
+        "method": "mining.notify",
+        "params": [
+            job.job_id,
+            blob_hex or job.blob_hex,
+            job.seed_hash.hex(),
+            target,
+            True
+        ]
+    }
+
+
+def parse_submit_params(params) -> tuple:
+    """(job_id, nonce_hex, result_hex) de un submit xmrig (dict) o mining.submit (lista)."""
+    if isinstance(params, dict):
+        return params.get("job_id"), params.get("nonce"), params.get("result")
+    return tuple((list(params or []) + [None] * 4)[1:4])
+
+
+class MinerSession:
+    """
+    Conexión de un minero: identificador, vardiff opcional, slot de nonces
+    opcional (NonceSlotAllocator) y contadores.
+    Sin vardiff el minero recibe el target de la pool y todo share válido se reenvía.
+    """
+
+    def __init__(self, addr, vardiff_config: dict = None, nonce_slots=None):
+        self.session_id = next(_session_ids)
+        self.addr = addr
+        self.nonce_slots = nonce_slots
+        self.slot = nonce_slots.allocate() if nonce_slots is not None else None
+        self._split_cache = (None, None)  # (job_id, blob hex con el slot fijado)
+        vardiff_config = vardiff_config or {}
+        self.vardiff = Vardiff.from_config(vardiff_config) if vardiff_config.get("enabled", False) else None
+        self.source = f"miner-{self.session_id}"  # Origen de sus shares en JobWindow
+        self.lock = threading.Lock()  # Proxy por hilos: on_verified() llega desde un hilo del ShareVerifier
+        self.stats = {"submitted": 0, "forwarded": 0, "local": 0, "rejected": 0, "duplicates": 0, "stale": 0}
+
+    def target_for(self, job) -> str:
+        """Target compacto que se anuncia a este minero para el trabajo."""
+        if self.vardiff is None:
+            return job.target
+        return self.vardiff.target_for(job.difficulty)[0]
+
+    def blob_for(self, job) -> str:
+        """Blob hex del trabajo para este minero (con los bits superiores del nonce fijados al slot)."""
+        if self.slot is None:
+            return job.blob_hex
+        cached_job, blob_hex = self._split_cache
+        if cached_job != job.job_id:
+            blob_hex = self.nonce_slots.split_blob(job.blob, self.slot, job.nonce_offset).hex()
+            self._split_cache = (job.job_id, blob_hex)
+        return blob_hex
+
+    def owns_nonce(self, nonce: int) -> bool:
+        """False si el nonce está fuera del tramo asignado a este minero."""
+        return self.slot is None or self.nonce_slots.owns(self.slot, nonce)
+
+    def close(self):
+        """Libera el slot para que lo reciba el siguiente minero que conecte."""
+        if self.slot is not None:
+            self.nonce_slots.release(self.slot)
+            self.slot = None
+
+    def job_notify(self, job) -> dict:
+        return build_job_notify(job, self.target_for(job), self.blob_for(job))
+
+    def threshold_for(self, job) -> int:
+        """Umbral que debe cumplir un share de este minero (el más fácil entre el suyo y el de la pool)."""
+        if self.vardiff is None:
+            return job.threshold
+        return max(self.vardiff.threshold, job.threshold)
+
+    def classify(self, hash_bytes: bytes, job) -> str:
+        """SHARE_POOL / SHARE_LOCAL / SHARE_LOW según el target del minero y el de la pool."""
+        if self.vardiff is not None:
+            return self.vardiff.classify(hash_bytes, job.threshold)
+        return SHARE_POOL if hash_meets_threshold(hash_bytes, job.threshold) else SHARE_LOW
+
+    def check_submit(self, params, share_index, jobs) -> tuple:
+        """
+        Comprobaciones baratas de un submit del minero, sin I/O ni hashear.
+        Orden: nonce válido, tramo del slot, trabajo aún en la ventana `jobs`
+        (JobWindow), duplicado (share_index) y dificultad declarada (el hash
+        que envía el minero, solo como filtro: el real lo da verify_share()).
+        Returns:
+            tuple: (error, share). error es el motivo de rechazo o None; share es
+            (job, nonce, nonce_hex, result_hex) pendiente de verify_share().
+        """
+        self.stats["submitted"] += 1
+        job_id, nonce_hex, result = parse_submit_params(params)
+        try:
+            nonce = nonce_from_hex(nonce_hex)
+        except (TypeError, ValueError):
+            self.stats["rejected"] += 1
+            return "Invalid nonce", None
+        if not self.owns_nonce(nonce):
+            self.stats["rejected"] += 1
+            return "Nonce out of assigned range", None
+        job = jobs.check(job_id, self.source)
+        if job is None:
+            self.stats["stale"] += 1
+            return "Block expired", None
+        if not share_index.check_and_add(job_id, nonce):
+            self.stats["duplicates"] += 1
+            return "Duplicate share", None
+        if result:
+            try:
+                meets = hash_meets_threshold(bytes.fromhex(result), self.threshold_for(job))
+            except ValueError:
+                meets = False
+            if not meets:
+                self.stats["rejected"] += 1
+                return "Low difficulty share", None
+        return None, (job, nonce, nonce_hex, result)
+
+    def verify_share(self, verifier, job, nonce: int, result_hex=None, callback=None):
+        """
+        Encola en el ShareVerifier el hash del share con el blob de este minero
+        (slot incluido) y su umbral.
+        Returns:
+            Future con el veredicto del verificador.
+        """
+        return verifier.submit(self.blob_for(job), job.seed_hash, nonce, self.threshold_for(job),
+                               expected_hash=result_hex, job_id=job.job_id, callback=callback)
+
+    def on_verified(self, verdict: dict, job) -> tuple:
+        """
+        Resultado de la verificación de un share.
+        Returns:
+            tuple: (error, forward). error es el motivo de rechazo o None;
+            forward indica si cumple el target de la pool (se reenvía) o solo
+            se contabiliza localmente.
+        """
+        if not verdict["hash_matches"]:
+            self.stats["rejected"] += 1
+            return "Invalid share", False
+        if not verdict["meets_target"]:
+            self.stats["rejected"] += 1
+            return "Low difficulty share", False
+        if self.vardiff is not None:
+            self.vardiff.record_share()  # Hash recalculado: ya cuenta para el ritmo del minero
+        if self.classify(verdict["hash"], job) == SHARE_LOCAL:
+            self.stats["local"] += 1
+            return None, False
+        self.stats["forwarded"] += 1
+        return None, True
+
+    def retarget(self):
+        """Nueva dificultad si vardiff decide reajustar (hay que reenviar el trabajo), o None."""
+        return self.vardiff.retarget() if self.vardiff is not None else None
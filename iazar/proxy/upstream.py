@@ -0,0 +1,554 @@
+# iazar/proxy/upstream.py
+"""
+Gestión de las conexiones upstream del proxy: una pool principal y una o más
+de respaldo, todas conectadas y con login hecho (en caliente), para que un
+failover sea solo cambiar de enlace activo y reenviar su último trabajo a los
+mineros, sin reconectar a nadie.
+Por enlace se mide:
+- retraso de notify: cuánto tarda en anunciar un nuevo bloque (prev_id) respecto
+  a la pool que lo anunció primero;
+- RTT de submit: envío del share -> respuesta de la pool (correlada por id
+  en el SubmitTracker del enlace, con varios submits en vuelo).
+Selección del enlace activo:
+- "priority": el primero de la lista que esté conectado (vuelve a la principal
+  en cuanto esta recupera trabajo);
+- "latency": el de menor retraso de notify (p50), con un margen de histéresis.
+Cada enlace sigue la máquina de estados disconnected -> connecting -> login ->
+ready; cualquier fallo vuelve a disconnected, cuenta una vez y el reintento
+se programa con espera exponencial con jitter (se reinicia solo tras un login
+aceptado, así una pool que acepta y corta no provoca un bucle de
+reconexiones). Un submit sin respuesta no tumba el enlace: solo un error de
+transporte o max_submit_timeouts timeouts seguidos sin ninguna respuesta.
+Los sockets de las pools llevan un timeout de E/S acotado (IO_TIMEOUT): una
+lectura o un envío que se bloquea más que eso es un fallo del enlace, que se
+cierra y reconecta con el mismo backoff en vez de dejar colgado el hilo que
+escribía (el bucle del proxy o el verificador de shares).
+La reconexión corre en un hilo de fondo; el estado del enlace (socket,
+decoder, sesión) se cambia siempre bajo su lock. La respuesta
+de login trae el id de sesión (usado en los submits) y el primer trabajo;
+handshake_messages() y parse_login_reply() los comparte el proxy asyncio.
+Sin I/O en el camino del manager salvo dentro de UpstreamLink: el bucle del
+proxy decide cuándo leer (poller) y qué hacer con cada mensaje.
+"""
+
+import logging
+import random
+import socket
+import ssl
+import threading
+import time
+from collections import OrderedDict, deque
+
+from iazar.utils.latency import LatencyRecorder
+from iazar.utils.stratum_codec import StratumDecoder, encode
+from iazar.utils.submit_tracker import SubmitTracker
+
+logger = logging.getLogger("Upstream")
+
+USER_AGENT = "IA-ZarProxy"
+CONNECT_TIMEOUT = 5.0
+IO_TIMEOUT = 5.0  # Lectura/envío bloqueados más de esto: enlace caído
+LOGIN_TIMEOUT = 10.0
+LOGIN_ID = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+BACKOFF_JITTER = 0.5  # Fracción máxima que se resta al azar a cada espera
+MAX_SUBMIT_TIMEOUTS = 3  # Timeouts de submit seguidos que dan el enlace por caído
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+LOGIN = "login"
+READY = "ready"
+RECENT_JOBS = 16   # job_ids recordados por enlace para enrutar submits
+TRACKED_TIPS = 16  # prev_ids recordados para medir retrasos de notify
+
+
+def handshake_messages(wallet: str) -> list:
+    """subscribe (id 1) + login (id LOGIN_ID) que abren una sesión Stratum con la pool."""
+    return [
+        {"id": 1, "method": "mining.subscribe", "params": [f"{USER_AGENT}/6.22.2"]},
+        {"id": LOGIN_ID, "method": "login", "params": {"login": wallet, "pass": "x", "agent": USER_AGENT}},
+    ]
+
+
+def is_login_reply(message: dict) -> bool:
+    return message.get("id") == LOGIN_ID and "method" not in message
+
+
+def parse_login_reply(message: dict, endpoint=None) -> tuple:
+    """
+    Respuesta al login.
+    Returns:
+        (id de sesión, params del trabajo incluido); (None, None) si result no trae sesión.
+    Raises:
+        ConnectionError: si la pool rechaza el login.
+    """
+    if message.get("error"):
+        raise ConnectionError(f"login rechazado por {endpoint or 'la pool'}: {message['error']}")
+    result = message.get("result")
+    if not isinstance(result, dict):
+        return None, None
+    return result.get("id"), result.get("job")
+
+
+class PoolEndpoint:
+    """Dirección de una pool: 'host:port', opcionalmente con esquema stratum+tcp:// o stratum+ssl://."""
+
+    __slots__ = ("host", "port", "tls")
+
+    def __init__(self, host: str, port: int, tls: bool = True):
+        self.host = host
+        self.port = int(port)
+        self.tls = tls
+
+    @classmethod
+    def parse(cls, address: str, tls: bool = True):
+        if "://" in address:
+            scheme, address = address.split("://", 1)
+            tls = scheme.endswith(("ssl", "tls"))
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Dirección de pool inválida: {address!r}")
+        return cls(host, int(port), tls)
+
+    def __eq__(self, other):
+        return isinstance(other, PoolEndpoint) and (self.host, self.port) == (other.host, other.port)
+
+    def __hash__(self):
+        return hash((self.host, self.port))
+
+    def __repr__(self):
+        return f"{self.host}:{self.port}{' (TLS)' if self.tls else ''}"
+
+
+class Backoff:
+    """Espera exponencial entre reintentos (base * 2**n, acotada) con jitter para no sincronizar reconexiones."""
+
+    def __init__(self, base: float = BACKOFF_BASE, maximum: float = BACKOFF_MAX, jitter: float = BACKOFF_JITTER):
+        self.base = base
+        self.maximum = maximum
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        delay = min(self.maximum, self.base * (2 ** min(self.attempts, 32)))
+        self.attempts += 1
+        return delay * (1.0 - self.jitter * random.random())
+
+    def reset(self):
+        self.attempts = 0
+
+
+class UpstreamLink:
+    """Una conexión Stratum con una pool: socket, decoder, estado de sesión y métricas propias."""
+
+    def __init__(self, endpoint: PoolEndpoint, wallet: str, rank: int = 0, backoff: Backoff = None,
+                 submit_timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.wallet = wallet
+        self.rank = rank  # Orden de preferencia (0 = principal)
+        self.sock = None
+        self.state = DISCONNECTED
+        self.session_id = None
+        self.login_sent_at = 0.0
+        self.backoff = backoff or Backoff()
+        self.decoder = StratumDecoder()
+        self.messages = deque()  # Mensajes ya decodificados pendientes de procesar
+        self.send_lock = threading.Lock()
+        self.lock = threading.RLock()  # Estado compartido con el hilo de reconexión
+        self.last_job = None
+        self.last_tip = None
+        self.recent_jobs = deque(maxlen=RECENT_JOBS)
+        self.last_message_at = 0.0
+        self.next_attempt_at = 0.0
+        self.connecting = False
+        self.connect_rtt = None
+        self.notify_lag = LatencyRecorder(256)
+        self.submits = SubmitTracker(submit_timeout)
+        self.failures = 0
+        self.stalled = None  # Motivo si un envío agotó IO_TIMEOUT; maintain() da el enlace por caído
+
+    @property
+    def connected(self) -> bool:
+        return self.sock is not None
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def has_pending(self) -> bool:
+        """Mensajes ya decodificados, o bytes descifrados en el buffer TLS que el poller no verá."""
+        return bool(self.messages) or (isinstance(self.sock, ssl.SSLSocket) and self.sock.pending() > 0)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def connect(self) -> bool:
+        """
+        Conecta y envía subscribe + login. Devuelve False (y programa el
+        reintento) si falla. El socket se abre fuera del lock y se publica
+        junto con el estado de una vez.
+        """
+        with self.lock:
+            self.close()
+            self.state = CONNECTING
+        start = time.monotonic()
+        try:
+            raw_sock = socket.create_connection((self.endpoint.host, self.endpoint.port), timeout=CONNECT_TIMEOUT)
+            if self.endpoint.tls:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+                sock = context.wrap_socket(raw_sock, server_hostname=self.endpoint.host)
+            else:
+                sock = raw_sock
+            sock.settimeout(IO_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (OSError, ssl.SSLError) as e:
+            delay = self.failed()
+            logger.warning(f"❌ Conexión a pool {self.endpoint} fallida: {e} (reintento en {delay:.1f}s)")
+            return False
+        with self.lock:
+            self.connect_rtt = time.monotonic() - start
+            self.sock = sock
+            self.last_message_at = self.login_sent_at = time.monotonic()
+            self.state = LOGIN
+        try:
+            for message in handshake_messages(self.wallet):
+                self.send(message)
+        except OSError as e:
+            delay = self.failed()
+            logger.warning(f"❌ Handshake con pool {self.endpoint} fallido: {e} (reintento en {delay:.1f}s)")
+            return False
+        logger.info(f"🔌 Pool {self.endpoint} conectada ({self.connect_rtt * 1e3:.1f} ms), login enviado")
+        return True
+
+    def schedule_retry(self) -> float:
+        """Programa el siguiente intento de conexión; devuelve la espera elegida."""
+        delay = self.backoff.next_delay()
+        self.next_attempt_at = time.monotonic() + delay
+        return delay
+
+    def failed(self) -> float:
+        """Un fallo (de conexión, handshake o enlace ya abierto): cuenta una vez, cierra y programa el reintento."""
+        with self.lock:
+            self.failures += 1
+            delay = self.schedule_retry()
+            self.close()
+        return delay
+
+    def is_login_reply(self, message: dict) -> bool:
+        return self.state == LOGIN and is_login_reply(message)
+
+    def on_login_reply(self, message: dict):
+        """
+        Respuesta al login: guarda el id de sesión y pasa a ready.
+        Returns:
+            params del trabajo incluido en la respuesta, o None.
+        Raises:
+            ConnectionError: si la pool rechaza el login.
+        """
+        session_id, job = parse_login_reply(message, self.endpoint)
+        with self.lock:
+            self.state = READY
+            self.backoff.reset()
+            self.session_id = session_id
+        return job
+
+    def close(self):
+        with self.lock:
+            sock, self.sock = self.sock, None
+            self.state = DISCONNECTED
+            self.session_id = None
+            self.stalled = None
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            self.decoder.reset()
+            self.messages.clear()
+            self.last_job = None
+            self.last_tip = None
+        self.submits.fail_all(f"conexión con {self.endpoint} perdida")
+
+    def send(self, message: dict):
+        """
+        Envía un mensaje. Si el envío agota IO_TIMEOUT, parte del mensaje puede
+        haber salido y el flujo ya no es fiable: el enlace queda marcado como
+        atascado (maintain() lo da por caído) y no acepta más envíos.
+        Raises:
+            ConnectionError: desconectada, atascada o envío agotado.
+        """
+        sock = self.sock
+        if sock is None:
+            raise ConnectionError(f"pool {self.endpoint} desconectada")
+        if self.stalled:
+            raise ConnectionError(f"pool {self.endpoint}: {self.stalled}")
+        with self.send_lock:
+            try:
+                sock.sendall(encode(message))
+            except socket.timeout as e:
+                reason = f"envío bloqueado más de {IO_TIMEOUT:.0f}s"
+                with self.lock:
+                    if sock is self.sock:  # No marcar un socket ya sustituido por la reconexión
+                        self.stalled = reason
+                raise ConnectionError(f"pool {self.endpoint}: {reason}") from e
+
+    def read(self) -> deque:
+        """
+        Lee lo disponible (una vez por llamada si no queda nada pendiente) y
+        devuelve la cola de mensajes decodificados. EOF -> ConnectionError; una
+        lectura que agota IO_TIMEOUT (p.ej. un registro TLS a medias) -> socket.timeout.
+        """
+        if not self.messages:
+            sock = self.sock
+            if sock is None:
+                raise ConnectionError(f"pool {self.endpoint} desconectada")
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionError(f"pool {self.endpoint} cerró la conexión")
+            with self.lock:
+                if sock is self.sock:  # Descartar lo leído de un socket ya sustituido
+                    self.messages.extend(self.decoder.feed(data))
+                    self.last_message_at = time.monotonic()
+        return self.messages
+
+    def note_job(self, job):
+        self.last_job = job
+        self.recent_jobs.append(job.job_id)
+
+    def stats(self) -> dict:
+        return {
+            "endpoint": repr(self.endpoint),
+            "connected": self.connected,
+            "state": self.state,
+            "failures": self.failures,
+            "connect_ms": self.connect_rtt * 1e3 if self.connect_rtt is not None else None,
+            "notify_lag": self.notify_lag.summary(),
+            "submit_rtt": self.submits.rtt.summary(),
+            "submits": dict(self.submits.stats, in_flight=self.submits.in_flight()),
+        }
+
+
+class UpstreamManager:
+    """
+    Conjunto de enlaces upstream con uno activo. El proxy registra en su poller
+    los sockets de links_connected(), lee con link.read() y pasa cada trabajo a
+    on_job(); los fallos de lectura/envío van a fail().
+    """
+
+    def __init__(self, endpoints, wallet: str, selection: str = "priority", switch_margin_ms: float = 50.0,
+                 idle_timeout: float = 180.0, submit_timeout: float = 10.0,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 max_submit_timeouts: int = MAX_SUBMIT_TIMEOUTS):
+        if not endpoints:
+            raise ValueError("Se necesita al menos una pool")
+        if selection not in ("priority", "latency"):
+            raise ValueError(f"Selección de pool desconocida: {selection}")
+        self.links = [UpstreamLink(endpoint, wallet, rank, Backoff(backoff_base, backoff_max), submit_timeout)
+                      for rank, endpoint in enumerate(endpoints)]
+        self.selection = selection
+        self.switch_margin_ms = switch_margin_ms
+        self.idle_timeout = idle_timeout
+        self.max_submit_timeouts = max(1, int(max_submit_timeouts))
+        self.active = None
+        self.switches = 0
+        self._tips = OrderedDict()  # prev_id -> instante del primer anuncio
+
+    @classmethod
+    def from_config(cls, wallet: str, primary: PoolEndpoint, proxy_config: dict = None, miner_config: dict = None):
+        """
+        Principal + respaldos: proxy.upstream.backup_pools (ia_config) y
+        backup_pool (miner_config), sin duplicados.
+        """
+        upstream_config = (proxy_config or {}).get("upstream", {})
+        addresses = list(upstream_config.get("backup_pools", []))
+        if (miner_config or {}).get("backup_pool"):
+            addresses.append(miner_config["backup_pool"])
+        endpoints = [primary]
+        for address in addresses:
+            try:
+                endpoint = PoolEndpoint.parse(address, primary.tls)
+            except ValueError as e:
+                logger.warning(f"⚠️ {e}, ignorada")
+                continue
+            if endpoint not in endpoints:
+                endpoints.append(endpoint)
+        return cls(
+            endpoints,
+            wallet,
+            selection=upstream_config.get("selection", "priority"),
+            switch_margin_ms=float(upstream_config.get("switch_margin_ms", 50.0)),
+            idle_timeout=float(upstream_config.get("idle_timeout", 180.0)),
+            submit_timeout=float(upstream_config.get("submit_timeout", 10.0)),
+            backoff_base=float(upstream_config.get("backoff_base", BACKOFF_BASE)),
+            backoff_max=float(upstream_config.get("backoff_max", BACKOFF_MAX)),
+            max_submit_timeouts=int(upstream_config.get("max_submit_timeouts", MAX_SUBMIT_TIMEOUTS)),
+        )
+
+    def connect_all(self) -> int:
+        """Conecta todos los enlaces; devuelve cuántos quedaron conectados."""
+        connected = sum(1 for link in self.links if link.connect())
+        if self.active is None or not self.active.connected:
+            self.active = next((link for link in self.links if link.connected), None)
+        return connected
+
+    def links_connected(self) -> list:
+        return [link for link in self.links if link.connected]
+
+    def fail(self, link: UpstreamLink, reason):
+        """
+        Enlace caído: se cierra (se reintentará en maintain() tras el backoff)
+        y, si era el activo, se cambia al mejor restante. Devuelve el trabajo a
+        difundir tras el cambio, o None; sin ninguno, los mineros conservan el
+        último trabajo difundido hasta que llegue otro.
+        """
+        with link.lock:
+            if not link.connected:
+                return None  # Ya contado y cerrado (p.ej. error de lectura y de envío del mismo corte)
+            delay = link.failed()
+        logger.warning(f"🔌 Pool {link.endpoint} caída: {reason} (reintento en {delay:.1f}s)")
+        if link is not self.active:
+            return None
+        candidates = [other for other in self.links if other.connected and other.last_job is not None]
+        if not candidates:
+            logger.error("❌ Ninguna pool de respaldo con trabajo disponible; los mineros conservan el último trabajo")
+            return None
+        return self._switch(self._best(candidates))
+
+    def maintain(self) -> list:
+        """
+        Tareas periódicas: reintenta (en otro hilo) los enlaces caídos y marca como caídos los que
+        tienen un envío atascado, llevan demasiado sin hablar o acumulan max_submit_timeouts
+        submits seguidos sin respuesta. Devuelve los trabajos a difundir por cambios de enlace activo.
+        """
+        jobs = []
+        now = time.monotonic()
+        for link in self.links:
+            if link.connected:
+                expired = link.submits.expire()
+                timeouts = link.submits.consecutive_timeouts
+                if link.stalled:
+                    job = self.fail(link, link.stalled)
+                elif link.state == LOGIN and now - link.login_sent_at > LOGIN_TIMEOUT:
+                    job = self.fail(link, f"login sin respuesta en {LOGIN_TIMEOUT:.0f}s")
+                elif now - link.last_message_at > self.idle_timeout:
+                    job = self.fail(link, f"sin mensajes en {self.idle_timeout:.0f}s")
+                elif expired and timeouts >= self.max_submit_timeouts:
+                    job = self.fail(link, f"{timeouts} submits seguidos sin respuesta en {link.submits.timeout:.0f}s")
+                else:
+                    if expired:
+                        logger.warning(f"⏱️ Pool {link.endpoint}: {len(expired)} submit(s) sin respuesta "
+                                       f"({timeouts}/{self.max_submit_timeouts} seguidos)")
+                    continue
+                if job is not None:
+                    jobs.append(job)
+            elif not link.connecting and now >= link.next_attempt_at:
+                # En segundo plano: un host caído no debe parar el bucle del proxy
+                link.connecting = True
+                threading.Thread(target=self._reconnect, args=(link,), name=f"upstream-{link.rank}", daemon=True).start()
+        if self.active is None or not self.active.connected:
+            self.active = next((link for link in self.links if link.connected), None)
+        return jobs
+
+    def on_job(self, link: UpstreamLink, job):
+        """
+        Trabajo recibido por un enlace. Devuelve el trabajo a difundir a los
+        mineros (el del enlace activo, o este si provoca un cambio) o None.
+        """
+        link.note_job(job)
+        self._record_tip(link, job)
+        if self.active is None or not self.active.connected:
+            return self._switch(link)
+        if link is self.active:
+            return job
+        if self.selection == "priority":
+            if link.rank < self.active.rank:
+                return self._switch(link)
+        elif self._faster(link, self.active):
+            return self._switch(link)
+        return None
+
+    def link_for_job(self, job_id):
+        """Enlace que emitió el trabajo (los submits deben ir a esa pool); por defecto el activo."""
+        for link in self.links:
+            if link.connected and job_id in link.recent_jobs:
+                return link
+        return self.active
+
+    def submit(self, job_id, message: dict, info=None, callback=None):
+        """
+        Envía un submit a la pool dueña del trabajo sin esperar respuesta: se le
+        asigna un id del SubmitTracker del enlace y la respuesta lo resolverá.
+        params.id es siempre el id de sesión del login del enlace.
+        Returns:
+            (enlace, Future con el resultado)
+        Raises:
+            ConnectionError: sin pool conectada o sin sesión de login en el enlace.
+        """
+        link = self.link_for_job(job_id)
+        if link is None or not link.connected:
+            raise ConnectionError("sin pool conectada para el submit")
+        with link.lock:
+            if link.session_id is None:
+                raise ConnectionError(f"pool {link.endpoint} sin sesión de login: share no enviado")
+            message["params"]["id"] = link.session_id  # Los submits Monero van con el id de sesión del login
+        message["id"], future = link.submits.register(info, callback)
+        try:
+            link.send(message)
+        except OSError:
+            link.submits.discard(message["id"])
+            raise
+        return link, future
+
+    def stats(self) -> dict:
+        return {
+            "active": repr(self.active.endpoint) if self.active else None,
+            "selection": self.selection,
+            "switches": self.switches,
+            "links": [link.stats() for link in self.links],
+        }
+
+    @staticmethod
+    def _reconnect(link: UpstreamLink):
+        try:
+            link.connect()
+        finally:
+            link.connecting = False
+
+    def _record_tip(self, link: UpstreamLink, job):
+        try:
+            tip = job.layout.prev_id
+        except ValueError:
+            return
+        if tip == link.last_tip:
+            return
+        fresh, link.last_tip = link.last_tip is None, tip
+        now = time.monotonic()
+        first = self._tips.get(tip)
+        if first is None:
+            self._tips[tip] = now
+            if len(self._tips) > TRACKED_TIPS:
+                self._tips.popitem(last=False)
+            first = now
+        elif fresh:
+            return  # Primer trabajo tras (re)conectar: repite un bloque ya anunciado, no es retraso
+        link.notify_lag.record(now - first)
+
+    def _faster(self, link: UpstreamLink, other: UpstreamLink) -> bool:
+        if not link.notify_lag.count or not other.notify_lag.count:
+            return False
+        return link.notify_lag.percentile(50) + self.switch_margin_ms < other.notify_lag.percentile(50)
+
+    def _best(self, candidates: list) -> UpstreamLink:
+        if self.selection == "latency":
+            return min(candidates, key=lambda l: (l.notify_lag.percentile(50) if l.notify_lag.count else float("inf"), l.rank))
+        return min(candidates, key=lambda l: l.rank)
+
+    def _switch(self, link: UpstreamLink):
+        previous, self.active = self.active, link
+        if previous is not link:
+            self.switches += 1
+            logger.warning(f"🔀 Pool activa: {previous.endpoint if previous else '-'} -> {link.endpoint}")
+        return link.last_job
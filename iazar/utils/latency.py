@@ -0,0 +1,44 @@
+# iazar/utils/latency.py
+"""
+Registro de latencias con ventana acotada y percentiles (p50/p99) para las
+rutas críticas del proxy: solución IA -> submit, notify de la pool, RTT de
+submit, etc.
+"""
+
+import threading
+from collections import deque
+
+
+class LatencyRecorder:
+    def __init__(self, size: int = 2048):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentile(self, pct: float) -> float:
+        """Percentil (0-100) en milisegundos de la ventana actual; 0.0 si no hay muestras."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))] * 1e3
+
+    def summary(self) -> dict:
+        """{"count", "p50_ms", "p99_ms", "max_ms"} de la ventana actual."""
+        with self._lock:
+            ordered = sorted(self._samples)
+            count = self.count
+        if not ordered:
+            return {"count": count, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        last = len(ordered) - 1
+        return {
+            "count": count,
+            "p50_ms": ordered[min(last, len(ordered) // 2)] * 1e3,
+            "p99_ms": ordered[min(last, int(len(ordered) * 0.99))] * 1e3,
+            "max_ms": ordered[-1] * 1e3,
+        }
@@ -0,0 +1,224 @@
+# iazar/utils/proxy_logging.py
+"""
+Logging del camino caliente del proxy y de los adaptadores del bridge.
+- setup_queue_logging(): los handlers reales (consola, fichero) pasan a un
+  QueueListener con su propio hilo; los hilos de I/O solo encolan el registro
+  sin formatearlo (el formato se hace en el listener), salvo si algún
+  argumento es mutable (dict de params, job...): entonces se formatea al
+  encolar para no mostrar un valor modificado después.
+- HotPathLog: eventos de alta frecuencia (mensajes de pool, bytes de mineros,
+  shares) con formato perezoso (argumentos %-style, solo se formatea lo que se
+  emite), muestreo 1 de N y límite de tasa por tipo de evento, y contadores
+  de lo suprimido.
+- Traza de depuración activable en caliente (set_trace, o SIGUSR1 con
+  install_trace_signal): apagada cuesta una llamada a isEnabledFor.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import signal
+import threading
+import time
+
+DEFAULT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+TRACE_LOGGERS = ("IA-Zar-Proxy", "IA-Zar-Proxy-Async", "Upstream", "StratumAdapter")
+
+# Política por tipo de evento: "sample" (emite 1 de cada N), "rate"/"burst" (eventos por segundo)
+DEFAULT_POLICIES = {
+    "pool_message": {"rate": 50, "burst": 200},   # Traza: cada mensaje de la pool
+    "miner_data": {"sample": 10, "rate": 50, "burst": 100},  # Traza: bytes recibidos de mineros
+    "job_detail": {"rate": 20, "burst": 50},      # Traza: params y job decodificado
+    "share_sent": {"rate": 5, "burst": 20},
+    "share_result": {"rate": 5, "burst": 20},
+    "share_rejected": {"rate": 2, "burst": 10},
+    "solution": {"rate": 5, "burst": 20},
+    "solution_dropped": {"rate": 2, "burst": 10},
+    "vardiff": {"rate": 1, "burst": 10},
+    "miner_connection": {"rate": 5, "burst": 50},
+}
+
+# Argumentos inmutables: se pueden formatear más tarde en el hilo del listener
+_LAZY_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo productor (la base hace msg % args
+    en prepare()) cuando todos los argumentos son inmutables; con alguno
+    mutable formatea ya, como haría un handler síncrono.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            # La traza se renderiza aquí: el frame no debe viajar a otro hilo
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        args = record.args
+        if args and (not isinstance(args, tuple) or not all(isinstance(arg, _LAZY_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def setup_queue_logging(level=logging.INFO, fmt: str = DEFAULT_FORMAT):
+    """
+    Mueve los handlers del logger raíz detrás de una cola. Idempotente.
+    Returns:
+        logging.handlers.QueueListener activo.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        root = logging.getLogger()
+        handlers = [h for h in root.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        if not handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(fmt))
+            handlers = [handler]
+        for handler in handlers:
+            root.removeHandler(handler)
+        log_queue = queue.SimpleQueue()
+        root.addHandler(_LazyQueueHandler(log_queue))
+        root.setLevel(level)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_queue_logging)
+        return _listener
+
+
+def stop_queue_logging():
+    """Vacía la cola y devuelve los handlers al logger raíz. Idempotente."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+        if listener is None:
+            return
+        root = logging.getLogger()
+        for handler in [h for h in root.handlers if isinstance(h, _LazyQueueHandler)]:
+            root.removeHandler(handler)
+        if listener._thread is not None:
+            listener.stop()
+        for handler in listener.handlers:
+            root.addHandler(handler)
+
+
+def set_trace(enabled: bool, names=TRACE_LOGGERS):
+    """Activa/desactiva la traza DEBUG de los loggers del proxy en caliente."""
+    for name in names:
+        logging.getLogger(name).setLevel(logging.DEBUG if enabled else logging.INFO)
+
+
+def trace_enabled(name: str = TRACE_LOGGERS[0]) -> bool:
+    return logging.getLogger(name).isEnabledFor(logging.DEBUG)
+
+
+def install_trace_signal(sig=getattr(signal, "SIGUSR1", None)) -> bool:
+    """Conmuta la traza con una señal (kill -USR1 <pid>). Solo desde el hilo principal y en POSIX."""
+    if sig is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def _toggle(signum, frame):
+        enabled = not trace_enabled()
+        set_trace(enabled)
+        logging.getLogger(TRACE_LOGGERS[0]).warning("🔍 Traza de depuración %s", "activada" if enabled else "desactivada")
+
+    signal.signal(sig, _toggle)
+    return True
+
+
+class _EventPolicy:
+    __slots__ = ("sample", "rate", "burst", "_seen", "_tokens", "_stamp")
+
+    def __init__(self, sample: int = 1, rate: float = None, burst: float = None):
+        self.sample = max(1, int(sample))
+        self.rate = rate
+        self.burst = float(burst if burst is not None else (rate or 1))
+        self._seen = 0
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+
+    def allow(self) -> bool:
+        self._seen += 1
+        if self._seen % self.sample:
+            return False
+        if self.rate is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class HotPathLog:
+    """
+    Envoltorio de un logger para eventos de alta frecuencia:
+        hot.info("share_sent", "🚀 Share enviado: %s", params)
+    Los eventos sin política se emiten siempre (si el nivel está activo).
+    """
+
+    def __init__(self, logger: logging.Logger, policies: dict = None):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._policies = {}
+        self.suppressed = {}
+        for event, policy in {**DEFAULT_POLICIES, **(policies or {})}.items():
+            self.configure(event, **policy)
+
+    @classmethod
+    def from_config(cls, logger: logging.Logger, logging_config: dict = None):
+        """Políticas de `logging_config["events"]` (p.ej. proxy.logging en ia_config) sobre las de DEFAULT_POLICIES."""
+        return cls(logger, (logging_config or {}).get("events"))
+
+    def apply_config(self, logging_config: dict = None):
+        """Aplica las políticas de `logging_config["events"]` a un HotPathLog ya creado (p.ej. uno de módulo)."""
+        for event, policy in (logging_config or {}).get("events", {}).items():
+            self.configure(event, **policy)
+
+    def configure(self, event: str, sample: int = 1, rate: float = None, burst: float = None):
+        with self._lock:
+            self._policies[event] = _EventPolicy(sample, rate, burst)
+
+    def log(self, event: str, level: int, msg: str, *args) -> bool:
+        if not self.logger.isEnabledFor(level):
+            return False
+        policy = self._policies.get(event)
+        if policy is not None:
+            with self._lock:
+                allowed = policy.allow()
+                if not allowed:
+                    self.suppressed[event] = self.suppressed.get(event, 0) + 1
+            if not allowed:
+                return False
+        self.logger.log(level, msg, *args)
+        return True
+
+    def debug(self, event: str, msg: str, *args) -> bool:
+        return self.log(event, logging.DEBUG, msg, *args)
+
+    def info(self, event: str, msg: str, *args) -> bool:
+        return self.log(event, logging.INFO, msg, *args)
+
+    def warning(self, event: str, msg: str, *args) -> bool:
+        return self.log(event, logging.WARNING, msg, *args)
+
+    def take_suppressed(self) -> dict:
+        """Contadores de eventos suprimidos desde la última llamada (y los pone a cero)."""
+        with self._lock:
+            counts, self.suppressed = self.suppressed, {}
+        return counts
+
+    def log_suppressed(self):
+        """Resumen periódico de lo suprimido, en una sola línea."""
+        counts = self.take_suppressed()
+        if counts:
+            summary = ", ".join(f"{event}={count}" for event, count in sorted(counts.items()))
+            self.logger.info("🔇 Logs suprimidos por muestreo/límite: %s", summary)
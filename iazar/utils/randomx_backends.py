@@ -0,0 +1,216 @@
+# iazar/utils/randomx_backends.py
+"""
+Backends de hashing RandomX para IA-Zartrux.
+Un backend expone la misma API que librandomx (randomx_alloc_cache,
+randomx_create_vm, randomx_calculate_hash, ...), de modo que el motor de
+randomx_wrapper funciona igual con cualquiera de ellos:
+
+- "native":  librandomx.so / randomx.dll cargada con ctypes (hashes reales).
+- "standin": sustituto determinista en Python (BLAKE2b con clave = seed) con
+             coste configurable por hash, para pruebas de carga y benchmarks
+             de proxy, inferencia y validación sin la librería nativa.
+
+Los hashes del stand-in NO son hashes RandomX válidos: nunca usarlo contra
+una pool real.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import itertools
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger("RandomXBackends")
+
+# Constantes estándar RandomX (randomx.h)
+RANDOMX_FLAG_DEFAULT = 0
+RANDOMX_FLAG_LARGE_PAGES = 1
+RANDOMX_FLAG_HARD_AES = 2
+RANDOMX_FLAG_FULL_MEM = 4
+RANDOMX_FLAG_JIT = 8
+RANDOMX_FLAG_SECURE = 16
+RANDOMX_FLAG_ARGON2_SSSE3 = 32
+RANDOMX_FLAG_ARGON2_AVX2 = 64
+RANDOMX_HASH_SIZE = 32
+RANDOMX_DATASET_ITEM_SIZE = 64
+
+LIBS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+# Ruta ABSOLUTA a la DLL, siempre válida para ejecución profesional Windows/Linux
+DLL_PATH = os.path.join(LIBS_DIR, "randomx.dll")
+SO_PATH = os.path.join(LIBS_DIR, "librandomx.so")
+
+BACKEND_ENV = "IAZAR_RANDOMX_BACKEND"
+STANDIN_COST_ENV = "IAZAR_RANDOMX_STANDIN_COST"
+
+# Prototipos C: (nombre, argtypes, restype)
+_PROTOTYPES = (
+    ("randomx_get_flags", [], ctypes.c_int),
+    ("randomx_alloc_cache", [ctypes.c_int], ctypes.c_void_p),
+    ("randomx_init_cache", [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t], None),
+    ("randomx_release_cache", [ctypes.c_void_p], None),
+    ("randomx_alloc_dataset", [ctypes.c_int], ctypes.c_void_p),
+    ("randomx_dataset_item_count", [], ctypes.c_ulong),
+    ("randomx_init_dataset", [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong], None),
+    ("randomx_release_dataset", [ctypes.c_void_p], None),
+    ("randomx_get_dataset_memory", [ctypes.c_void_p], ctypes.c_void_p),
+    ("randomx_create_vm", [ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p], ctypes.c_void_p),
+    ("randomx_destroy_vm", [ctypes.c_void_p], None),
+    ("randomx_calculate_hash", [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p], None),
+    ("randomx_calculate_hash_first", [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t], None),
+    ("randomx_calculate_hash_next", [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p], None),
+    ("randomx_calculate_hash_last", [ctypes.c_void_p, ctypes.c_void_p], None),
+)
+
+
+def native_library_candidates() -> list:
+    """Rutas donde buscar librandomx, por orden de preferencia."""
+    candidates = [SO_PATH, DLL_PATH] if not sys.platform.startswith("win") else [DLL_PATH, SO_PATH]
+    found = ctypes.util.find_library("randomx")
+    if found:
+        candidates.append(found)
+    return candidates
+
+
+def load_native_backend(path: str = None):
+    """
+    Carga librandomx con ctypes y declara los prototipos una sola vez.
+    Raises:
+        FileNotFoundError: si no se encuentra la librería en ninguna ruta.
+    """
+    paths = [path] if path else native_library_candidates()
+    for candidate in paths:
+        if candidate and (os.path.isfile(candidate) or not os.path.dirname(candidate)):
+            try:
+                lib = ctypes.CDLL(candidate)
+            except OSError as e:
+                logger.warning(f"No se pudo cargar {candidate}: {e}")
+                continue
+            for name, argtypes, restype in _PROTOTYPES:
+                func = getattr(lib, name)
+                func.argtypes = argtypes
+                func.restype = restype
+            lib.backend_name = "native"
+            logger.info(f"Backend RandomX nativo cargado: {candidate}")
+            return lib
+    raise FileNotFoundError(f"librandomx no encontrada en: {paths}")
+
+
+class StandInBackend:
+    """
+    Sustituto determinista de librandomx con la misma API.
+    hash = BLAKE2b-256(blob, clave=seed) encadenado `cost` veces, de modo que el
+    coste por hash es configurable. Los "punteros" son identificadores enteros.
+    """
+
+    backend_name = "standin"
+
+    def __init__(self, cost: int = 1, dataset_items: int = 1 << 16):
+        self.cost = max(1, int(cost))
+        self.dataset_items = int(dataset_items)
+        self._handles = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _new(self, obj) -> int:
+        with self._lock:
+            handle = next(self._ids)
+            self._handles[handle] = obj
+        return handle
+
+    def _free(self, handle):
+        with self._lock:
+            self._handles.pop(handle, None)
+
+    def _digest(self, key: bytes, data: bytes) -> bytes:
+        digest = hashlib.blake2b(data, digest_size=RANDOMX_HASH_SIZE, key=key).digest()
+        for _ in range(self.cost - 1):
+            digest = hashlib.blake2b(digest, digest_size=RANDOMX_HASH_SIZE, key=key).digest()
+        return digest
+
+    # --- API estilo randomx.h ---
+    def randomx_get_flags(self) -> int:
+        return RANDOMX_FLAG_HARD_AES | RANDOMX_FLAG_JIT
+
+    def randomx_alloc_cache(self, flags: int) -> int:
+        return self._new({"key": b""})
+
+    def randomx_init_cache(self, cache: int, key, key_size: int):
+        self._handles[cache]["key"] = hashlib.blake2b(ctypes.string_at(key, key_size)).digest()
+
+    def randomx_release_cache(self, cache: int):
+        self._free(cache)
+
+    def randomx_alloc_dataset(self, flags: int) -> int:
+        memory = ctypes.create_string_buffer(self.dataset_items * RANDOMX_DATASET_ITEM_SIZE)
+        return self._new({"memory": memory})
+
+    def randomx_dataset_item_count(self) -> int:
+        return self.dataset_items
+
+    def randomx_init_dataset(self, dataset: int, cache: int, start_item: int, item_count: int):
+        key = self._handles[cache]["key"]
+        base = ctypes.addressof(self._handles[dataset]["memory"])
+        for item in range(start_item, start_item + item_count):
+            # El item 0 guarda la clave: el dataset es autosuficiente (p.ej. restaurado de disco)
+            block = key if item == 0 else hashlib.blake2b(item.to_bytes(8, "little"), key=key).digest()
+            ctypes.memmove(base + item * RANDOMX_DATASET_ITEM_SIZE, block, RANDOMX_DATASET_ITEM_SIZE)
+
+    def randomx_release_dataset(self, dataset: int):
+        self._free(dataset)
+
+    def randomx_get_dataset_memory(self, dataset: int) -> int:
+        return ctypes.addressof(self._handles[dataset]["memory"])
+
+    def randomx_create_vm(self, flags: int, cache, dataset) -> int:
+        if dataset:
+            key = self._handles[dataset]["memory"].raw[:RANDOMX_DATASET_ITEM_SIZE]
+        else:
+            key = self._handles[cache]["key"]
+        return self._new({"key": key, "pending": None})
+
+    def randomx_destroy_vm(self, vm: int):
+        self._free(vm)
+
+    def randomx_calculate_hash(self, vm: int, data, size: int, output):
+        digest = self._digest(self._handles[vm]["key"], ctypes.string_at(data, size))
+        ctypes.memmove(output, digest, RANDOMX_HASH_SIZE)
+
+    def randomx_calculate_hash_first(self, vm: int, data, size: int):
+        self._handles[vm]["pending"] = ctypes.string_at(data, size)
+
+    def randomx_calculate_hash_next(self, vm: int, data, size: int, output):
+        state = self._handles[vm]
+        digest = self._digest(state["key"], state["pending"])
+        state["pending"] = ctypes.string_at(data, size)
+        ctypes.memmove(output, digest, RANDOMX_HASH_SIZE)
+
+    def randomx_calculate_hash_last(self, vm: int, output):
+        state = self._handles[vm]
+        digest = self._digest(state["key"], state["pending"])
+        state["pending"] = None
+        ctypes.memmove(output, digest, RANDOMX_HASH_SIZE)
+
+
+def load_backend(name: str = "native", standin_cost: int = 1):
+    """
+    Devuelve el backend RandomX pedido. La variable de entorno
+    IAZAR_RANDOMX_BACKEND tiene prioridad sobre `name`.
+    Args:
+        name (str): "auto" (nativo si existe, si no stand-in), "native" o "standin".
+        standin_cost (int): rondas BLAKE2b por hash del stand-in.
+    """
+    name = os.environ.get(BACKEND_ENV, name or "native").lower()
+    standin_cost = int(os.environ.get(STANDIN_COST_ENV, standin_cost))
+    if name == "standin":
+        logger.warning(f"Backend RandomX stand-in activo (coste={standin_cost}): hashes NO válidos para la pool")
+        return StandInBackend(cost=standin_cost)
+    try:
+        return load_native_backend()
+    except FileNotFoundError:
+        if name == "native":
+            raise
+        logger.warning("librandomx no disponible, usando backend stand-in (hashes NO válidos para la pool)")
+        return StandInBackend(cost=standin_cost)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+randomx_bench.py - Benchmark del motor RandomX (randomx_wrapper + RandomXHandler).
+Mide latencia de inicialización de cache, de dataset por número de hilos,
+latencia de hash individual, H/s por lotes por hilo y RSS por modo.
+Emite JSON, con la librería nativa o con el backend stand-in.
+
+Uso:
+    python -m iazar.utils.randomx_bench --backend standin --threads 1,2,4 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from iazar.utils.randomx_backends import load_backend
+from iazar.utils.randomx_wrapper import (
+    RANDOMX_FLAG_FULL_MEM,
+    NonceBlob,
+    RandomXEngine,
+    RandomXEpoch,
+    describe_flags,
+)
+from iazar.core.randomx_handler import RandomXHandler
+
+BENCH_BLOB = bytes(range(76))
+BENCH_SEEDS = [bytes([i]) * 32 for i in range(1, 8)]
+
+
+def rss_bytes() -> int:
+    """RSS actual del proceso (o el pico si /proc no está disponible)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def bench_cache_init(lib, flags, repeats: int) -> dict:
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        epoch = RandomXEpoch(BENCH_SEEDS[i % len(BENCH_SEEDS)], flags, lib=lib)
+        latencies.append(time.perf_counter() - start)
+        epoch.retire()
+    return {"repeats": repeats, "median_s": statistics.median(latencies), "max_s": max(latencies)}
+
+
+def bench_dataset_init(lib, flags, thread_counts) -> list:
+    results = []
+    for threads in thread_counts:
+        start = time.perf_counter()
+        epoch = RandomXEpoch(BENCH_SEEDS[0], flags, full_mem=True, init_threads=threads, lib=lib)
+        results.append({"threads": threads, "seconds": time.perf_counter() - start})
+        epoch.retire()
+    return results
+
+
+def bench_single_hash(engine, hashes: int) -> dict:
+    nonce_blob = NonceBlob(BENCH_BLOB)
+    seed = BENCH_SEEDS[0]
+    engine.hash_nonce(nonce_blob, 0, seed)  # calentamiento: VM creada
+    latencies = []
+    for nonce in range(hashes):
+        start = time.perf_counter()
+        engine.hash_nonce(nonce_blob, nonce, seed)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "hashes": hashes,
+        "median_ms": statistics.median(latencies) * 1e3,
+        "p99_ms": _percentile(latencies, 0.99) * 1e3,
+    }
+
+
+def bench_handler(engine, hashes: int) -> dict:
+    """Latencia vía RandomXHandler: cambio de seed (época ya creada) y hash individual."""
+    handler = RandomXHandler(engine)
+    start = time.perf_counter()
+    handler.reinitialize_for_new_block(BENCH_SEEDS[0])
+    switch_s = time.perf_counter() - start
+    latencies = []
+    for nonce in range(hashes):
+        start = time.perf_counter()
+        handler.calculate_hash(BENCH_BLOB, nonce, BENCH_SEEDS[0])
+        latencies.append(time.perf_counter() - start)
+    return {"seed_switch_s": switch_s, "median_ms": statistics.median(latencies) * 1e3}
+
+
+def bench_batch(engine, threads: int, batch: int, seconds: float) -> dict:
+    """Cada hilo hashea lotes con su propia VM del pool durante `seconds`."""
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def worker(idx):
+        nonce_blob = NonceBlob(BENCH_BLOB)
+        out = np.empty((batch, 32), dtype=np.uint8)
+        base = idx << 24
+        while not stop.is_set():
+            nonces = np.arange(base, base + batch, dtype=np.uint32)
+            engine.hash_nonces(nonce_blob, nonces, BENCH_SEEDS[0], out=out)
+            counts[idx] += batch
+            base += batch
+
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    per_thread = [c / elapsed for c in counts]
+    return {"threads": threads, "total_hs": sum(per_thread), "per_thread_hs": per_thread}
+
+
+def run_mode(lib, flags, full_mem: bool, args) -> dict:
+    rss_before = rss_bytes()
+    engine = RandomXEngine(flags, full_mem=full_mem, init_threads=max(args.threads), lib=lib)
+    start = time.perf_counter()
+    engine.set_seed(BENCH_SEEDS[0])
+    result = {
+        "mode": "fast" if full_mem else "light",
+        "profile": describe_flags(flags | (RANDOMX_FLAG_FULL_MEM if full_mem else 0)),
+        "epoch_init_s": time.perf_counter() - start,
+        "single_hash": bench_single_hash(engine, args.hashes),
+        "handler": bench_handler(engine, min(args.hashes, 100)),
+        "batch": [bench_batch(engine, t, args.batch, args.seconds) for t in args.threads],
+        "rss_bytes": rss_bytes(),
+        "rss_delta_bytes": rss_bytes() - rss_before,
+    }
+    engine.release()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del motor RandomX")
+    parser.add_argument("--backend", default="native", choices=["native", "standin", "auto"])
+    parser.add_argument("--standin-cost", type=int, default=1, help="rondas BLAKE2b por hash del stand-in")
+    parser.add_argument("--modes", default="light", help="light,fast")
+    parser.add_argument("--threads", default="1,2,4", help="lista de hilos, p.ej. 1,2,4")
+    parser.add_argument("--hashes", type=int, default=200, help="hashes para la latencia individual")
+    parser.add_argument("--batch", type=int, default=256, help="nonces por lote")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duración de cada medida de H/s")
+    parser.add_argument("--cache-repeats", type=int, default=3)
+    parser.add_argument("--no-auto-flags", action="store_true", help="usar RANDOMX_FLAG_DEFAULT")
+    parser.add_argument("--json", help="ruta del fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+    args.threads = [int(t) for t in args.threads.split(",") if t]
+
+    lib = load_backend(args.backend, args.standin_cost)
+    flags = 0 if args.no_auto_flags else int(lib.randomx_get_flags())
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "backend": lib.backend_name,
+        "flags": describe_flags(flags),
+        "cache_init": bench_cache_init(lib, flags, args.cache_repeats),
+        "dataset_init": bench_dataset_init(lib, flags, args.threads) if "fast" in modes else [],
+        "modes": [run_mode(lib, flags, mode == "fast", args) for mode in modes],
+    }
+    output = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
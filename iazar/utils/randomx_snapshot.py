@@ -0,0 +1,203 @@
+# iazar/utils/randomx_snapshot.py
+"""
+Instantáneas en disco del dataset RandomX (modo rápido).
+Reconstruir el dataset de ~2 GB cuesta decenas de segundos en cada arranque
+del proxy o del servidor de predicción; si la seed coincide, el dataset se
+recupera de `paths.cache_dir`: el fichero se mapea (mmap) y se copia por
+tramos a la memoria del dataset recién reservada.
+
+Formato: cabecera de una página + memoria del dataset tal cual
+(randomx_get_dataset_memory). La cabecera lleva un BLAKE2b por cada tramo de
+DIGEST_CHUNK bytes del dataset y un BLAKE2b de sus propios campos; al
+restaurar cada tramo se verifica al copiarlo, así un fichero corrupto o
+truncado se descarta entero. Se conservan como mucho `max_snapshots` épocas
+(LRU por mtime).
+Varios procesos pueden compartir cache_dir (workers de RandomXWorkerFarm en
+modo rápido): solo guarda quien crea el cerrojo `<fichero>.lock` (O_EXCL) y
+cada uno escribe en su propio temporal, así ningún rename publica un fichero
+a medio escribir por otro proceso.
+"""
+
+import ctypes
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+logger = logging.getLogger("RandomXSnapshot")
+
+MAGIC = b"IAZRXDS2"
+# magic, backend (16), seed (32), tamaño del dataset (uint64), tamaño de tramo (uint64),
+# digest de la cabecera (32); le sigue la tabla de digests por tramo (32 bytes cada uno)
+_HEADER = struct.Struct("<8s16s32sQQ32s")
+HEADER_SIZE = 4096  # Alinear los datos a página para el mmap
+DIGEST_CHUNK = 64 << 20  # Tramo verificado (y escrito) de una vez
+DIGEST_SIZE = 32
+SAVE_LOCK_STALE = 15 * 60  # Segundos tras los que un cerrojo de guardado se considera huérfano
+# Raíz del proyecto: las rutas relativas de ia_config ("iazar/cache/") cuelgan de ella, no del CWD
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _chunk_digest(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def _header_digest(backend: bytes, seed: bytes, size: int, chunk: int, table: bytes) -> bytes:
+    """BLAKE2b de los campos de cabecera y de la tabla de digests por tramo."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(MAGIC + backend + seed + size.to_bytes(8, "little") + chunk.to_bytes(8, "little"))
+    h.update(table)
+    return h.digest()
+
+
+def _check_table_fits(size: int):
+    chunks = -(-size // DIGEST_CHUNK)
+    if _HEADER.size + chunks * DIGEST_SIZE > HEADER_SIZE:
+        raise ValueError(f"Dataset de {size} bytes demasiado grande para la cabecera de instantánea")
+    return chunks
+
+
+class DatasetSnapshotStore:
+    def __init__(self, cache_dir: str, max_snapshots: int = 2):
+        self.cache_dir = os.path.join(PROJECT_ROOT, cache_dir)  # Sin efecto si cache_dir es absoluta
+        self.max_snapshots = max(1, int(max_snapshots))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, seed: bytes) -> str:
+        return os.path.join(self.cache_dir, f"randomx_{seed.hex()}.dataset")
+
+    def save(self, seed: bytes, memory_ptr: int, size: int, backend: str):
+        """
+        Escribe el dataset ya inicializado (escritura atómica vía fichero
+        temporal propio del proceso). La memoria se lee directamente del
+        puntero, sin copiarla entera a Python.
+        Returns:
+            str | None: ruta guardada, o None si otro proceso la está guardando
+            o ya existe.
+        """
+        _check_table_fits(size)
+        path = self.path_for(seed)
+        if not self._acquire_save_lock(path):
+            logger.info(f"Dataset RandomX {seed.hex()[:16]} ya se está guardando en otro proceso")
+            return None
+        try:
+            if os.path.isfile(path) and os.path.getsize(path) == HEADER_SIZE + size:
+                return None  # Lo guardó otro proceso antes de tomar el cerrojo
+            self._write(path, seed, memory_ptr, size, backend)
+        finally:
+            os.remove(f"{path}.lock")
+        self.evict()
+        return path
+
+    def _write(self, path: str, seed: bytes, memory_ptr: int, size: int, backend: str):
+        data = memoryview((ctypes.c_char * size).from_address(memory_ptr)).cast("B")
+        backend_raw = backend.encode()[:16].ljust(16, b"\0")
+        start = time.perf_counter()
+        table = bytearray()
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.seek(HEADER_SIZE)
+                for offset in range(0, size, DIGEST_CHUNK):
+                    chunk = data[offset:offset + DIGEST_CHUNK]
+                    table += _chunk_digest(chunk)
+                    f.write(chunk)
+                header = _HEADER.pack(MAGIC, backend_raw, seed, size, DIGEST_CHUNK,
+                                      _header_digest(backend_raw, seed, size, DIGEST_CHUNK, bytes(table)))
+                f.seek(0)
+                f.write((header + table).ljust(HEADER_SIZE, b"\0"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        logger.info(f"Dataset RandomX {seed.hex()[:16]} guardado en {path} ({time.perf_counter() - start:.1f}s)")
+
+    @staticmethod
+    def _acquire_save_lock(path: str) -> bool:
+        """Crea `<path>.lock` en exclusiva; False si otro proceso lo tiene (y no está huérfano)."""
+        lock_path = f"{path}.lock"
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) < SAVE_LOCK_STALE:
+                        return False
+                    os.remove(lock_path)  # Cerrojo de un proceso que murió guardando
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def load(self, seed: bytes, memory_ptr: int, size: int, backend: str) -> bool:
+        """
+        Copia la instantánea de la seed en la memoria del dataset si existe y es
+        íntegra; cada tramo se verifica contra su digest antes de copiarlo. Si
+        uno no coincide, la memoria queda a medio rellenar y el llamante debe
+        reconstruir el dataset.
+        Returns:
+            bool: True si se cargó; False si no hay instantánea válida.
+        """
+        path = self.path_for(seed)
+        if not os.path.isfile(path) or os.path.getsize(path) != HEADER_SIZE + size:
+            return False
+        backend_raw = backend.encode()[:16].ljust(16, b"\0")
+        start = time.perf_counter()
+        valid = False
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            magic, file_backend, file_seed, file_size, chunk, digest = _HEADER.unpack_from(mm, 0)
+            if (magic, file_backend, file_seed, file_size) != (MAGIC, backend_raw, seed, size):
+                logger.warning(f"Instantánea RandomX {path} no corresponde a esta seed/backend")
+                return False
+            chunks = -(-size // chunk) if chunk else 0
+            table = mm[_HEADER.size:_HEADER.size + chunks * DIGEST_SIZE]
+            valid = (
+                chunk > 0
+                and _HEADER.size + chunks * DIGEST_SIZE <= HEADER_SIZE
+                and _header_digest(backend_raw, seed, size, chunk, table) == digest
+            )
+            if valid:
+                src = (ctypes.c_char * size).from_buffer(mm, HEADER_SIZE)
+                try:
+                    with memoryview(src).cast("B") as data:
+                        for i, offset in enumerate(range(0, size, chunk)):
+                            length = min(chunk, size - offset)
+                            expected = table[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]
+                            if _chunk_digest(data[offset:offset + length]) != expected:
+                                valid = False
+                                break
+                            ctypes.memmove(memory_ptr + offset, ctypes.addressof(src) + offset, length)
+                finally:
+                    del src
+        finally:
+            mm.close()
+        if not valid:
+            logger.warning(f"Instantánea RandomX {path} corrupta, se descarta")
+            os.remove(path)
+            return False
+        os.utime(path)  # LRU: marcar como usada
+        logger.info(f"Dataset RandomX {seed.hex()[:16]} restaurado desde {path} ({time.perf_counter() - start:.1f}s)")
+        return True
+
+    def evict(self):
+        """Elimina las instantáneas menos usadas por encima de max_snapshots."""
+        snapshots = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.startswith("randomx_") and name.endswith(".dataset")
+        ]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for path in snapshots[self.max_snapshots:]:
+            try:
+                os.remove(path)
+                logger.info(f"Instantánea RandomX expulsada (LRU): {path}")
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar {path}: {e}")
@@ -2,27 +2,712 @@
 import ctypes
 import os
 import binascii
+import logging
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 
-# Ruta ABSOLUTA a la DLL, siempre válida para ejecución profesional Windows/Linux
-DLL_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "..", "libs", "randomx.dll")
+import numpy as np
+
+# Backend RandomX (nativo o stand-in), cargado de forma perezosa en el primer uso
+from iazar.utils.randomx_backends import (
+    RANDOMX_FLAG_DEFAULT,
+    RANDOMX_FLAG_LARGE_PAGES,
+    RANDOMX_FLAG_HARD_AES,
+    RANDOMX_FLAG_FULL_MEM,
+    RANDOMX_FLAG_JIT,
+    RANDOMX_FLAG_SECURE,
+    RANDOMX_FLAG_ARGON2_SSSE3,
+    RANDOMX_FLAG_ARGON2_AVX2,
+    RANDOMX_HASH_SIZE,
+    RANDOMX_DATASET_ITEM_SIZE,
+    load_backend,
+)
+from iazar.utils.randomx_snapshot import DatasetSnapshotStore
+from iazar.utils.target_utils import hash_meets_threshold, target_to_threshold
+
+logger = logging.getLogger("RandomXWrapper")
+
+RANDOMX_FLAG_NAMES = (
+    (RANDOMX_FLAG_LARGE_PAGES, "large_pages"),
+    (RANDOMX_FLAG_HARD_AES, "hard_aes"),
+    (RANDOMX_FLAG_FULL_MEM, "full_mem"),
+    (RANDOMX_FLAG_JIT, "jit"),
+    (RANDOMX_FLAG_SECURE, "secure"),
+    (RANDOMX_FLAG_ARGON2_SSSE3, "argon2_ssse3"),
+    (RANDOMX_FLAG_ARGON2_AVX2, "argon2_avx2"),
 )
-if not os.path.isfile(DLL_PATH):
-    raise FileNotFoundError(f"randomx.dll no encontrada en: {DLL_PATH}")
-randomx = ctypes.CDLL(DLL_PATH)
+BLOB_NONCE_OFFSET = 39  # Offset típico (varints de 1+1+5 bytes); el real sale de blob_nonce_offset()
+
+PROFILE_LOG_INTERVAL = 60.0  # Segundos entre publicaciones de H/s por perfil
+
+# Modo rápido: dataset de ~2 GB + cache de 256 MB mientras se inicializa
+FAST_MODE_MEMORY = (2080 + 256) * 1024 * 1024
+FAST_MODE_RAM_MARGIN = 512 * 1024 * 1024
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Devuelve el backend RandomX del proceso, cargándolo en el primer uso según
+    randomx.backend ("native", "standin" o "auto") de ia_config.json o la
+    variable de entorno IAZAR_RANDOMX_BACKEND.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                rx_cfg = _load_ia_config().get("randomx", {})
+                _backend = load_backend(rx_cfg.get("backend", "native"), rx_cfg.get("standin_cost", 1))
+    return _backend
+
+
+def _load_ia_config() -> dict:
+    try:
+        from iazar.utils.config_manager import get_ia_config
+        return get_ia_config()
+    except Exception as e:
+        logger.warning(f"ia_config no disponible, usando valores por defecto de RandomX: {e}")
+        return {}
 
-# Constantes estándar RandomX
-RANDOMX_FLAG_DEFAULT = 0
-RANDOMX_HASH_SIZE = 32
-BLOB_NONCE_OFFSET = 39  # Offset real del nonce en blob Monero
 
 def hex_to_bytes(hex_str: str) -> bytes:
     """Convierte cadena hex a bytes."""
     return binascii.unhexlify(hex_str.strip())
 
+
+def as_bytes(value) -> bytes:
+    """Acepta bytes/bytearray o cadena hex y devuelve bytes."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return hex_to_bytes(value)
+
+
+def available_memory_bytes():
+    """RAM libre del sistema en bytes, o None si no se puede determinar."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def blob_nonce_offset(blob) -> int:
+    """Offset del nonce según los varints de cabecera del blob (decodificado una vez por blob)."""
+    from iazar.core.blob_layout import parse_blob_layout  # diferido: iazar.core importa este módulo
+    return parse_blob_layout(blob).nonce_offset
+
+
+def describe_flags(flags: int) -> str:
+    """Nombre legible del perfil de flags RandomX (p.ej. 'hard_aes+jit+argon2_avx2')."""
+    names = [name for bit, name in RANDOMX_FLAG_NAMES if flags & bit]
+    return "+".join(names) or "default"
+
+
+def detect_flags() -> int:
+    """Flags recomendados para esta CPU (JIT, AES hardware, Argon2 SIMD) según randomx_get_flags()."""
+    return int(get_backend().randomx_get_flags())
+
+
+def engine_options_from_config(config: dict) -> dict:
+    """
+    Traduce ia_config.json a opciones del motor.
+    randomx.mode: "light" (por defecto), "fast" o "auto". En "auto" se usa el
+    dataset completo solo si hay más de un hilo (system.max_threads) y la RAM
+    libre alcanza para dataset + cache + margen. randomx.full_mem fuerza el modo.
+    Los flags parten de los detectados en la CPU más los opt-in
+    randomx.large_pages y randomx.secure; randomx.auto_flags=false los desactiva.
+    En modo rápido, randomx.snapshots guarda el dataset en paths.cache_dir
+    (relativa a la raíz del proyecto, no al CWD) para restaurarlo en el siguiente arranque (randomx.max_snapshots épocas).
+    """
+    rx_cfg = config.get("randomx", {})
+    mode = rx_cfg.get("mode", "light")
+    threads = max(1, int(config.get("system", {}).get("max_threads", 1)))
+    flags = detect_flags() if rx_cfg.get("auto_flags", True) else RANDOMX_FLAG_DEFAULT
+    if rx_cfg.get("large_pages", False):
+        flags |= RANDOMX_FLAG_LARGE_PAGES
+    if rx_cfg.get("secure", False):
+        flags |= RANDOMX_FLAG_SECURE
+    if "full_mem" in rx_cfg:
+        mode = "fast" if rx_cfg["full_mem"] else "light"
+    full_mem = mode == "fast"
+    if mode == "auto":
+        free_ram = available_memory_bytes()
+        full_mem = (
+            threads > 1
+            and free_ram is not None
+            and free_ram >= FAST_MODE_MEMORY + FAST_MODE_RAM_MARGIN
+        )
+    return {
+        "flags": flags,
+        "full_mem": full_mem,
+        "init_threads": threads,
+        "max_epochs": int(rx_cfg.get("max_epochs", 3)),
+        "snapshot_dir": (
+            config.get("paths", {}).get("cache_dir", "iazar/cache/")
+            if full_mem and rx_cfg.get("snapshots", True) else None
+        ),
+        "max_snapshots": int(rx_cfg.get("max_snapshots", 2)),
+    }
+
+
+def _alloc_with_fallback(alloc, flags: int, what: str):
+    """
+    Llama a una función de reserva RandomX; si falla con large pages (p.ej. sin
+    hugepages configuradas) reintenta sin ellas.
+    Returns:
+        tuple: (puntero, flags efectivos)
+    """
+    ptr = alloc(flags)
+    if not ptr and flags & RANDOMX_FLAG_LARGE_PAGES:
+        logger.warning(f"{what}: large pages no disponibles, reintentando sin ellas")
+        flags &= ~RANDOMX_FLAG_LARGE_PAGES
+        ptr = alloc(flags)
+    if not ptr:
+        raise MemoryError(f"{what} devolvió NULL")
+    return ptr, flags
+
+
+class RandomXEpoch:
+    """
+    Estado RandomX de una seed: cache inicializada + pool de VMs reutilizables.
+    Las VMs se prestan con acquire_vm() y vuelven al pool al terminar; la cache
+    solo se libera cuando la época está retirada y nadie la tiene fijada (pin()
+    o una VM prestada).
+    Con `snapshots` (DatasetSnapshotStore) el dataset se restaura de disco si
+    existe y, si no, se guarda en segundo plano tras inicializarlo.
+    """
+
+    def __init__(self, seed: bytes, flags: int = RANDOMX_FLAG_DEFAULT,
+                 full_mem: bool = False, init_threads: int = 1, lib=None,
+                 snapshots: DatasetSnapshotStore = None):
+        self.lib = lib if lib is not None else get_backend()
+        self.seed = seed
+        self.flags = flags | (RANDOMX_FLAG_FULL_MEM if full_mem else 0)
+        self.full_mem = full_mem
+        self.dataset = None
+        self._lock = threading.Lock()
+        self._idle_vms = []
+        self._all_vms = []
+        self._in_use = 0
+        self._retired = False
+        self.cache = None
+
+        if full_mem and snapshots is not None and self._restore_dataset(snapshots):
+            return
+        self.cache, cache_flags = _alloc_with_fallback(self.lib.randomx_alloc_cache, flags, "randomx_alloc_cache")
+        if not cache_flags & RANDOMX_FLAG_LARGE_PAGES:
+            self.flags &= ~RANDOMX_FLAG_LARGE_PAGES
+        key = ctypes.create_string_buffer(seed, len(seed))
+        self.lib.randomx_init_cache(self.cache, key, len(seed))
+        if full_mem:
+            self._init_dataset(cache_flags, init_threads)
+            if snapshots is not None:
+                self._save_dataset(snapshots)
+
+    def _init_dataset(self, flags: int, threads: int):
+        """
+        Reserva el dataset (~2 GB) y lo rellena en paralelo: cada hilo inicializa
+        un tramo contiguo de items (ctypes libera el GIL durante la llamada C).
+        Una vez lleno, la cache ya no hace falta para hashear y se libera.
+        """
+        try:
+            self.dataset, _ = _alloc_with_fallback(self.lib.randomx_alloc_dataset, flags, "randomx_alloc_dataset")
+        except MemoryError:
+            self.lib.randomx_release_cache(self.cache)
+            self.cache = None
+            raise
+        item_count = self.lib.randomx_dataset_item_count()
+        threads = max(1, min(int(threads), item_count))
+        per_thread = item_count // threads
+        workers = []
+        start = time.perf_counter()
+        for i in range(threads):
+            first = i * per_thread
+            count = per_thread if i < threads - 1 else item_count - first
+            t = threading.Thread(
+                target=self.lib.randomx_init_dataset,
+                args=(self.dataset, self.cache, first, count),
+                daemon=True,
+            )
+            t.start()
+            workers.append(t)
+        for t in workers:
+            t.join()
+        logger.info(f"Dataset RandomX inicializado con {threads} hilos en {time.perf_counter() - start:.1f}s")
+        self.lib.randomx_release_cache(self.cache)
+        self.cache = None
+
+    def _dataset_size(self) -> int:
+        return self.lib.randomx_dataset_item_count() * RANDOMX_DATASET_ITEM_SIZE
+
+    def _restore_dataset(self, snapshots: DatasetSnapshotStore) -> bool:
+        """Reserva el dataset y lo rellena desde la instantánea de disco, sin cache."""
+        path = snapshots.path_for(self.seed)
+        if not os.path.isfile(path):
+            return False
+        self.dataset, dataset_flags = _alloc_with_fallback(
+            self.lib.randomx_alloc_dataset, self.flags, "randomx_alloc_dataset"
+        )
+        try:
+            memory = self.lib.randomx_get_dataset_memory(self.dataset)
+            loaded = snapshots.load(self.seed, memory, self._dataset_size(), self.lib.backend_name)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo restaurar el dataset RandomX desde {path}: {e}")
+            loaded = False
+        if not loaded:
+            self.lib.randomx_release_dataset(self.dataset)
+            self.dataset = None
+            return False
+        if not dataset_flags & RANDOMX_FLAG_LARGE_PAGES:
+            self.flags &= ~RANDOMX_FLAG_LARGE_PAGES
+        return True
+
+    def _save_dataset(self, snapshots: DatasetSnapshotStore):
+        """Guarda el dataset en un hilo de fondo; la época queda retenida mientras tanto."""
+        with self._lock:
+            self._in_use += 1
+        memory = self.lib.randomx_get_dataset_memory(self.dataset)
+
+        def save():
+            try:
+                snapshots.save(self.seed, memory, self._dataset_size(), self.lib.backend_name)
+            except OSError as e:
+                logger.warning(f"No se pudo guardar el dataset RandomX: {e}")
+            finally:
+                self._unpin()
+
+        threading.Thread(target=save, name=f"randomx-snapshot-{self.seed.hex()[:8]}", daemon=True).start()
+
+    @property
+    def profile(self) -> str:
+        return describe_flags(self.flags)
+
+    def _create_vm(self):
+        vm, self.flags = _alloc_with_fallback(
+            lambda flags: self.lib.randomx_create_vm(flags, self.cache, self.dataset),
+            self.flags,
+            "randomx_create_vm",
+        )
+        return vm
+
+    def pin(self) -> bool:
+        """
+        Fija la época: no se libera aunque se retire hasta el _unpin()
+        correspondiente. False si ya estaba retirada y sin usuarios (liberada).
+        """
+        with self._lock:
+            if self._retired and self._in_use == 0:
+                return False
+            self._in_use += 1
+            return True
+
+    @contextmanager
+    def acquire_vm(self):
+        """Presta una VM del pool (la crea si no hay ninguna libre)."""
+        if not self.pin():
+            raise RuntimeError("Época RandomX ya liberada")
+        with self.pinned_vm() as vm:
+            yield vm
+
+    @contextmanager
+    def pinned_vm(self):
+        """Como acquire_vm() para una época ya fijada con pin(); al salir la suelta."""
+        vm = None
+        try:
+            with self._lock:
+                vm = self._idle_vms.pop() if self._idle_vms else None
+            if vm is None:
+                vm = self._create_vm()
+                with self._lock:
+                    self._all_vms.append(vm)
+            yield vm
+        finally:
+            self._unpin(vm)
+
+    def _unpin(self, vm=None):
+        """Devuelve la VM al pool y libera la época si estaba retirada y ya nadie la usa."""
+        with self._lock:
+            self._in_use -= 1
+            if vm is not None:
+                self._idle_vms.append(vm)
+            release_now = self._retired and self._in_use == 0
+        if release_now:
+            self._release()
+
+    def retire(self):
+        """Marca la época como retirada; se libera en cuanto no tenga VMs prestadas."""
+        with self._lock:
+            self._retired = True
+            release_now = self._in_use == 0
+        if release_now:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            vms, self._all_vms, self._idle_vms = self._all_vms, [], []
+            cache, self.cache = self.cache, None
+            dataset, self.dataset = self.dataset, None
+        for vm in vms:
+            self.lib.randomx_destroy_vm(vm)
+        if cache:
+            self.lib.randomx_release_cache(cache)
+        if dataset:
+            self.lib.randomx_release_dataset(dataset)
+
+
+class RandomXEngine:
+    """
+    Motor de hashing RandomX de larga vida.
+    Mantiene una cache inicializada por seed_hash y un pool de VMs por época;
+    solo se reconstruye cuando cambia la seed (cada 2048 bloques en Monero).
+    Con full_mem=True cada época reserva el dataset completo (modo rápido),
+    compartido por todas las VMs del proceso.
+
+    La seed de la época siguiente puede precalentarse con prefetch_seed(): la
+    cache/dataset se construye en un hilo de fondo y set_seed() solo cambia la
+    época activa (cambio atómico). Se conservan hasta max_epochs épocas (por
+    defecto anterior, actual y siguiente) para validar shares tardíos; la
+    activa y las dos últimas precalentadas (seed del trabajo y next_seed_hash)
+    nunca se expulsan. Un share de una seed ya expulsada reconstruye su época
+    en el hilo llamante, con aviso en el log, sin desplazar a las protegidas.
+    Con snapshot_dir, los datasets del modo rápido se persisten en disco y un
+    reinicio con la misma seed los restaura en lugar de reconstruirlos.
+    """
+
+    def __init__(self, flags: int = RANDOMX_FLAG_DEFAULT, max_epochs: int = 3,
+                 full_mem: bool = False, init_threads: int = 1, lib=None,
+                 snapshot_dir: str = None, max_snapshots: int = 2):
+        self.lib = lib if lib is not None else get_backend()
+        self.flags = flags
+        self.full_mem = full_mem
+        self.init_threads = max(1, int(init_threads))
+        self.max_epochs = max(1, int(max_epochs))
+        self.snapshots = DatasetSnapshotStore(snapshot_dir, max_snapshots) if full_mem and snapshot_dir else None
+        self._epochs = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.current_seed = None
+        self._prefetched = deque(maxlen=2)  # Seeds pedidas con prefetch_seed(): trabajo actual y siguiente
+        self._profile_stats = {}
+        self._stats_lock = threading.Lock()
+        self._last_profile_log = time.monotonic()
+
+    def set_seed(self, seed) -> RandomXEpoch:
+        """Activa la seed indicada, inicializando su cache si todavía no existe."""
+        epoch = self.get_epoch(seed)
+        with self._lock:
+            self.current_seed = epoch.seed
+        return epoch
+
+    def get_epoch(self, seed, pin: bool = False) -> RandomXEpoch:
+        """
+        Devuelve la época de la seed. Si se está precalentando espera a que
+        termine; si no existe la construye en el hilo llamante.
+        Con pin=True la época se devuelve ya fijada (búsqueda y pin bajo el
+        mismo lock, así una expulsión concurrente no la libera); el llamante
+        la suelta con pinned_vm().
+        """
+        seed = as_bytes(seed)
+        while True:
+            with self._lock:
+                epoch = self._epochs.get(seed)
+                if epoch is not None:
+                    self._epochs.move_to_end(seed)
+                    if pin:
+                        epoch.pin()  # Sigue en _epochs: todavía no está retirada
+                    return epoch
+                pending = self._pending.get(seed)
+                owner = pending is None
+                if owner:
+                    pending = self._pending[seed] = Future()
+            if owner:
+                self._warn_stale(seed)
+                self._build_epoch(seed, pending)
+            epoch = pending.result()
+            if not pin or epoch.pin():
+                return epoch
+            # Expulsada y liberada entre su construcción y el pin: se vuelve a buscar
+
+    @contextmanager
+    def _epoch_vm(self, seed):
+        """Época de la seed fijada durante el bloque y una VM suya: (época, vm)."""
+        epoch = self.get_epoch(seed, pin=True)
+        with epoch.pinned_vm() as vm:
+            yield epoch, vm
+
+    def prefetch_seed(self, seed) -> bool:
+        """
+        Construye en segundo plano la época de una seed futura (next_seed_hash).
+        Returns:
+            bool: True si se lanzó la construcción, False si ya existía o estaba en curso.
+        """
+        seed = as_bytes(seed)
+        with self._lock:
+            if seed in self._prefetched:
+                self._prefetched.remove(seed)
+            self._prefetched.append(seed)
+            if seed in self._epochs or seed in self._pending:
+                return False
+            pending = self._pending[seed] = Future()
+        threading.Thread(
+            target=self._build_epoch,
+            args=(seed, pending),
+            name=f"randomx-prefetch-{seed.hex()[:8]}",
+            daemon=True,
+        ).start()
+        return True
+
+    def _build_epoch(self, seed: bytes, pending: Future):
+        logger.info(f"Inicializando cache RandomX para seed {seed.hex()[:16]}...")
+        try:
+            epoch = RandomXEpoch(seed, self.flags, self.full_mem, self.init_threads, self.lib, self.snapshots)
+        except Exception as e:
+            logger.error(f"Error inicializando época RandomX {seed.hex()[:16]}: {e}")
+            with self._lock:
+                self._pending.pop(seed, None)
+            pending.set_exception(e)
+            return
+        logger.info(f"Época RandomX {seed.hex()[:16]} lista, perfil {epoch.profile}")
+        with self._lock:
+            self._pending.pop(seed, None)
+            self._epochs[seed] = epoch
+            evicted = self._evict_locked(seed)
+        for old in evicted:
+            old.retire()
+        pending.set_result(epoch)
+
+    def _protected_locked(self) -> set:
+        return {self.current_seed, *self._prefetched}
+
+    def _warn_stale(self, seed: bytes):
+        """Avisa si se va a reconstruir la época de una seed que no es la activa ni una precalentada."""
+        with self._lock:
+            protected = self._protected_locked() - {None}
+        if protected and seed not in protected:
+            logger.warning(
+                f"Reconstruyendo época RandomX de seed no activa {seed.hex()[:16]} en el hilo llamante "
+                f"(share tardío); las épocas activa y siguiente se conservan"
+            )
+
+    def _evict_locked(self, built: bytes) -> list:
+        """
+        Descarta las épocas menos usadas por encima de max_epochs. Nunca la
+        activa, las precalentadas ni la recién construida (`built`), aunque
+        eso deje la cuenta por encima del límite hasta la siguiente construcción.
+        """
+        keep = self._protected_locked() | {built}
+        evicted = []
+        for seed in list(self._epochs):
+            if len(self._epochs) <= self.max_epochs:
+                break
+            if seed not in keep:
+                evicted.append(self._epochs.pop(seed))
+        return evicted
+
+    def hash(self, blob: bytes, seed) -> bytes:
+        """Hash RandomX de un blob ya preparado (nonce incluido)."""
+        buf = ctypes.create_string_buffer(bytes(blob), len(blob))
+        out_hash = (ctypes.c_ubyte * RANDOMX_HASH_SIZE)()
+        with self._epoch_vm(seed) as (epoch, vm):
+            start = time.perf_counter()
+            self.lib.randomx_calculate_hash(vm, buf, len(blob), out_hash)
+            self._record(epoch.profile, 1, time.perf_counter() - start)
+        return bytes(out_hash)
+
+    def hash_nonce(self, nonce_blob: "NonceBlob", nonce: int, seed) -> bytes:
+        """
+        Escribe el nonce in situ en el buffer preasignado del blob y lo pasa a
+        randomx_calculate_hash sin copias intermedias.
+        """
+        nonce_blob.set_nonce(nonce)
+        out_hash = nonce_blob.out
+        with self._epoch_vm(seed) as (epoch, vm):
+            start = time.perf_counter()
+            self.lib.randomx_calculate_hash(vm, nonce_blob.buffer, nonce_blob.size, out_hash)
+            self._record(epoch.profile, 1, time.perf_counter() - start)
+        return bytes(out_hash)
+
+    def hash_nonces(self, blob, nonces, seed, nonce_offset: int = None,
+                    out: np.ndarray = None) -> np.ndarray:
+        """
+        Hashea un mismo blob con muchos nonces en una sola VM.
+        Usa el pipeline randomx_calculate_hash_first/next/last (la VM calcula el
+        hash i mientras prepara el i+1) y escribe cada nonce in situ en el buffer
+        preasignado del blob: el bucle por nonce no reserva memoria.
+        Args:
+            blob: NonceBlob del trabajo, o bytes/hex (se usa el buffer del hilo).
+            nonces: array de nonces uint32.
+            seed: seed_hash (bytes o hex).
+            nonce_offset: offset del nonce (por defecto, el de la cabecera del blob).
+            out: array (n, 32) uint8 C-contiguo a reutilizar (opcional).
+        Returns:
+            np.ndarray: hashes contiguos de forma (n, 32), dtype uint8.
+        Raises:
+            ValueError: si `out` no es un array uint8 escribible y C-contiguo
+                de al menos n * 32 bytes (se escribe por puntero).
+        """
+        nonces = np.ascontiguousarray(nonces, dtype=np.uint32)
+        n = len(nonces)
+        if out is None:
+            out = np.empty((n, RANDOMX_HASH_SIZE), dtype=np.uint8)
+        else:
+            _check_out_buffer(out, n)
+        if n == 0:
+            return out
+        nonce_blob = blob if isinstance(blob, NonceBlob) else get_nonce_blob(blob, nonce_offset)
+        buf, size, offset = nonce_blob.buffer, nonce_blob.size, nonce_blob.nonce_offset
+        pack_into = _NONCE_LE.pack_into
+        calculate_next = self.lib.randomx_calculate_hash_next
+        out_ptr = out.ctypes.data
+        nonce_list = nonces.tolist()
+        with self._epoch_vm(seed) as (epoch, vm):
+            start = time.perf_counter()
+            pack_into(buf, offset, nonce_list[0])
+            self.lib.randomx_calculate_hash_first(vm, buf, size)
+            for i in range(1, n):
+                pack_into(buf, offset, nonce_list[i])
+                calculate_next(vm, buf, size, out_ptr + (i - 1) * RANDOMX_HASH_SIZE)
+            self.lib.randomx_calculate_hash_last(vm, out_ptr + (n - 1) * RANDOMX_HASH_SIZE)
+            self._record(epoch.profile, n, time.perf_counter() - start)
+        return out
+
+    def _record(self, profile: str, hashes: int, seconds: float):
+        """Acumula hashes/tiempo por perfil y publica los H/s periódicamente en el log."""
+        with self._stats_lock:
+            stats = self._profile_stats.setdefault(profile, [0, 0.0])
+            stats[0] += hashes
+            stats[1] += seconds
+            now = time.monotonic()
+            publish = now - self._last_profile_log >= PROFILE_LOG_INTERVAL
+            if publish:
+                self._last_profile_log = now
+        if publish:
+            for name, data in self.profile_stats().items():
+                logger.info(f"RandomX perfil {name}: {data['hs']:.1f} H/s ({data['hashes']} hashes)")
+
+    def profile_stats(self) -> dict:
+        """H/s medidos por perfil de flags: {perfil: {"hashes", "seconds", "hs"}}."""
+        with self._stats_lock:
+            return {
+                profile: {
+                    "hashes": hashes,
+                    "seconds": seconds,
+                    "hs": hashes / seconds if seconds > 0 else 0.0,
+                }
+                for profile, (hashes, seconds) in self._profile_stats.items()
+            }
+
+    def release(self):
+        """Libera todas las épocas (caches y VMs)."""
+        with self._lock:
+            epochs = list(self._epochs.values())
+            self._epochs.clear()
+            self._prefetched.clear()
+            self.current_seed = None
+        for epoch in epochs:
+            epoch.retire()
+
+
+def _check_out_buffer(out, n: int):
+    if not isinstance(out, np.ndarray) or out.dtype != np.uint8:
+        raise ValueError(f"out debe ser un np.ndarray uint8, no {type(out).__name__}/{getattr(out, 'dtype', None)}")
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out debe ser C-contiguo y escribible")
+    if out.nbytes < n * RANDOMX_HASH_SIZE:
+        raise ValueError(f"out tiene {out.nbytes} bytes y hacen falta {n * RANDOMX_HASH_SIZE} ({n} hashes)")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RandomXEngine:
+    """Devuelve el motor RandomX compartido por todo el proceso."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RandomXEngine(**load_engine_options())
+                mode = "rápido (dataset)" if _engine.full_mem else "ligero (cache)"
+                logger.info(
+                    f"Motor RandomX ({_engine.lib.backend_name}) en modo {mode}, "
+                    f"{_engine.init_threads} hilos, perfil {describe_flags(_engine.flags)}"
+                )
+    return _engine
+
+
+def load_engine_options() -> dict:
+    """Opciones de RandomXEngine según ia_config.json (solo flags detectados si no hay config)."""
+    config = _load_ia_config()
+    if not config:
+        return {"flags": detect_flags()}
+    return engine_options_from_config(config)
+
+
+class NonceBlob:
+    """
+    Blob de un trabajo decodificado una vez en un buffer ctypes preasignado.
+    El nonce se escribe in situ con struct.pack_into y el buffer se pasa
+    directamente a RandomX; `out` es el buffer de salida reutilizable.
+    Sin nonce_offset explícito se toma del layout de la cabecera del blob.
+    """
+
+    __slots__ = ("key", "buffer", "size", "nonce_offset", "out")
+
+    def __init__(self, blob, nonce_offset: int = None):
+        raw = as_bytes(blob)
+        self.key = blob
+        self.size = len(raw)
+        self.buffer = ctypes.create_string_buffer(raw, self.size)
+        self.nonce_offset = nonce_offset if nonce_offset is not None else blob_nonce_offset(raw)
+        self.out = (ctypes.c_ubyte * RANDOMX_HASH_SIZE)()
+
+    def set_nonce(self, nonce: int):
+        _NONCE_LE.pack_into(self.buffer, self.nonce_offset, nonce)
+
+
+_NONCE_LE = struct.Struct("<I")
+_tls = threading.local()
+
+
+def get_nonce_blob(blob, nonce_offset: int = None) -> NonceBlob:
+    """
+    NonceBlob del hilo actual para este blob: se reconstruye solo cuando cambia
+    el trabajo (blob u offset), así cada worker reutiliza su buffer por trabajo.
+    """
+    cached = getattr(_tls, "nonce_blob", None)
+    if (cached is None or cached.key != blob
+            or (nonce_offset is not None and cached.nonce_offset != nonce_offset)):
+        cached = _tls.nonce_blob = NonceBlob(blob, nonce_offset)
+    return cached
+
+
+def insert_nonce(blob, nonce: int, offset: int = None) -> bytes:
+    """Devuelve el blob con el nonce (uint32 little-endian) insertado."""
+    blob = bytearray(as_bytes(blob))
+    if offset is None:
+        offset = blob_nonce_offset(bytes(blob))
+    blob[offset:offset + 4] = int(nonce).to_bytes(4, "little")
+    return bytes(blob)
+
+
 def compute_randomx_hash(blob_hex: str, nonce: int, seed_hash_hex: str) -> str:
     """
     Calcula el hash RandomX para un blob Monero y nonce dado.
+    Usa el motor compartido: la cache de la seed se inicializa una sola vez y
+    el blob se decodifica una vez por trabajo en el buffer del hilo.
     Args:
         blob_hex (str): blob hex string del trabajo pool.
         nonce (int): nonce entero a insertar.
@@ -30,53 +715,33 @@ def compute_randomx_hash(blob_hex: str, nonce: int, seed_hash_hex: str) -> str:
     Returns:
         str: hash hexadecimal (64 chars).
     """
-    # 1. Preparar blob y clave
-    blob = bytearray(hex_to_bytes(blob_hex))
-    blob[BLOB_NONCE_OFFSET:BLOB_NONCE_OFFSET+4] = int(nonce).to_bytes(4, "little")
-    key = hex_to_bytes(seed_hash_hex)
-
-    # 2. Reservar e inicializar cache
-    randomx_alloc_cache = randomx.randomx_alloc_cache
-    randomx_alloc_cache.restype = ctypes.c_void_p
-    cache = randomx_alloc_cache(RANDOMX_FLAG_DEFAULT)
-
-    randomx_init_cache = randomx.randomx_init_cache
-    randomx_init_cache.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
-    randomx_init_cache.restype = None
-    randomx_init_cache(cache, ctypes.c_char_p(key), ctypes.c_size_t(len(key)))
-
-    # 3. Crear máquina virtual
-    randomx_create_vm = randomx.randomx_create_vm
-    randomx_create_vm.restype = ctypes.c_void_p
-    vm = randomx_create_vm(RANDOMX_FLAG_DEFAULT, cache, None)
-
-    # 4. Preparar función de hash
-    randomx_calculate_hash = randomx.randomx_calculate_hash
-    randomx_calculate_hash.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
-    randomx_calculate_hash.restype = None
-
-    # 5. Calcular hash
-    out_hash = (ctypes.c_ubyte * RANDOMX_HASH_SIZE)()
-    randomx_calculate_hash(
-        vm,
-        ctypes.c_char_p(bytes(blob)),
-        ctypes.c_size_t(len(blob)),
-        ctypes.byref(out_hash)
-    )
-
-    # 6. Liberar recursos
-    randomx.randomx_destroy_vm(vm)
-    randomx.randomx_release_cache(cache)
-
-    return bytes(out_hash).hex()
-
-def hash_meets_target(hash_hex: str, target_hex: str) -> bool:
-    """
-    Verifica si el hash cumple la dificultad (menor o igual al target).
+    return get_engine().hash_nonce(get_nonce_blob(blob_hex), nonce, seed_hash_hex).hex()
+
+
+def compute_randomx_hashes(blob, nonces, seed) -> np.ndarray:
+    """
+    Versión por lotes de compute_randomx_hash.
+    Args:
+        blob: blob del trabajo pool (hex o bytes).
+        nonces: array NumPy de nonces uint32.
+        seed: seed hash (hex o bytes).
+    Returns:
+        np.ndarray: (n, 32) uint8, fila i = hash del nonce i.
+    """
+    return get_engine().hash_nonces(blob, nonces, seed)
+
+
+def hash_meets_target(hash_value, target) -> bool:
+    """
+    Verifica si el hash cumple la dificultad con la semántica Monero/xmrig:
+    los 8 bytes superiores del hash (uint64 little-endian) < umbral del target.
     Args:
-        hash_hex (str): Hash calculado (hex string, 64 chars).
-        target_hex (str): Target de dificultad (hex string, típicamente 8 chars para Monero).
+        hash_value (bytes | str): Hash crudo (32 bytes) o hex de 64 chars.
+        target (str | int): Target de la pool (hex de 8/16 chars) o umbral ya
+            expandido con target_to_threshold (preferible: una vez por trabajo).
     Returns:
         bool: True si cumple, False si no.
     """
-    return int(hash_hex, 16) <= int(target_hex, 16)
+    if isinstance(hash_value, str):
+        hash_value = hex_to_bytes(hash_value)
+    return hash_meets_threshold(hash_value, target_to_threshold(target))
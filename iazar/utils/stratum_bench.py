@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+stratum_bench.py - Microbenchmark del codec Stratum (stratum_codec).
+Mide mensajes por segundo decodificados (recv troceados en bloques de
+--chunk bytes, con líneas partidas entre bloques) y codificados, con el
+backend JSON activo (orjson o stdlib) frente a la stdlib, y contra el
+troceo ingenuo split('\\n') + json.loads que usaban los adaptadores.
+
+Uso:
+    python -m iazar.utils.stratum_bench --messages 200000 --chunk 4096 --json out.json
+"""
+
+import argparse
+import json
+import platform
+import time
+
+from iazar.utils import stratum_codec
+from iazar.utils.stratum_codec import StratumDecoder
+
+SAMPLE_JOB = {
+    "jsonrpc": "2.0",
+    "method": "job",
+    "params": {
+        "blob": "1010" + "ab" * 74,
+        "job_id": "a1b2c3d4e5f6",
+        "target": "b88d0600",
+        "seed_hash": "cd" * 32,
+        "height": 3100000,
+        "algo": "rx/0",
+    },
+}
+SAMPLE_SUBMIT = {
+    "id": 42,
+    "jsonrpc": "2.0",
+    "method": "submit",
+    "params": {"id": "1", "job_id": "a1b2c3d4e5f6", "nonce": "0f000001", "result": "ef" * 32},
+}
+
+
+def build_stream(messages: int) -> bytes:
+    """Flujo de mensajes alternando trabajos y submits, como en una conexión real."""
+    lines = [json.dumps(SAMPLE_JOB).encode(), json.dumps(SAMPLE_SUBMIT).encode()]
+    return b"\n".join(lines[i % 2] for i in range(messages)) + b"\n"
+
+
+def _chunks(stream: bytes, size: int) -> list:
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def bench_decoder(chunks, messages: int) -> dict:
+    decoder = StratumDecoder()
+    start = time.perf_counter()
+    decoded = 0
+    for chunk in chunks:
+        decoded += len(decoder.feed(chunk))
+    elapsed = time.perf_counter() - start
+    assert decoded == messages, f"decodificados {decoded} de {messages}"
+    return {"seconds": elapsed, "msgs_per_s": messages / elapsed}
+
+
+def bench_naive(chunks, messages: int) -> dict:
+    """Referencia: buffer str + split por línea + json.loads (implementación previa)."""
+    start = time.perf_counter()
+    buffer = ""
+    decoded = 0
+    for chunk in chunks:
+        buffer += chunk.decode()
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if line.strip():
+                json.loads(line)
+                decoded += 1
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "msgs_per_s": decoded / elapsed}
+
+
+def bench_encode(messages: int, dumps) -> dict:
+    start = time.perf_counter()
+    for i in range(messages):
+        dumps(SAMPLE_JOB if i % 2 else SAMPLE_SUBMIT)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "msgs_per_s": messages / elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark del codec Stratum")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--chunk", type=int, default=4096, help="bytes por recv simulado")
+    parser.add_argument("--json", help="ruta del fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    chunks = _chunks(build_stream(args.messages), args.chunk)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "json_backend": stratum_codec.JSON_BACKEND,
+        "messages": args.messages,
+        "chunk": args.chunk,
+        "decode": bench_decoder(chunks, args.messages),
+        "decode_naive": bench_naive(chunks, args.messages),
+        "encode": bench_encode(args.messages, stratum_codec.encode),
+        "encode_stdlib": bench_encode(args.messages, lambda m: (json.dumps(m) + "\n").encode()),
+    }
+    output = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# iazar/utils/stratum_codec.py
+"""
+Codec Stratum (JSON delimitado por saltos de línea) común a todos los extremos:
+pool upstream, mineros XMRig y adaptadores.
+- StratumDecoder acumula los bytes recibidos en un bytearray reutilizable y
+  devuelve los mensajes completos; una línea partida entre dos recv se
+  conserva hasta que llega el resto, y varios mensajes en un mismo recv se
+  devuelven todos.
+- loads/dumps usan orjson si está instalado y json de la stdlib si no.
+"""
+
+import json
+import logging
+
+try:
+    import orjson  # Opcional: (de)serialización JSON más rápida
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("StratumCodec")
+
+MAX_LINE = 64 * 1024  # Ningún mensaje Stratum legítimo se acerca a esto
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(message) -> bytes:
+        return orjson.dumps(message)
+else:
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(message) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode()
+
+
+def encode(message) -> bytes:
+    """Mensaje listo para enviar: JSON + '\\n'."""
+    return dumps(message) + b"\n"
+
+
+class StratumDecoder:
+    """
+    Decodificador incremental por líneas. Un decoder por conexión.
+    Las líneas que no son JSON válido se descartan y se cuentan en `errors`.
+    """
+
+    def __init__(self, max_line: int = MAX_LINE):
+        self.max_line = max_line
+        self._buffer = bytearray()
+        self.errors = 0
+
+    def feed_lines(self, data) -> list:
+        """Añade bytes recibidos y devuelve las líneas completas (sin '\\n' ni vacías)."""
+        buffer = self._buffer
+        buffer += data
+        lines = []
+        start = 0
+        find = buffer.find
+        while True:
+            end = find(b"\n", start)
+            if end < 0:
+                break
+            if end > start:
+                line = buffer[start:end]
+                if line.strip():
+                    lines.append(line)
+            start = end + 1
+        if start:
+            del buffer[:start]  # Una sola compactación por recv
+        if len(buffer) > self.max_line:
+            self.errors += 1
+            logger.warning(f"Línea Stratum de más de {self.max_line} bytes sin '\\n', descartada")
+            buffer.clear()
+        return lines
+
+    def feed(self, data) -> list:
+        """Añade bytes recibidos y devuelve los mensajes JSON completos."""
+        messages = []
+        for line in self.feed_lines(data):
+            try:
+                messages.append(loads(line))
+            except ValueError:
+                self.errors += 1
+                logger.warning(f"Mensaje Stratum no JSON: {bytes(line[:200])}")
+        return messages
+
+    def pending_bytes(self) -> int:
+        return len(self._buffer)
+
+    def reset(self):
+        """Descarta lo acumulado (p.ej. al reconectar)."""
+        self._buffer.clear()
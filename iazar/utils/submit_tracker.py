@@ -0,0 +1,139 @@
+# iazar/utils/submit_tracker.py
+"""
+Correlación de submits Stratum con sus respuestas por id de petición.
+Cada submit recibe un id creciente y queda en una tabla en vuelo; la respuesta
+de la pool lo resuelve por id, en el orden en que llegue, así caben varios
+shares en vuelo por conexión sin bloquear la lectura de trabajos nuevos.
+Los que superan el timeout se resuelven como fallidos; `consecutive_timeouts`
+cuenta los expirados seguidos desde la última respuesta recibida.
+Sin I/O: el dueño de la conexión envía el mensaje y pasa las respuestas a
+resolve().
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from iazar.utils.latency import LatencyRecorder
+
+FIRST_SUBMIT_ID = 3  # 1 y 2 quedan para subscribe y login
+SUBMIT_TIMEOUT = 10.0
+
+
+class _InFlight:
+    __slots__ = ("sent_at", "info", "future")
+
+    def __init__(self, sent_at, info, future):
+        self.sent_at = sent_at
+        self.info = info
+        self.future = future
+
+
+class SubmitTracker:
+    """
+    Tabla de submits en vuelo de una conexión. Cada resultado es un dict
+    {"id", "accepted", "result", "error", "rtt_ms", "info"}.
+    """
+
+    def __init__(self, timeout: float = SUBMIT_TIMEOUT, first_id: int = FIRST_SUBMIT_ID):
+        self.timeout = timeout
+        self._ids = itertools.count(first_id)
+        self._in_flight = OrderedDict()  # id -> _InFlight, en orden de envío
+        self._lock = threading.Lock()
+        self.rtt = LatencyRecorder(1024)
+        self.consecutive_timeouts = 0
+        self.stats = {"sent": 0, "accepted": 0, "rejected": 0, "timeouts": 0, "lost": 0}
+
+    def register(self, info=None, callback=None):
+        """
+        Reserva un id para un submit (antes de enviarlo: la respuesta puede
+        llegar a otro hilo antes de que sendall vuelva).
+        Returns:
+            (id, Future con el resultado)
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+        with self._lock:
+            req_id = next(self._ids)
+            self._in_flight[req_id] = _InFlight(time.perf_counter(), info, future)
+            self.stats["sent"] += 1
+        return req_id, future
+
+    def discard(self, req_id, reason: str = "no enviado"):
+        """Submit que no llegó a salir (fallo de envío)."""
+        with self._lock:
+            entry = self._in_flight.pop(req_id, None)
+            if entry is None:
+                return
+            self.stats["lost"] += 1
+        self._finish(req_id, entry, False, None, reason)
+
+    def resolve(self, message: dict):
+        """
+        Respuesta de la pool. Devuelve el resultado si correspondía a un
+        submit en vuelo, o None (no es un submit nuestro o ya expiró).
+        """
+        req_id = message.get("id")
+        if req_id is None or "method" in message:
+            return None
+        with self._lock:
+            entry = self._in_flight.pop(req_id, None)
+            if entry is None:
+                return None
+            self.consecutive_timeouts = 0  # La pool responde: los timeouts anteriores no eran de la conexión
+            error, result = message.get("error"), message.get("result")
+            accepted = error is None and result not in (None, False)
+            self.stats["accepted" if accepted else "rejected"] += 1
+        rtt = time.perf_counter() - entry.sent_at
+        self.rtt.record(rtt)
+        return self._finish(req_id, entry, accepted, result, error, rtt)
+
+    def expire(self) -> list:
+        """Resuelve como fallidos los submits sin respuesta tras el timeout; devuelve sus resultados."""
+        deadline = time.perf_counter() - self.timeout
+        expired = []
+        with self._lock:
+            while self._in_flight:
+                req_id, entry = next(iter(self._in_flight.items()))
+                if entry.sent_at > deadline:
+                    break
+                del self._in_flight[req_id]
+                self.stats["timeouts"] += 1
+                self.consecutive_timeouts += 1
+                expired.append((req_id, entry))
+        return [self._finish(req_id, entry, False, None, "timeout") for req_id, entry in expired]
+
+    def fail_all(self, reason: str = "conexión perdida") -> int:
+        """Conexión caída: las respuestas pendientes ya no llegarán."""
+        with self._lock:
+            entries = list(self._in_flight.items())
+            self._in_flight.clear()
+            self.stats["lost"] += len(entries)
+        for req_id, entry in entries:
+            self._finish(req_id, entry, False, None, reason)
+        return len(entries)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def oldest_age(self) -> float:
+        with self._lock:
+            if not self._in_flight:
+                return 0.0
+            return time.perf_counter() - next(iter(self._in_flight.values())).sent_at
+
+    @staticmethod
+    def _finish(req_id, entry: _InFlight, accepted: bool, result, error, rtt: float = None) -> dict:
+        verdict = {
+            "id": req_id,
+            "accepted": accepted,
+            "result": result,
+            "error": error,
+            "rtt_ms": rtt * 1e3 if rtt is not None else None,
+            "info": entry.info,
+        }
+        entry.future.set_result(verdict)  # Los errores de callbacks los registra Future sin propagarlos
+        return verdict
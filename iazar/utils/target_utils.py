@@ -0,0 +1,74 @@
+# iazar/utils/target_utils.py
+"""
+Utilidades binarias de target/nonce para el pipeline Stratum Monero.
+Semántica xmrig/pool: el target compacto de 32 bits (8 hex, little-endian) se
+expande una vez por trabajo a un umbral de 64 bits, y un hash cumple si sus 8
+bytes superiores (bytes 24..31, uint64 little-endian) son menores que el umbral.
+"""
+
+import struct
+
+import numpy as np
+
+MAX_UINT32 = 0xFFFFFFFF
+MAX_UINT64 = 0xFFFFFFFFFFFFFFFF
+
+_UINT64_LE = struct.Struct("<Q")
+_UINT32_LE = struct.Struct("<I")
+
+
+def target_to_threshold(target) -> int:
+    """
+    Expande el target de la pool a umbral de 64 bits.
+    Args:
+        target: hex de 8 chars (compacto 32 bits), hex de 16 chars (64 bits) o int ya expandido.
+    Returns:
+        int: umbral uint64 a comparar con los 8 bytes superiores del hash.
+    """
+    if isinstance(target, int):
+        return target
+    raw = bytes.fromhex(target.strip())
+    if len(raw) <= 4:
+        compact = int.from_bytes(raw.ljust(4, b"\0"), "little")
+        if compact == 0:
+            return 0
+        return MAX_UINT64 // (MAX_UINT32 // compact)
+    return int.from_bytes(raw[:8], "little")
+
+
+def threshold_to_difficulty(threshold: int) -> int:
+    """Dificultad equivalente a un umbral de 64 bits."""
+    return MAX_UINT64 // threshold if threshold else 0
+
+
+def difficulty_to_threshold(difficulty: int) -> int:
+    """Umbral de 64 bits para una dificultad dada."""
+    return MAX_UINT64 // max(1, int(difficulty))
+
+
+def threshold_to_compact(threshold: int) -> str:
+    """Target compacto de 32 bits (8 hex little-endian) que anunciar a un minero."""
+    difficulty = max(1, threshold_to_difficulty(threshold))
+    compact = min(MAX_UINT32, MAX_UINT32 // difficulty)
+    return _UINT32_LE.pack(compact).hex()
+
+
+def hash_meets_threshold(hash_bytes, threshold: int) -> bool:
+    """Compara los 8 bytes superiores del hash crudo con el umbral, sin copiar el hash."""
+    return _UINT64_LE.unpack_from(hash_bytes, 24)[0] < threshold
+
+
+def hashes_meet_threshold(hashes: np.ndarray, threshold: int) -> np.ndarray:
+    """Versión vectorizada para un lote (n, 32) uint8: máscara booleana de hashes válidos."""
+    tops = np.ascontiguousarray(hashes[:, 24:32]).view("<u8").ravel()
+    return tops < np.uint64(threshold)
+
+
+def nonce_to_hex(nonce: int) -> str:
+    """Nonce uint32 -> 8 hex en el orden de bytes del blob (little-endian), como espera la pool."""
+    return _UINT32_LE.pack(int(nonce) & MAX_UINT32).hex()
+
+
+def nonce_from_hex(nonce_hex: str) -> int:
+    """8 hex little-endian (formato submit) -> nonce uint32."""
+    return _UINT32_LE.unpack(bytes.fromhex(nonce_hex))[0]
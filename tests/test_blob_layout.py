@@ -0,0 +1,56 @@
+# tests/test_blob_layout.py
+import pytest
+
+from iazar.core.blob_layout import encode_varint, parse_blob_layout, read_varint
+
+
+def _blob(major=16, minor=16, timestamp=1700000000, tx_count=None):
+    header = encode_varint(major) + encode_varint(minor) + encode_varint(timestamp)
+    blob = header + bytes(range(32)) + b"\x01\x02\x03\x04" + bytes(32)
+    if tx_count is not None:
+        blob += encode_varint(tx_count)
+    return blob
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 1700000000, (1 << 63) - 1])
+def test_varint_round_trip(value):
+    encoded = encode_varint(value)
+    assert read_varint(encoded + b"\xff", 0) == (value, len(encoded))
+
+
+def test_varint_errors():
+    with pytest.raises(ValueError):
+        read_varint(b"\x80\x80")
+    with pytest.raises(ValueError):
+        read_varint(b"\xff" * 10 + b"\x01")
+    with pytest.raises(ValueError):
+        encode_varint(-1)
+
+
+@pytest.mark.parametrize("major, timestamp, nonce_offset", [
+    (16, 1700000000, 39),  # Caso típico: varints de 1 + 1 + 5 bytes
+    (16, 100, 35),
+    (200, 1700000000, 40),  # major_version de 2 bytes
+])
+def test_nonce_offset_follows_varint_lengths(major, timestamp, nonce_offset):
+    blob = _blob(major=major, timestamp=timestamp)
+    layout = parse_blob_layout(blob)
+    assert layout.nonce_offset == nonce_offset
+    assert (layout.major_version, layout.timestamp) == (major, timestamp)
+    assert layout.prev_id == bytes(range(32))
+    assert blob[layout.nonce_slice] == b"\x01\x02\x03\x04"
+    assert layout.merkle_root_offset == nonce_offset + 4
+
+
+def test_hashing_blob_tx_count_and_hex_input():
+    blob = _blob(tx_count=300)
+    layout = parse_blob_layout(blob.hex())
+    assert layout.tx_count == 300
+    assert layout.size == len(blob)
+
+
+def test_truncated_blob_and_bad_reserved_offset():
+    with pytest.raises(ValueError):
+        parse_blob_layout(_blob()[:38])
+    with pytest.raises(ValueError):
+        parse_blob_layout(_blob(), reserved_offset=10)
@@ -0,0 +1,49 @@
+# tests/test_job_window.py
+from iazar.core.pool_job import PoolJob
+from iazar.proxy.job_window import JobWindow
+
+BLOB = bytes([16, 16]) + (1700000000).to_bytes(5, "little") + bytes(76)
+
+
+def _job(job_id, height=5):
+    return PoolJob(job_id, BLOB, b"\x01" * 32, "b88d0600", height=height)
+
+
+def test_new_height_evicts_older_jobs():
+    window = JobWindow(8)
+    assert window.add(_job("a", 5)) == []
+    assert window.add(_job("b", 5)) == []
+    assert window.add(_job("c", 6)) == ["a", "b"]
+    assert window.job_ids() == ["c"] and window.height == 6
+
+
+def test_window_is_bounded():
+    window = JobWindow(2)
+    window.add(_job("a"))
+    window.add(_job("b"))
+    assert window.add(_job("c")) == ["a"]
+    assert len(window) == 2 and "a" not in window
+    assert window.stats["evicted"] == 1
+
+
+def test_readded_job_moves_to_newest():
+    window = JobWindow(2)
+    window.add(_job("a"))
+    window.add(_job("b"))
+    window.add(_job("a"))
+    assert window.add(_job("c")) == ["b"]
+
+
+def test_stale_shares_are_counted_per_source():
+    window = JobWindow(8)
+    window.add(_job("a", 5))
+    window.add(_job("b", 6))
+    assert window.check("b", "miner-1").job_id == "b"
+    assert window.check("a", "miner-1") is None
+    assert window.check("zz", "ia") is None
+    rates = window.stale_rates()
+    assert rates["miner-1"] == {"shares": 2, "stale": 1, "rate": 0.5}
+    assert rates["ia"]["stale"] == 1
+    assert window.stats["stale"] == 2
+    window.forget_source("miner-1")
+    assert "miner-1" not in window.stale_rates()
@@ -0,0 +1,43 @@
+# tests/test_randomx_standin.py
+import numpy as np
+import pytest
+
+from iazar.utils.randomx_backends import StandInBackend
+from iazar.utils.randomx_wrapper import NonceBlob, RandomXEngine, insert_nonce
+
+BLOB = bytes([16, 16]) + (1700000000).to_bytes(5, "little") + bytes(76)
+SEED = b"\x01" * 32
+
+
+@pytest.fixture
+def engine():
+    engine = RandomXEngine(lib=StandInBackend())
+    yield engine
+    engine.release()
+
+
+def test_batch_matches_single_hashes(engine):
+    nonces = np.array([0, 1, 7, 0xFFFFFFFF, 123456], dtype=np.uint32)
+    batch = engine.hash_nonces(BLOB, nonces, SEED)
+    assert batch.shape == (len(nonces), 32) and batch.dtype == np.uint8
+    nonce_blob = NonceBlob(BLOB)
+    for nonce, row in zip(nonces.tolist(), batch):
+        single = engine.hash_nonce(nonce_blob, nonce, SEED)
+        assert row.tobytes() == single == engine.hash(insert_nonce(BLOB, nonce), SEED)
+
+
+def test_seed_changes_hashes(engine):
+    nonces = np.arange(4, dtype=np.uint32)
+    assert not np.array_equal(engine.hash_nonces(BLOB, nonces, SEED),
+                              engine.hash_nonces(BLOB, nonces, b"\x02" * 32))
+
+
+def test_out_buffer_is_reused_and_validated(engine):
+    nonces = np.arange(3, dtype=np.uint32)
+    out = np.zeros((3, 32), dtype=np.uint8)
+    assert engine.hash_nonces(NonceBlob(BLOB), nonces, SEED, out=out) is out
+    assert engine.hash_nonces(BLOB, np.array([], dtype=np.uint32), SEED).shape == (0, 32)
+    with pytest.raises(ValueError):
+        engine.hash_nonces(BLOB, nonces, SEED, out=np.zeros((2, 32), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        engine.hash_nonces(BLOB, nonces, SEED, out=np.zeros((3, 32), dtype=np.int8))
@@ -0,0 +1,52 @@
+# tests/test_share_index.py
+from iazar.core.share_index import SET_ENTRY_BYTES, ShareIndex
+
+
+def test_duplicate_is_rejected_per_job():
+    index = ShareIndex()
+    assert index.check_and_add("a", 5)
+    assert not index.check_and_add("a", 5)
+    # El mismo nonce en otro trabajo es un share distinto
+    assert index.check_and_add("b", 5)
+    assert index.stats["duplicates"] == 1
+    assert index.is_duplicate("a", 5) and not index.is_duplicate("a", 6)
+
+
+def test_nonce_is_masked_to_32_bits():
+    index = ShareIndex()
+    assert index.check_and_add("a", 7)
+    assert not index.check_and_add("a", 7 + (1 << 32))
+
+
+def test_oldest_job_is_evicted_beyond_max_jobs():
+    index = ShareIndex(max_jobs=2)
+    index.check_and_add("a", 1)
+    index.check_and_add("b", 1)
+    index.check_and_add("c", 1)
+    assert index.job_count() == 2
+    assert index.stats["jobs_dropped"] == 1
+    # "a" salió de la ventana: su nonce vuelve a ser nuevo
+    assert not index.is_duplicate("a", 1)
+    assert index.is_duplicate("c", 1)
+
+
+def test_retain_jobs_drops_the_rest_and_frees_memory():
+    index = ShareIndex()
+    for nonce in range(3):
+        index.check_and_add("old", nonce)
+    index.check_and_add("new", 0)
+    assert index.memory_bytes() == 4 * SET_ENTRY_BYTES
+    index.retain_jobs(["new"])
+    assert index.job_count() == 1
+    assert index.memory_bytes() == SET_ENTRY_BYTES
+
+
+def test_bloom_prefilter_keeps_exact_answers():
+    index = ShareIndex(bloom_after=16, bloom_bits=1 << 10)
+    for nonce in range(64):
+        assert index.check_and_add("a", nonce)
+    for nonce in range(64):
+        assert not index.check_and_add("a", nonce)
+    assert index.check_and_add("a", 1000)
+    index.drop_job("a")
+    assert index.memory_bytes() == 0
@@ -0,0 +1,45 @@
+# tests/test_stratum_codec.py
+from iazar.utils.stratum_codec import StratumDecoder, encode, loads
+
+
+def test_encode_is_one_json_line():
+    frame = encode({"id": 1, "method": "login"})
+    assert frame.endswith(b"\n") and frame.count(b"\n") == 1
+    assert loads(frame) == {"id": 1, "method": "login"}
+
+
+def test_partial_frame_is_kept_until_completed():
+    decoder = StratumDecoder()
+    assert decoder.feed(b'{"id":1,"me') == []
+    assert decoder.pending_bytes() == len(b'{"id":1,"me')
+    assert decoder.feed(b'thod":"job"}\n{"id":2}\n{"id"') == [{"id": 1, "method": "job"}, {"id": 2}]
+    assert decoder.feed(b":3}\n") == [{"id": 3}]
+    assert decoder.pending_bytes() == 0
+
+
+def test_byte_at_a_time_and_blank_lines():
+    decoder = StratumDecoder()
+    messages = []
+    for byte in b'\n\r\n{"id":7}\n':
+        messages += decoder.feed(bytes([byte]))
+    assert messages == [{"id": 7}]
+
+
+def test_invalid_json_is_counted_and_skipped():
+    decoder = StratumDecoder()
+    assert decoder.feed(b'not json\n{"id":1}\n') == [{"id": 1}]
+    assert decoder.errors == 1
+
+
+def test_oversized_line_is_dropped():
+    decoder = StratumDecoder(max_line=16)
+    assert decoder.feed(b"x" * 32) == []
+    assert decoder.errors == 1 and decoder.pending_bytes() == 0
+    assert decoder.feed(b'{"id":1}\n') == [{"id": 1}]
+
+
+def test_reset_discards_pending():
+    decoder = StratumDecoder()
+    decoder.feed(b'{"id":')
+    decoder.reset()
+    assert decoder.feed(b'{"id":2}\n') == [{"id": 2}]
@@ -0,0 +1,55 @@
+# tests/test_submit_tracker.py
+import time
+
+from iazar.utils.submit_tracker import FIRST_SUBMIT_ID, SubmitTracker
+
+
+def test_responses_resolve_by_id_in_any_order():
+    tracker = SubmitTracker()
+    first, first_future = tracker.register(info="a")
+    second, second_future = tracker.register(info="b")
+    assert (first, second) == (FIRST_SUBMIT_ID, FIRST_SUBMIT_ID + 1)
+    rejected = tracker.resolve({"id": second, "result": None, "error": {"message": "Low difficulty"}})
+    assert rejected["info"] == "b" and not rejected["accepted"]
+    assert tracker.in_flight() == 1
+    accepted = tracker.resolve({"id": first, "result": {"status": "OK"}, "error": None})
+    assert accepted["accepted"] and accepted["rtt_ms"] >= 0
+    assert first_future.result(0) is accepted and second_future.result(0) is rejected
+    assert tracker.stats["accepted"] == 1 and tracker.stats["rejected"] == 1
+
+
+def test_foreign_messages_are_not_resolved():
+    tracker = SubmitTracker()
+    req_id, _ = tracker.register()
+    assert tracker.resolve({"id": req_id, "method": "job", "params": {}}) is None
+    assert tracker.resolve({"id": 999, "result": True}) is None
+    assert tracker.resolve({"id": None, "result": True}) is None
+    assert tracker.in_flight() == 1
+
+
+def test_timeout_expires_oldest_and_counts_consecutive():
+    tracker = SubmitTracker(timeout=0.05)
+    expired_ids = [tracker.register()[0] for _ in range(2)]
+    assert tracker.expire() == []
+    time.sleep(0.06)
+    late, _ = tracker.register()
+    results = tracker.expire()
+    assert [r["id"] for r in results] == expired_ids
+    assert all(r["error"] == "timeout" and not r["accepted"] for r in results)
+    assert tracker.consecutive_timeouts == 2 and tracker.in_flight() == 1
+    # Una respuesta de la pool demuestra que la conexión vive
+    tracker.resolve({"id": late, "result": True})
+    assert tracker.consecutive_timeouts == 0
+    # La respuesta de un submit ya expirado se ignora
+    assert tracker.resolve({"id": expired_ids[0], "result": True}) is None
+
+
+def test_discard_fail_all_and_callback():
+    tracker = SubmitTracker()
+    seen = []
+    unsent, _ = tracker.register(callback=seen.append)
+    tracker.register(callback=seen.append)
+    tracker.discard(unsent)
+    assert tracker.fail_all() == 1
+    assert [v["error"] for v in seen] == ["no enviado", "conexión perdida"]
+    assert tracker.stats["lost"] == 2 and tracker.in_flight() == 0
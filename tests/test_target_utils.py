@@ -0,0 +1,54 @@
+# tests/test_target_utils.py
+import numpy as np
+import pytest
+
+from iazar.utils.target_utils import (
+    MAX_UINT64, difficulty_to_threshold, hash_meets_threshold, hashes_meet_threshold,
+    nonce_from_hex, nonce_to_hex, target_to_threshold, threshold_to_compact, threshold_to_difficulty,
+)
+
+
+def _hash_with_top(top: int) -> bytes:
+    return bytes(24) + top.to_bytes(8, "little")
+
+
+def test_compact_target_expands_like_xmrig():
+    # b88d0600 = 0x00068db8 -> dificultad 0xffffffff // 0x68db8
+    threshold = target_to_threshold("b88d0600")
+    assert threshold == MAX_UINT64 // (0xFFFFFFFF // 0x00068DB8)
+    assert threshold_to_difficulty(threshold) == 0xFFFFFFFF // 0x00068DB8
+    assert target_to_threshold("00000000") == 0
+
+
+def test_64_bit_target_and_int_pass_through():
+    assert target_to_threshold("0100000000000000") == 1
+    assert target_to_threshold(12345) == 12345
+
+
+def test_compact_round_trip():
+    threshold = difficulty_to_threshold(10000)
+    assert threshold_to_difficulty(target_to_threshold(threshold_to_compact(threshold))) == 10000
+
+
+def test_threshold_is_strict_on_the_top_bytes():
+    threshold = difficulty_to_threshold(10000)
+    assert hash_meets_threshold(_hash_with_top(threshold - 1), threshold)
+    assert not hash_meets_threshold(_hash_with_top(threshold), threshold)
+    # Los 24 bytes inferiores no cuentan
+    assert hash_meets_threshold(b"\xff" * 24 + (threshold - 1).to_bytes(8, "little"), threshold)
+
+
+def test_vectorized_matches_scalar():
+    threshold = difficulty_to_threshold(3)
+    tops = [0, threshold - 1, threshold, MAX_UINT64]
+    hashes = np.frombuffer(b"".join(_hash_with_top(t) for t in tops), dtype=np.uint8).reshape(-1, 32)
+    expected = [hash_meets_threshold(_hash_with_top(t), threshold) for t in tops]
+    assert hashes_meet_threshold(hashes, threshold).tolist() == expected
+
+
+def test_nonce_hex_is_little_endian():
+    assert nonce_to_hex(5) == "05000000"
+    assert nonce_from_hex("050000ff") == 0xFF000005
+    assert nonce_from_hex(nonce_to_hex(0xDEADBEEF)) == 0xDEADBEEF
+    with pytest.raises(ValueError):
+        nonce_from_hex("zz")
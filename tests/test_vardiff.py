@@ -0,0 +1,65 @@
+# tests/test_vardiff.py
+from iazar.core.vardiff import SHARE_LOCAL, SHARE_LOW, SHARE_POOL, Vardiff, quantize_difficulty
+from iazar.utils.target_utils import difficulty_to_threshold
+
+
+def _hash_with_top(top: int) -> bytes:
+    """Hash cuyos 8 bytes superiores valen `top` (lo único que mira el umbral)."""
+    return bytes(24) + top.to_bytes(8, "little")
+
+
+def _vardiff(**kwargs):
+    params = dict(start_difficulty=10000, target_spm=6.0, window=300.0,
+                  retarget_interval=30.0, variance=0.3, min_difficulty=1000)
+    params.update(kwargs)
+    return Vardiff(**params)
+
+
+def test_quantize_difficulty_snaps_to_levels():
+    assert quantize_difficulty(1) == 1
+    assert quantize_difficulty(1024) == 1024
+    assert quantize_difficulty(1100) == quantize_difficulty(1024)
+
+
+def test_classify_does_not_record():
+    vardiff = _vardiff()
+    pool_threshold = difficulty_to_threshold(1_000_000)
+    assert vardiff.classify(_hash_with_top(0), pool_threshold) == SHARE_POOL
+    assert vardiff.classify(_hash_with_top(vardiff.threshold - 1), pool_threshold) == SHARE_LOCAL
+    assert vardiff.classify(_hash_with_top(vardiff.threshold), pool_threshold) == SHARE_LOW
+    # Solo record_share() (share verificado) cuenta para el ritmo
+    assert vardiff.shares_per_minute(vardiff._since + 60) == 0.0
+
+
+def test_retarget_raises_difficulty_when_too_fast():
+    vardiff = _vardiff()
+    t0 = vardiff._since
+    for i in range(60):
+        vardiff.record_share(t0 + i)
+    # 60 shares/min frente a 6: se limita a MAX_RETARGET_FACTOR
+    assert vardiff.retarget(t0 + 60) == quantize_difficulty(40000)
+    assert vardiff.stats["retargets"] == 1
+    assert vardiff.shares_per_minute(t0 + 61) == 0.0
+
+
+def test_retarget_lowers_difficulty_without_shares():
+    vardiff = _vardiff()
+    assert vardiff.retarget(vardiff._since + 60) == quantize_difficulty(2500)
+
+
+def test_retarget_respects_interval_variance_and_minimum():
+    vardiff = _vardiff()
+    t0 = vardiff._since
+    assert vardiff.retarget(t0 + 10) is None  # Antes de retarget_interval
+    for i in range(6):
+        vardiff.record_share(t0 + i * 10)
+    assert vardiff.retarget(t0 + 60) is None  # 6 shares/min: dentro de la varianza
+    floor = _vardiff(start_difficulty=1000)
+    assert floor.retarget(floor._since + 60) is None  # Ya en min_difficulty
+
+
+def test_target_for_never_exceeds_pool_difficulty():
+    vardiff = _vardiff()
+    assert vardiff.target_for(1_000_000) == (vardiff.target, vardiff.threshold)
+    target, threshold = vardiff.target_for(2048)
+    assert threshold > vardiff.threshold